@@ -17,7 +17,15 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from resources.lib.tidal2 import main
+from resources.lib.tidal2.profiler import ImportProfiler
 
 if __name__ == '__main__':
-    main.run()
+    profiler = ImportProfiler.start_if_enabled()
+    from resources.lib.tidal2 import resolver
+    if resolver.is_resolver_path():
+        profiler.stop()
+        resolver.run()
+    else:
+        from resources.lib.tidal2 import main
+        profiler.stop()
+        main.run()
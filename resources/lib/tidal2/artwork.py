@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import re
+import io
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from .debug import log
+
+#------------------------------------------------------------------------------
+# Artwork Cache for the Fanart Server
+#------------------------------------------------------------------------------
+
+class ArtworkCache(object):
+    ''' Two-level cache for artist fanart images.
+        The memory layer holds the most recently used images up to max_memory bytes.
+        The disk layer keeps the images with their ETag up to max_disk bytes. Images which are
+        older than revalidate_after seconds are revalidated with a conditional request.
+        Artists without fanart are remembered in a small marker file for retry_missing_after seconds.
+        Expired markers are removed once per retry_missing_after interval.
+        Parallel requests for the same artist wait for the first one instead of loading it again.
+    '''
+
+    def __init__(self, cache_dir, http, max_memory=16*1024*1024, max_disk=50*1024*1024, revalidate_after=7*86400, retry_missing_after=86400):
+        self.cache_dir = cache_dir
+        self.http = http
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.revalidate_after = revalidate_after
+        self.retry_missing_after = retry_missing_after
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.disk_size = None
+        self.next_sweep = 0
+        self.in_flight = {}
+        self.requests = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+        self.bytes_saved = 0
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+        except Exception as e:
+            log.logException(e, 'Failed to create fanart cache folder %s' % self.cache_dir)
+
+    def get(self, artist_id, lookup_url):
+        ''' Returns the fanart image of an artist or None if the artist has no fanart.
+            lookup_url(artist_id) is called to get the image URL if it is not cached.
+        '''
+        key = re.sub(r'[^0-9A-Za-z_-]', '', '%s' % artist_id)
+        with self.lock:
+            self.requests += 1
+            data = self.memory.get(key, None)
+            if data:
+                # Move to the end of the LRU list
+                self.memory[key] = self.memory.pop(key)
+                self.memory_hits += 1
+                self.bytes_saved += len(data)
+                return data
+            loading = self.in_flight.get(key, None)
+            if not loading:
+                self.in_flight[key] = threading.Event()
+        if loading:
+            # Another thread is loading the same image
+            loading.wait(30)
+            with self.lock:
+                data = self.memory.get(key, None)
+                if data:
+                    self.memory_hits += 1
+                    self.bytes_saved += len(data)
+            return data
+        try:
+            data = self._load(key, lookup_url)
+            if data:
+                self._put_memory(key, data)
+            return data
+        finally:
+            with self.lock:
+                self.in_flight.pop(key).set()
+                if self.requests % 100 == 0:
+                    log.info(self.statistics())
+
+    def _put_memory(self, key, data):
+        with self.lock:
+            old = self.memory.pop(key, None)
+            if old:
+                self.memory_size -= len(old)
+            self.memory[key] = data
+            self.memory_size += len(data)
+            while self.memory_size > self.max_memory and len(self.memory) > 1:
+                key, old = self.memory.popitem(last=False)
+                self.memory_size -= len(old)
+
+    def _filename(self, key, ext):
+        return os.path.join(self.cache_dir, '%s.%s' % (key, ext))
+
+    def _read_meta(self, key):
+        try:
+            with io.open(self._filename(key, 'json'), 'r', encoding='utf-8') as fd:
+                return json.load(fd)
+        except:
+            return None
+
+    def _write_meta(self, key, meta):
+        with io.open(self._filename(key, 'json'), 'w', encoding='utf-8') as fd:
+            fd.write('%s' % json.dumps(meta))
+
+    def _read_image(self, key):
+        try:
+            filename = self._filename(key, 'jpg')
+            with open(filename, 'rb') as fd:
+                data = fd.read()
+            # Touch the file for the LRU eviction
+            os.utime(filename, None)
+            return data
+        except:
+            return None
+
+    def _load(self, key, lookup_url):
+        now = time.time()
+        meta = self._read_meta(key)
+        if meta and not meta.get('url', None):
+            # Artist without fanart
+            if meta.get('checked', 0) + self.retry_missing_after > now:
+                return None
+            meta = None
+        data = self._read_image(key) if meta else None
+        if data and meta.get('checked', 0) + self.revalidate_after > now:
+            with self.lock:
+                self.disk_hits += 1
+                self.bytes_saved += len(data)
+            return data
+        url = meta.get('url') if data else lookup_url(key)
+        if not url:
+            self._write_meta(key, {'url': None, 'checked': now})
+            self._sweep_missing(now)
+            return None
+        headers = {}
+        if data and meta.get('etag', None):
+            headers['If-None-Match'] = meta.get('etag')
+        if data and meta.get('lastModified', None):
+            headers['If-Modified-Since'] = meta.get('lastModified')
+        r = self.http.get(url, headers=headers)
+        if r.status_code == 304 and data:
+            meta['checked'] = now
+            self._write_meta(key, meta)
+            with self.lock:
+                self.revalidated += 1
+                self.bytes_saved += len(data)
+            return data
+        if not r.ok:
+            # Use the outdated image if the revalidation failed
+            return data
+        data = r.content
+        self._write_image(key, data)
+        self._write_meta(key, {'url': url, 'checked': now, 'etag': r.headers.get('ETag', None), 'lastModified': r.headers.get('Last-Modified', None)})
+        with self.lock:
+            self.downloads += 1
+        return data
+
+    def _write_image(self, key, data):
+        filename = self._filename(key, 'jpg')
+        try:
+            old_size = os.path.getsize(filename) if os.path.isfile(filename) else 0
+            with open(filename, 'wb') as fd:
+                fd.write(data)
+            with self.lock:
+                if self.disk_size is None:
+                    self.disk_size = sum([os.path.getsize(os.path.join(self.cache_dir, f)) for f in os.listdir(self.cache_dir) if f.endswith('.jpg')])
+                else:
+                    self.disk_size += len(data) - old_size
+                if self.disk_size > self.max_disk:
+                    self._evict_disk()
+        except Exception as e:
+            log.logException(e, 'Failed to write fanart into %s' % filename)
+
+    def _sweep_missing(self, now):
+        # Remove the expired markers of artists without fanart
+        with self.lock:
+            if now < self.next_sweep:
+                return
+            self.next_sweep = now + self.retry_missing_after
+        removed = 0
+        try:
+            for f in os.listdir(self.cache_dir):
+                filename = os.path.join(self.cache_dir, f)
+                if f.endswith('.json') and not os.path.isfile(filename[:-5] + '.jpg') and os.path.getmtime(filename) + self.retry_missing_after < now:
+                    os.remove(filename)
+                    removed += 1
+        except Exception as e:
+            log.logException(e, 'Failed to remove expired fanart markers')
+        if removed:
+            log.info('Removed %s expired markers from the fanart cache' % removed)
+
+    def _evict_disk(self):
+        # Remove the least recently used images until 90% of the cache size is reached
+        files = sorted([f for f in os.listdir(self.cache_dir) if f.endswith('.jpg')], key=lambda f: os.path.getmtime(os.path.join(self.cache_dir, f)))
+        removed = 0
+        for f in files:
+            if self.disk_size <= self.max_disk * 0.9:
+                break
+            try:
+                filename = os.path.join(self.cache_dir, f)
+                size = os.path.getsize(filename)
+                os.remove(filename)
+                os.remove(filename[:-4] + '.json')
+            except:
+                size = 0
+            self.disk_size -= size
+            removed += 1
+        log.info('Removed %s images from the fanart cache' % removed)
+
+    def statistics(self):
+        hits = self.memory_hits + self.disk_hits + self.revalidated
+        rate = 100.0 * hits / self.requests if self.requests else 0.0
+        return 'Fanart Cache: %d requests, %.0f%% hits (%d memory, %d disk, %d revalidated), %d downloads, %.1f MB saved' % \
+               (self.requests, rate, self.memory_hits, self.disk_hits, self.revalidated, self.downloads, self.bytes_saved / 1048576.0)
+
+
+# End of File
@@ -99,6 +99,8 @@ class Const(object):
     is_hls = 'hls'
     is_adaptive = 'inputstream.adaptive'
     is_ffmpegdirect = 'inputstream.ffmpegdirect'
+    is_stream = 'stream'
+    service_key_property = 'tidal2.service_key'
 
 class KodiPlugin(Plugin):
 
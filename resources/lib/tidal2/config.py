@@ -69,6 +69,10 @@ class TidalConfig(Config):
         self.playlist_file = os.path.join(self.cache_dir, 'playlists.cfg')
         self.folders_file = os.path.join(self.cache_dir, 'folders.cfg')
         self.profiles_file = os.path.join(self.cache_dir, 'userprofiles.cfg')
+        self.cache_db_file = os.path.join(self.cache_dir, 'cache.db')
+        self.response_cache_dir = os.path.join(self.cache_dir, 'responses')
+        self.track_url_cache_dir = os.path.join(self.cache_dir, 'trackurls')
+        self.fanart_cache_dir = os.path.join(self.cache_dir, 'fanart')
 
         self.default_trackplaylist_id = self.getSetting('default_trackplaylist_id')
         self.default_videoplaylist_id = self.getSetting('default_videoplaylist_id')
@@ -178,13 +182,25 @@ class TidalConfig(Config):
             self.hires_mask = '{label} (HiRes)'
 
         # Extended Options
-        self.dash_aac_mode = [Const.is_hls, Const.is_adaptive, Const.is_ffmpegdirect][min(2,int('0%s' % self.getSetting('dash_aac_mode')))]
-        self.dash_flac_mode = [Const.is_hls, Const.is_ffmpegdirect][min(1,int('0%s' % self.getSetting('dash_flac_mode')))]
+        self.dash_aac_mode = [Const.is_hls, Const.is_adaptive, Const.is_ffmpegdirect, Const.is_stream][min(3,int('0%s' % self.getSetting('dash_aac_mode')))]
+        self.dash_flac_mode = [Const.is_hls, Const.is_ffmpegdirect, Const.is_stream][min(2,int('0%s' % self.getSetting('dash_flac_mode')))]
         self.ffmpegdirect_has_mpd = True if self.getSetting('ffmpegdirect_has_mpd') == 'true' else False
         self.ffmpegdirect_is_default_player = True if self.getSetting('ffmpegdirect_is_default') == 'true' else False
         self.fanart_server_enabled = True
         self.fanart_server_port = int('0%s' % self.getSetting('fanart_server_port'))
         self.mpd_cache_size = max(0, min(999, int('0%s' % self.getSetting('mpd_cache_size'))))
+        self.http_pool_size = max(1, min(50, int('0%s' % self.getSetting('http_pool_size'))))
+        self.page_fetch_threads = max(1, min(16, int('0%s' % self.getSetting('page_fetch_threads'))))
+        self.response_cache_size = max(0, min(10000, int('0%s' % self.getSetting('response_cache_size'))))
+        self.service_backend = True if self.getSetting('service_backend') == 'true' else False
+        self.http_server_threads = max(1, min(16, int('0%s' % self.getSetting('http_server_threads'))))
+        self.fanart_server_threads = max(1, min(8, int('0%s' % self.getSetting('fanart_server_threads'))))
+        self.fanart_cache_size = max(1, min(1000, int('0%s' % self.getSetting('fanart_cache_size'))))
+        self.segment_proxy = True if self.getSetting('segment_proxy') == 'true' else False
+        self.segment_prefetch = max(1, min(16, int('0%s' % self.getSetting('segment_prefetch'))))
+        self.segment_buffer_size = max(1, min(256, int('0%s' % self.getSetting('segment_buffer_size'))))
+        self.resolve_next_track = True if self.getSetting('resolve_next_track') == 'true' else False
+        self.adaptive_quality = True if self.getSetting('adaptive_quality') == 'true' else False
 
     def isFreeSubscription(self):
         return True if self.subscription_type in SubscriptionType.FreeSubscriptions else False
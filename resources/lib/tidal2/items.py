@@ -19,6 +19,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import re
 import sys
+import copy
 import datetime
 
 try:
@@ -39,29 +40,81 @@ from .tidalapi import models as tidal
 
 # Convert TIDAL-API Media into Kodi List Items
 
+# Requested qualities which can be played with the Hi-Res and MQA tags
+HIRES_QUALITIES = (None, tidal.Quality.hi_res_lossless, tidal.Quality.hi_res)
+
 class ItemSortType(object):
     DATE = 1
     NAME = 2
 
 
+class ListRenderer(object):
+    ''' Label masks, texts and plugin URLs for the items of a listing.
+        The masks are read from the settings and the texts are translated only once.
+        The renderer is compiled again if the settings fingerprint has changed.
+        The items only fill in their IDs and names.
+    '''
+    current_renderer = None
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.FOLDER_MASK, self.STREAM_LOCKED_MASK, self.FAVORITE_MASK, self.USER_PLAYLIST_MASK, self.DEFAULT_PLAYLIST_MASK, \
+            self.MASTER_AUDIO_MASK, self.DOLBY_ATMOS_MASK, self.SONY_360RA_MASK, self.FOLLOWER_MASK, self.HIRES_MASK = fingerprint
+        # All plugin URLs start with the same base URL
+        self.base_url = plugin.url_for_path('/x')[:-2]
+        self.texts = {}
+        if KODI_VERSION >= (20, 0):
+            self.queue_cm_items = [(xbmc.getLocalizedString(13347), 'Action(Queue)'),
+                                   (xbmc.getLocalizedString(10008), 'Action(PlayNext)')]
+        else:
+            self.queue_cm_items = []
+
+    @staticmethod
+    def settings_fingerprint():
+        return (settings.folder_mask, settings.stream_locked_mask, settings.favorite_mask, settings.user_playlist_mask, settings.default_playlist_mask,
+                settings.master_audio_mask, settings.dolby_atmos_mask, settings.sony_360ra_mask, settings.follower_mask, settings.hires_mask)
+
+    @staticmethod
+    def compile():
+        ''' Returns the renderer for a new listing '''
+        fingerprint = ListRenderer.settings_fingerprint()
+        if not ListRenderer.current_renderer or ListRenderer.current_renderer.fingerprint != fingerprint:
+            ListRenderer.current_renderer = ListRenderer(fingerprint)
+        return ListRenderer.current_renderer
+
+    @staticmethod
+    def current():
+        return ListRenderer.current_renderer or ListRenderer.compile()
+
+    def text(self, txtid):
+        txt = self.texts.get(txtid, None)
+        if txt is None:
+            txt = self.texts[txtid] = _T(txtid)
+        return txt
+
+    def menu_text(self, txtid, what):
+        ''' Context menu text which opens a dialog, like "Add to playlist ..." '''
+        txt = self.texts.get((txtid, what), None)
+        if txt is None:
+            txt = self.texts[(txtid, what)] = _T(txtid).format(what=_T(what)) + ' ...'
+        return txt
+
+    def url(self, path):
+        return self.base_url + path
+
+    def run_plugin(self, path):
+        return 'RunPlugin(%s%s)' % (self.base_url, path)
+
+    def update_container(self, path):
+        return 'Container.Update(%s%s)' % (self.base_url, path)
+
+
 class HasListItem(object):
 
     _is_logged_in = False
     _only_info_context_menu = False
     _initial_cm_items = []
 
-    def setLabelFormat(self):
-        self.FOLDER_MASK = settings.folder_mask
-        self.STREAM_LOCKED_MASK = settings.stream_locked_mask
-        self.FAVORITE_MASK = settings.favorite_mask
-        self.USER_PLAYLIST_MASK = settings.user_playlist_mask
-        self.DEFAULT_PLAYLIST_MASK = settings.default_playlist_mask
-        self.MASTER_AUDIO_MASK = settings.master_audio_mask
-        self.DOLBY_ATMOS_MASK = settings.dolby_atmos_mask
-        self.SONY_360RA_MASK = settings.sony_360ra_mask
-        self.FOLLOWER_MASK = settings.follower_mask
-        self.HIRES_MASK = settings.hires_mask
-
     def getLabel(self, extended=True):
         return self.name
 
@@ -79,9 +132,8 @@ class HasListItem(object):
         if self._is_logged_in and hasattr(self, '_isFavorite') and '/favorites/' in sys.argv[0]:
             self._isFavorite = True
         cm = self._initial_cm_items + self.getContextMenuItems(onlyInfoItems=self._only_info_context_menu)
-        if isinstance(self, (tidal.Track, tidal.Video, tidal.Album)) and KODI_VERSION >= (20, 0):
-            cm.append((xbmc.getLocalizedString(13347), 'Action(Queue)'))
-            cm.append((xbmc.getLocalizedString(10008), 'Action(PlayNext)'))
+        if isinstance(self, (tidal.Track, tidal.Video, tidal.Album)):
+            cm += ListRenderer.current().queue_cm_items
             # cm.append(('Clear Playlist', 'Playlist.Clear'))
         if isinstance(self, tidal.PlayableMedia):
             #  TIDALs playback URLs have limited life-times
@@ -104,39 +156,46 @@ class HasListItem(object):
 
 class AlbumItem(tidal.Album, HasListItem):
 
-    def __init__(self, item):
-        self.__dict__.update(vars(item))
-        self.artist = ArtistItem(self.artist)
-        self.artists = [ArtistItem(artist) for artist in self.artists]
-        self._ftArtists = [ArtistItem(artist) for artist in self._ftArtists]
-        self._userplaylists = {}    # Filled by parser
-        self._playlist_id = None    # ID of the Playlist
-        self._playlist_pos = -1     # Item position in playlist
-        self._etag = None           # ETag for User Playlists
-        self._playlist_name = None  # Name of Playlist
-        self._playlist_type = ''    # Playlist Type
-        self._playlist_track_id = 0 # Track-ID of item which is shown as Album Item
+    _userplaylists = {}    # Filled by parser
+    _playlist_id = None    # ID of the Playlist
+    _playlist_pos = -1     # Item position in playlist
+    _etag = None           # ETag for User Playlists
+    _playlist_name = None  # Name of Playlist
+    _playlist_type = ''    # Playlist Type
+    _playlist_track_id = 0 # Track-ID of item which is shown as Album Item
+
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            # Created from the JSON data. The parser adds the artists.
+            tidal.Album.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
+            self.artist = ArtistItem(self.artist)
+            self.artists = [ArtistItem(artist) for artist in self.artists]
+            self._ftArtists = [ArtistItem(artist) for artist in self._ftArtists]
 
     def getPlaybackTag(self, quality=None):
-        if self.isSony360RA:
+        flags = self._mediaFlags
+        if flags & tidal.MediaFlags.sony_360:
             return tidal.MediaMetadataTags.sony_360
-        if self.isDolbyAtmos and settings.isAtmosClientID:
+        if flags & tidal.MediaFlags.dolby_atmos and settings.isAtmosClientID:
             return tidal.MediaMetadataTags.dolby_atmos
-        if self.isHiRes and settings.isHiResClientID and quality in [None, tidal.Quality.hi_res_lossless, tidal.Quality.hi_res]:
+        hires = quality in HIRES_QUALITIES
+        if hires and flags & tidal.MediaFlags.hires_lossless and settings.isHiResClientID:
             return tidal.MediaMetadataTags.hires_lossless
-        if self.isMqa and quality in [None, tidal.Quality.hi_res_lossless, tidal.Quality.hi_res]:
+        if hires and flags & tidal.MediaFlags.mqa:
             return tidal.MediaMetadataTags.mqa
-        if self.isDolbyAtmos:
+        if flags & tidal.MediaFlags.dolby_atmos:
             return tidal.MediaMetadataTags.dolby_atmos
-        if quality in [None, tidal.Quality.hi_res_lossless, tidal.Quality.hi_res]:
+        if hires:
             return tidal.MediaMetadataTags.lossless
         return None
 
     def getLabel(self, extended=True):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         label = self.getLongTitle()
         if extended and self._isFavorite and not '/favorites/' in sys.argv[0]:
-            label = self.FAVORITE_MASK.format(label=label)
+            label = renderer.FAVORITE_MASK.format(label=label)
         label = '%s - %s' % (self.artist.getLabel(extended), label)
         txt = []
         plids = list(self._userplaylists.keys())
@@ -144,11 +203,11 @@ class AlbumItem(tidal.Album, HasListItem):
             if plid != self._playlist_id:
                 txt.append('%s' % self._userplaylists.get(plid).get('title'))
         if extended and txt:
-            label = self.USER_PLAYLIST_MASK.format(label=label, userpl=', '.join(txt))
+            label = renderer.USER_PLAYLIST_MASK.format(label=label, userpl=', '.join(txt))
         return label
 
     def getLongTitle(self):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         longTitle = '%s' % self.title
         if self.type == tidal.AlbumType.ep:
             longTitle += ' (EP)'
@@ -158,19 +217,19 @@ class AlbumItem(tidal.Album, HasListItem):
             longTitle += ' (Explicit)'
         if getattr(self, 'year', None) and settings.album_year_in_labels:
             if self.releaseDate and self.releaseDate > datetime.datetime.now():
-                longTitle += ' (%s)' % _T(Msg.i30268).format(self.releaseDate)
+                longTitle += ' (%s)' % renderer.text(Msg.i30268).format(self.releaseDate)
             else:
                 longTitle += ' (%s)' % self.year
         if settings.mqa_in_labels:
             tag = self.getPlaybackTag()
             if tag == tidal.MediaMetadataTags.mqa:
-                longTitle = self.MASTER_AUDIO_MASK.format(label=longTitle)
+                longTitle = renderer.MASTER_AUDIO_MASK.format(label=longTitle)
             elif tag == tidal.MediaMetadataTags.hires_lossless:
-                longTitle = self.HIRES_MASK.format(label=longTitle)
+                longTitle = renderer.HIRES_MASK.format(label=longTitle)
             elif tag == tidal.MediaMetadataTags.dolby_atmos:
-                longTitle = self.DOLBY_ATMOS_MASK.format(label=longTitle)
+                longTitle = renderer.DOLBY_ATMOS_MASK.format(label=longTitle)
             elif tag == tidal.MediaMetadataTags.sony_360:
-                longTitle = self.SONY_360RA_MASK.format(label=longTitle)
+                longTitle = renderer.SONY_360RA_MASK.format(label=longTitle)
         return longTitle
 
     def getSortText(self, mode=None):
@@ -199,7 +258,7 @@ class AlbumItem(tidal.Album, HasListItem):
 
     def getListItem(self):
         li = HasListItem.getListItem(self)
-        url = plugin.url_for_path('/album/%s' % self.id)
+        url = ListRenderer.current().url('/album/%s' % self.id)
         if KODI_VERSION >= (20, 0):
             tag = li.getMusicInfoTag()
             tag.setMediaType('album')
@@ -246,38 +305,42 @@ class AlbumItem(tidal.Album, HasListItem):
 
     def getContextMenuItems(self, onlyInfoItems=False):
         cm = []
+        renderer = ListRenderer.current()
         if self._is_logged_in and not onlyInfoItems:
             if self._isFavorite:
-                cm.append((_T(Msg.i30220), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/remove/albums/%s' % self.id)))
+                cm.append((renderer.text(Msg.i30220), renderer.run_plugin('/favorites/remove/albums/%s' % self.id)))
             else:
-                cm.append((_T(Msg.i30219), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/add/albums/%s' % self.id)))
+                cm.append((renderer.text(Msg.i30219), renderer.run_plugin('/favorites/add/albums/%s' % self.id)))
             if self._playlist_type == 'USER':
-                cm.append((_T(Msg.i30240).format(what=_T('playlist'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/remove/%s/%s' % (self._playlist_id, self._playlist_pos))))
-                cm.append((_T(Msg.i30248).format(what=_T('playlist'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/move/%s/%s/%s' % (self._playlist_id, self._playlist_pos, self._playlist_track_id))))
-            cm.append((_T(Msg.i30239).format(what=_T('playlist'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/add/album/%s' % self.id)))
+                cm.append((renderer.menu_text(Msg.i30240, 'playlist'), renderer.run_plugin('/user_playlist/remove/%s/%s' % (self._playlist_id, self._playlist_pos))))
+                cm.append((renderer.menu_text(Msg.i30248, 'playlist'), renderer.run_plugin('/user_playlist/move/%s/%s/%s' % (self._playlist_id, self._playlist_pos, self._playlist_track_id))))
+            cm.append((renderer.menu_text(Msg.i30239, 'playlist'), renderer.run_plugin('/user_playlist/add/album/%s' % self.id)))
             plids = list(self._userplaylists.keys())
             for plid in plids:
                 if plid != self._playlist_id:
-                    cm.append(((_T(Msg.i30247).format(name=self._userplaylists[plid].get('title'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/remove_album/%s/%s' % (plid, self.id)))))
+                    cm.append(((renderer.text(Msg.i30247).format(name=self._userplaylists[plid].get('title'))+' ...', renderer.run_plugin('/user_playlist/remove_album/%s/%s' % (plid, self.id)))))
         if len(self.artists) > 1:
-            cm.append((_T(Msg.i30221), 'RunPlugin(%s)' % plugin.url_for_path('/artists/%s' % '-'.join(['%s' % artist.id for artist in self.artists]))))
+            cm.append((renderer.text(Msg.i30221), renderer.run_plugin('/artists/%s' % '-'.join(['%s' % artist.id for artist in self.artists]))))
         else:
-            cm.append((_T(Msg.i30221), 'Container.Update(%s)' % plugin.url_for_path('/artist/%s' % self.artist.id)))
+            cm.append((renderer.text(Msg.i30221), renderer.update_container('/artist/%s' % self.artist.id)))
         return cm
 
 
 class ArtistItem(tidal.Artist, HasListItem):
 
-    def __init__(self, item):
-        self.__dict__.update(vars(item))
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            tidal.Artist.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
         self._isLocked = True if tidal.VARIOUS_ARTIST_ID == '%s' % self.id else False
 
     def getLabel(self, extended=True):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         if extended and self._isFavorite and not '/favorites/artists' in sys.argv[0]:
-            return self.FAVORITE_MASK.format(label=self.name)
+            return renderer.FAVORITE_MASK.format(label=self.name)
         if self._isLocked and '/favorites/artists' in sys.argv[0]:
-            return self.STREAM_LOCKED_MASK.format(label=self.name, info=_T(Msg.i30260))
+            return renderer.STREAM_LOCKED_MASK.format(label=self.name, info=renderer.text(Msg.i30260))
         return self.name
 
     def getSortCriteria(self, sortType=None):
@@ -285,7 +348,7 @@ class ArtistItem(tidal.Artist, HasListItem):
 
     def getListItem(self):
         li = HasListItem.getListItem(self)
-        url = plugin.url_for_path('/artist/%s' % self.id)
+        url = ListRenderer.current().url('/artist/%s' % self.id)
         if KODI_VERSION >= (20, 0):
             tag = li.getMusicInfoTag()
             tag.setMediaType('artist')
@@ -304,16 +367,17 @@ class ArtistItem(tidal.Artist, HasListItem):
 
     def getContextMenuItems(self, onlyInfoItems=False):
         cm = []
+        renderer = ListRenderer.current()
         if self._is_logged_in and not onlyInfoItems:
             if self._isFavorite:
-                cm.append((_T(Msg.i30220), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/remove/artists/%s' % self.id)))
+                cm.append((renderer.text(Msg.i30220), renderer.run_plugin('/favorites/remove/artists/%s' % self.id)))
             else:
-                cm.append((_T(Msg.i30219), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/add/artists/%s' % self.id)))
+                cm.append((renderer.text(Msg.i30219), renderer.run_plugin('/favorites/add/artists/%s' % self.id)))
             if '/favorites/artists' in sys.argv[0]:
                 if self._isLocked:
-                    cm.append((_T(Msg.i30262), 'RunPlugin(%s)' % plugin.url_for_path('/unlock_artist/%s' % self.id)))
+                    cm.append((renderer.text(Msg.i30262), renderer.run_plugin('/unlock_artist/%s' % self.id)))
                 else:
-                    cm.append((_T(Msg.i30261), 'RunPlugin(%s)' % plugin.url_for_path('/lock_artist/%s' % self.id)))
+                    cm.append((renderer.text(Msg.i30261), renderer.run_plugin('/lock_artist/%s' % self.id)))
         return cm
 
     @property
@@ -327,21 +391,24 @@ class ArtistItem(tidal.Artist, HasListItem):
 
 class FolderItem(tidal.Folder, HasListItem):
 
-    def __init__(self, item):
-        self.__dict__.update(vars(item))
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            tidal.Folder.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
 
     def getLabel(self, extended=True):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         label = self.name
         if extended:
-            label = self.FOLDER_MASK.format(label=label)
+            label = renderer.FOLDER_MASK.format(label=label)
             if str(self.id) == settings.default_folder_id:
-                return self.DEFAULT_PLAYLIST_MASK.format(label=label, mediatype=_P('playlists'))
+                return renderer.DEFAULT_PLAYLIST_MASK.format(label=label, mediatype=_P('playlists'))
         return label
 
     def getListItem(self):
         li = HasListItem.getListItem(self)
-        url = plugin.url_for_path('/user_folders/%s' % self.id)
+        url = ListRenderer.current().url('/user_folders/%s' % self.id)
         if KODI_VERSION >= (20, 0):
             tag = li.getMusicInfoTag()
             tag.setMediaType('music')
@@ -376,37 +443,41 @@ class FolderItem(tidal.Folder, HasListItem):
 
     def getContextMenuItems(self, onlyInfoItems=False):
         cm = []
+        renderer = ListRenderer.current()
         if not onlyInfoItems:
-            cm.append((_T(Msg.i30251).format(what=_T('folder'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_folder/rename/%s' % self.id)))
+            cm.append((renderer.menu_text(Msg.i30251, 'folder'), renderer.run_plugin('/user_folder/rename/%s' % self.id)))
             if self.totalNumberOfItems == 0:
-                cm.append((_T(Msg.i30235).format(what=_T('folder'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_folder/delete/%s' % self.id)))
-            cm.append((_T(Msg.i30237).format(what=_T('folder'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_folder/create')))
+                cm.append((renderer.menu_text(Msg.i30235, 'folder'), renderer.run_plugin('/user_folder/delete/%s' % self.id)))
+            cm.append((renderer.menu_text(Msg.i30237, 'folder'), renderer.run_plugin('/user_folder/create')))
             if str(self.id) == settings.default_folder_id:
-                cm.append((_T(Msg.i30250).format(what=_P('playlist')), 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist_reset_default/folder')))
+                cm.append((renderer.text(Msg.i30250).format(what=_P('playlist')), renderer.run_plugin('/user_playlist_reset_default/folder')))
             else:
-                cm.append((_T(Msg.i30249).format(what=_P('playlist')), 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist_set_default/folder/%s' % self.id)))
+                cm.append((renderer.text(Msg.i30249).format(what=_P('playlist')), renderer.run_plugin('/user_playlist_set_default/folder/%s' % self.id)))
         return cm
 
 
 class MixItem(tidal.Mix, HasListItem):
 
-    def __init__(self, item):
-        self.__dict__.update(vars(item))
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            tidal.Mix.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
 
     def getLabel(self, extended=True):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         label = self.getLongTitle()
         if extended and self._isFavorite and not '/favorites/' in sys.argv[0]:
-            label = self.FAVORITE_MASK.format(label=label)
+            label = renderer.FAVORITE_MASK.format(label=label)
         return label
 
     def getLongTitle(self):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         longTitle = '%s' % self.name
         if 'MASTER' in self.mixType and settings.mqa_in_labels:
-            longTitle = self.MASTER_AUDIO_MASK.format(label=longTitle)
+            longTitle = renderer.MASTER_AUDIO_MASK.format(label=longTitle)
         if 'DOLBY' in self.mixType and settings.mqa_in_labels:
-            longTitle = self.DOLBY_ATMOS_MASK.format(label=longTitle)
+            longTitle = renderer.DOLBY_ATMOS_MASK.format(label=longTitle)
         return longTitle
 
     def getSortCriteria(self, sortType=ItemSortType.DATE):
@@ -423,7 +494,7 @@ class MixItem(tidal.Mix, HasListItem):
 
     def getListItem(self):
         li = HasListItem.getListItem(self)
-        url = plugin.url_for_path('/mix/%s' % self.id)
+        url = ListRenderer.current().url('/mix/%s' % self.id)
         if KODI_VERSION >= (20, 0):
             tag = li.getMusicInfoTag()
             tag.setMediaType('music')
@@ -447,18 +518,22 @@ class MixItem(tidal.Mix, HasListItem):
 
     def getContextMenuItems(self, onlyInfoItems=False):
         cm = []
+        renderer = ListRenderer.current()
         if self._is_logged_in and not onlyInfoItems:
             if self._isFavorite:
-                cm.append((_T(Msg.i30220), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/remove/mixes/%s' % self.id)))
+                cm.append((renderer.text(Msg.i30220), renderer.run_plugin('/favorites/remove/mixes/%s' % self.id)))
             else:
-                cm.append((_T(Msg.i30219), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/add/mixes/%s' % self.id)))
+                cm.append((renderer.text(Msg.i30219), renderer.run_plugin('/favorites/add/mixes/%s' % self.id)))
         return cm
 
 
 class PlaylistItem(tidal.Playlist, HasListItem):
 
-    def __init__(self, item):
-        self.__dict__.update(vars(item))
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            tidal.Playlist.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
         # Fix negative number of tracks/videos in playlist
         if self.numberOfItems > 0 and self.numberOfTracks < 0:
             self.numberOfVideos += self.numberOfTracks
@@ -471,10 +546,10 @@ class PlaylistItem(tidal.Playlist, HasListItem):
         self._parentFolderIdFromCache = False
 
     def getLabel(self, extended=True):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         label = self.name
         if extended and self._isFavorite and not '/favorites/' in sys.argv[0]:
-            label = self.FAVORITE_MASK.format(label=label)
+            label = renderer.FAVORITE_MASK.format(label=label)
         if self.isUserPlaylist and ('user_playlists' in sys.argv[0] or 'user_folders' in sys.argv[0]):
             defaultpl = []
             if str(self.id) == settings.default_trackplaylist_id:
@@ -484,11 +559,11 @@ class PlaylistItem(tidal.Playlist, HasListItem):
             if str(self.id) == settings.default_albumplaylist_id:
                 defaultpl.append(_P('albums'))
             if len(defaultpl) > 0:
-                label = self.DEFAULT_PLAYLIST_MASK.format(label=label, mediatype=', '.join(defaultpl))
+                label = renderer.DEFAULT_PLAYLIST_MASK.format(label=label, mediatype=', '.join(defaultpl))
         if extended and self.parentFolderId and not 'user_folders' in sys.argv[0]:
-            label = self.USER_PLAYLIST_MASK.format(label=label, userpl=self.parentFolderName)
+            label = renderer.USER_PLAYLIST_MASK.format(label=label, userpl=self.parentFolderName)
         if extended and self.isPublic and not 'my_public_playlists' in sys.argv[0]:
-            label = self.FOLLOWER_MASK.format(label=label, follower=self.creatorName or _T(Msg.i30311))
+            label = renderer.FOLLOWER_MASK.format(label=label, follower=self.creatorName or renderer.text(Msg.i30311))
         return label
 
     def getSortCriteria(self, sortType=ItemSortType.DATE):
@@ -508,7 +583,7 @@ class PlaylistItem(tidal.Playlist, HasListItem):
         path = '/playlist/%s/items'
         if self.isUserPlaylist and settings.album_playlist_tag in self.description:
             path = '/playlist/%s/albums'
-        url = plugin.url_for_path(path % self.id)
+        url = ListRenderer.current().url(path % self.id)
         if KODI_VERSION >= (20, 0):
             tag = li.getMusicInfoTag()
             tag.setMediaType('music')
@@ -550,83 +625,91 @@ class PlaylistItem(tidal.Playlist, HasListItem):
 
     def getContextMenuItems(self, onlyInfoItems=False):
         cm = []
+        renderer = ListRenderer.current()
         if self.numberOfVideos > 0:
-            cm.append((_T(Msg.i30252), 'Container.Update(%s)' % plugin.url_for_path('/playlist/%s/tracks' % self.id)))
+            cm.append((renderer.text(Msg.i30252), renderer.update_container('/playlist/%s/tracks' % self.id)))
         if self.isUserPlaylist and settings.album_playlist_tag in self.description:
-            cm.append((_T(Msg.i30254), 'Container.Update(%s)' % plugin.url_for_path('/playlist/%s/items' % self.id)))
+            cm.append((renderer.text(Msg.i30254), renderer.update_container('/playlist/%s/items' % self.id)))
         else:
-            cm.append((_T(Msg.i30255), 'Container.Update(%s)' % plugin.url_for_path('/playlist/%s/albums' % self.id)))
+            cm.append((renderer.text(Msg.i30255), renderer.update_container('/playlist/%s/albums' % self.id)))
         if self._is_logged_in and not onlyInfoItems:
             if self.isUserPlaylist: # and ('user_playlists' in sys.argv[0] or 'user_folders' in sys.argv[0]):
-                cm.append((_T(Msg.i30266).format(what=_T('playlist'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist_cm/%s' % self.id)))
+                cm.append((renderer.menu_text(Msg.i30266, 'playlist'), renderer.run_plugin('/user_playlist_cm/%s' % self.id)))
                 if self.isPublic:
-                    cm.append((_T(Msg.i30315), 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/set_private/%s' % self.id)))
+                    cm.append((renderer.text(Msg.i30315), renderer.run_plugin('/user_playlist/set_private/%s' % self.id)))
                 else:
-                    cm.append((_T(Msg.i30314), 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/set_public/%s' % self.id)))
+                    cm.append((renderer.text(Msg.i30314), renderer.run_plugin('/user_playlist/set_public/%s' % self.id)))
             else:
                 if self._isFavorite:
-                    cm.append((_T(Msg.i30220), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/remove/playlists/%s' % self.id)))
+                    cm.append((renderer.text(Msg.i30220), renderer.run_plugin('/favorites/remove/playlists/%s' % self.id)))
                 else:
-                    cm.append((_T(Msg.i30219), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/add/playlists/%s' % self.id)))
+                    cm.append((renderer.text(Msg.i30219), renderer.run_plugin('/favorites/add/playlists/%s' % self.id)))
                 if '%s' % self.creatorId != '%s' % settings.user_id:
-                    cm.append((_T(Msg.i30292).format(what=self.creatorName or _T('userprofile')), 'Container.Update(%s)' % plugin.url_for_path('/userprofile/%s' % self.creatorId)))
-            cm.append((_T(Msg.i30239).format(what=_T('playlist'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/add/playlist/%s' % self.id)))
+                    cm.append((renderer.text(Msg.i30292).format(what=self.creatorName or _T('userprofile')), renderer.update_container('/userprofile/%s' % self.creatorId)))
+            cm.append((renderer.menu_text(Msg.i30239, 'playlist'), renderer.run_plugin('/user_playlist/add/playlist/%s' % self.id)))
             if self.parentFolderId:
-                cm.append((_T(Msg.i30240).format(what=_T('folder'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_folder/remove/%s/%s' % (self.parentFolderId, self.id))))
-                cm.append((_T(Msg.i30248).format(what=_T('folder'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_folder/move/%s' % self.id)))
+                cm.append((renderer.menu_text(Msg.i30240, 'folder'), renderer.run_plugin('/user_folder/remove/%s/%s' % (self.parentFolderId, self.id))))
+                cm.append((renderer.menu_text(Msg.i30248, 'folder'), renderer.run_plugin('/user_folder/move/%s' % self.id)))
             else:
-                cm.append((_T(Msg.i30239).format(what=_T('folder'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_folder/add/%s' % self.id)))
+                cm.append((renderer.menu_text(Msg.i30239, 'folder'), renderer.run_plugin('/user_folder/add/%s' % self.id)))
         return cm
 
 
 class TrackItem(tidal.Track, HasListItem):
 
-    def __init__(self, item):
-        self.__dict__.update(vars(item))
+    _userplaylists = {} # Filled by parser
+
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            # Created from the JSON data. The parser adds the artists and the album.
+            tidal.Track.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
+            self.artist = ArtistItem(self.artist)
+            self.artists = [ArtistItem(artist) for artist in self.artists]
+            self._ftArtists = [ArtistItem(artist) for artist in self._ftArtists]
+            self.album = AlbumItem(self.album)
         if self.version and not self.version in self.title:
             self.title += ' (%s)' % self.version
             self.version = None
-        self.artist = ArtistItem(self.artist)
-        self.artists = [ArtistItem(artist) for artist in self.artists]
-        self._ftArtists = [ArtistItem(artist) for artist in self._ftArtists]
-        self.album = AlbumItem(self.album)
-        self._userplaylists = {} # Filled by parser
 
     def getPlaybackTag(self, quality=None):
-        if self.isSony360RA:
+        flags = self._mediaFlags
+        if flags & tidal.MediaFlags.sony_360:
             return tidal.MediaMetadataTags.sony_360
-        if self.isDolbyAtmos and settings.isAtmosClientID:
+        if flags & tidal.MediaFlags.dolby_atmos and settings.isAtmosClientID:
             return tidal.MediaMetadataTags.dolby_atmos
-        if self.isHiRes and settings.isHiResClientID and quality in [None, tidal.Quality.hi_res_lossless, tidal.Quality.hi_res]:
+        hires = quality in HIRES_QUALITIES
+        if hires and flags & tidal.MediaFlags.hires_lossless and settings.isHiResClientID:
             return tidal.MediaMetadataTags.hires_lossless
-        if self.isMqa and quality in [None, tidal.Quality.hi_res_lossless, tidal.Quality.hi_res]:
+        if hires and flags & tidal.MediaFlags.mqa:
             return tidal.MediaMetadataTags.mqa
-        if self.isDolbyAtmos:
+        if flags & tidal.MediaFlags.dolby_atmos:
             return tidal.MediaMetadataTags.dolby_atmos
-        if quality in [None, tidal.Quality.hi_res_lossless, tidal.Quality.hi_res]:
+        if hires:
             return tidal.MediaMetadataTags.lossless
         return None
 
     def getLabel(self, extended=True):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         label1 = self.artist.getLabel(extended=extended if self.available else False)
         label2 = self.getLongTitle()
         if extended and self._isFavorite and self.available and not '/favorites/' in sys.argv[0]:
-            label2 = self.FAVORITE_MASK.format(label=label2)
+            label2 = renderer.FAVORITE_MASK.format(label=label2)
         label = '%s - %s' % (label1, label2)
         if extended and not self.available:
-            label = self.STREAM_LOCKED_MASK.format(label=label, info=_T(Msg.i30242))
+            label = renderer.STREAM_LOCKED_MASK.format(label=label, info=renderer.text(Msg.i30242))
         txt = []
         plids = list(self._userplaylists.keys())
         for plid in plids:
             if plid != self._playlist_id:
                 txt.append('%s' % self._userplaylists.get(plid).get('title'))
         if extended and txt:
-            label = self.USER_PLAYLIST_MASK.format(label=label, userpl=', '.join(txt))
+            label = renderer.USER_PLAYLIST_MASK.format(label=label, userpl=', '.join(txt))
         return label
 
     def getLongTitle(self):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         longTitle = self.title
         if self.version and not self.version in self.title:
             longTitle += ' (%s)' % self.version
@@ -635,13 +718,13 @@ class TrackItem(tidal.Track, HasListItem):
         if settings.mqa_in_labels:
             tag = self.getPlaybackTag()
             if tag == tidal.MediaMetadataTags.mqa:
-                longTitle = self.MASTER_AUDIO_MASK.format(label=longTitle)
+                longTitle = renderer.MASTER_AUDIO_MASK.format(label=longTitle)
             elif tag == tidal.MediaMetadataTags.hires_lossless:
-                longTitle = self.HIRES_MASK.format(label=longTitle)
+                longTitle = renderer.HIRES_MASK.format(label=longTitle)
             elif tag == tidal.MediaMetadataTags.dolby_atmos:
-                longTitle = self.DOLBY_ATMOS_MASK.format(label=longTitle)
+                longTitle = renderer.DOLBY_ATMOS_MASK.format(label=longTitle)
             elif tag == tidal.MediaMetadataTags.sony_360:
-                longTitle = self.SONY_360RA_MASK.format(label=longTitle)
+                longTitle = renderer.SONY_360RA_MASK.format(label=longTitle)
         return longTitle
 
     def getSortText(self, mode=None):
@@ -687,10 +770,10 @@ class TrackItem(tidal.Track, HasListItem):
     def getListItem(self, lyrics=None):
         li = HasListItem.getListItem(self)
         if self.available:
-            url = plugin.url_for_path('/play_track/%s/%s' % (self.id, self.album.id))
+            url = ListRenderer.current().url('/play_track/%s/%s' % (self.id, self.album.id))
             isFolder = False
         else:
-            url = plugin.url_for_path('/stream_locked')
+            url = ListRenderer.current().url('/stream_locked')
             isFolder = True
         longTitle = self.title
         if self.explicit and not 'Explicit' in self.title:
@@ -747,31 +830,32 @@ class TrackItem(tidal.Track, HasListItem):
 
     def getContextMenuItems(self, onlyInfoItems=False):
         cm = []
+        renderer = ListRenderer.current()
         if self._is_logged_in and not onlyInfoItems:
             if self._isFavorite:
-                cm.append((_T(Msg.i30220), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/remove/tracks/%s' % self.id)))
+                cm.append((renderer.text(Msg.i30220), renderer.run_plugin('/favorites/remove/tracks/%s' % self.id)))
             else:
-                cm.append((_T(Msg.i30219), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/add/tracks/%s' % self.id)))
+                cm.append((renderer.text(Msg.i30219), renderer.run_plugin('/favorites/add/tracks/%s' % self.id)))
             if self._playlist_type == 'USER':
-                cm.append((_T(Msg.i30240).format(what=_T('playlist'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/remove/%s/%s' % (self._playlist_id, self._playlist_pos))))
-                cm.append((_T(Msg.i30248).format(what=_T('playlist'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/move/%s/%s/%s' % (self._playlist_id, self._playlist_pos, self.id))))
+                cm.append((renderer.menu_text(Msg.i30240, 'playlist'), renderer.run_plugin('/user_playlist/remove/%s/%s' % (self._playlist_id, self._playlist_pos))))
+                cm.append((renderer.menu_text(Msg.i30248, 'playlist'), renderer.run_plugin('/user_playlist/move/%s/%s/%s' % (self._playlist_id, self._playlist_pos, self.id))))
             else:
-                cm.append((_T(Msg.i30239).format(what=_T('playlist'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/add/track/%s' % self.id)))
+                cm.append((renderer.menu_text(Msg.i30239, 'playlist'), renderer.run_plugin('/user_playlist/add/track/%s' % self.id)))
             plids = list(self._userplaylists.keys())
             for plid in plids:
                 if plid != self._playlist_id:
                     playlist = self._userplaylists[plid]
                     if '%s' % self.album.id in playlist.get('album_ids', []):
-                        cm.append(((_T(Msg.i30247).format(name=playlist.get('title'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/remove_album/%s/%s' % (plid, self.album.id)))))
+                        cm.append(((renderer.text(Msg.i30247).format(name=playlist.get('title'))+' ...', renderer.run_plugin('/user_playlist/remove_album/%s/%s' % (plid, self.album.id)))))
                     else:
-                        cm.append(((_T(Msg.i30247).format(name=playlist.get('title'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/remove_id/%s/%s' % (plid, self.id)))))
+                        cm.append(((renderer.text(Msg.i30247).format(name=playlist.get('title'))+' ...', renderer.run_plugin('/user_playlist/remove_id/%s/%s' % (plid, self.id)))))
         if len(self.artists) > 1:
-            cm.append((_T(Msg.i30221), 'RunPlugin(%s)' % plugin.url_for_path('/artists/%s' % '-'.join(['%s' % artist.id for artist in self.artists]))))
+            cm.append((renderer.text(Msg.i30221), renderer.run_plugin('/artists/%s' % '-'.join(['%s' % artist.id for artist in self.artists]))))
         else:
-            cm.append((_T(Msg.i30221), 'Container.Update(%s)' % plugin.url_for_path('/artist/%s' % self.artist.id)))
-        cm.append((_T(Msg.i30245), 'Container.Update(%s)' % plugin.url_for_path('/album/%s' % self.album.id)))
-        cm.append((_T(Msg.i30222), 'Container.Update(%s)' % plugin.url_for_path('/track_radio/%s' % self.id)))
-        cm.append((_T(Msg.i30223), 'Container.Update(%s)' % plugin.url_for_path('/recommended/tracks/%s' % self.id)))
+            cm.append((renderer.text(Msg.i30221), renderer.update_container('/artist/%s' % self.artist.id)))
+        cm.append((renderer.text(Msg.i30245), renderer.update_container('/album/%s' % self.album.id)))
+        cm.append((renderer.text(Msg.i30222), renderer.update_container('/track_radio/%s' % self.id)))
+        cm.append((renderer.text(Msg.i30223), renderer.update_container('/recommended/tracks/%s' % self.id)))
         return cm
 
     @property
@@ -784,18 +868,21 @@ class TrackItem(tidal.Track, HasListItem):
 
 class BroadcastItem(tidal.Broadcast, HasListItem):
 
-    def __init__(self, item):
-        self.__dict__.update(vars(item))
-        self.track = item.track
-        self.profile = item.profile
-        self.artist = item.artist
-        self.artists = item.artists
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            tidal.Broadcast.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
+            self.track = item.track
+            self.profile = item.profile
+            self.artist = item.artist
+            self.artists = item.artists
 
     def getLabel(self, extended=True):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         label = self.title
         if extended and isinstance(self.profile, UserProfileItem):
-            label = self.FOLLOWER_MASK.format(label=label, follower=self.profile.name or _T(Msg.i30311))
+            label = renderer.FOLLOWER_MASK.format(label=label, follower=self.profile.name or renderer.text(Msg.i30311))
         return label
 
     def getComment(self):
@@ -804,7 +891,7 @@ class BroadcastItem(tidal.Broadcast, HasListItem):
 
     def getListItem(self, lyrics=None):
         li = HasListItem.getListItem(self)
-        url = plugin.url_for_path('/play_broadcast/%s/%s' % (self.id, self.track.id))
+        url = ListRenderer.current().url('/play_broadcast/%s/%s' % (self.id, self.track.id))
         longTitle = self.title
         if KODI_VERSION >= (20, 0):
             tag = li.getMusicInfoTag()
@@ -829,13 +916,14 @@ class BroadcastItem(tidal.Broadcast, HasListItem):
 
     def getContextMenuItems(self, onlyInfoItems=False):
         cm = []
+        renderer = ListRenderer.current()
         if isinstance(self.profile, UserProfileItem):
-            cm.append((_T(Msg.i30292).format(what=self.profile.name or _T('userprofile')), 'Container.Update(%s)' % plugin.url_for_path('/userprofile/%s' % self.profile.id)))
+            cm.append((renderer.text(Msg.i30292).format(what=self.profile.name or _T('userprofile')), renderer.update_container('/userprofile/%s' % self.profile.id)))
         if len(self.track.artists) > 1:
-            cm.append((_T(Msg.i30221), 'RunPlugin(%s)' % plugin.url_for_path('/artists/%s' % '-'.join(['%s' % artist.id for artist in self.track.artists]))))
+            cm.append((renderer.text(Msg.i30221), renderer.run_plugin('/artists/%s' % '-'.join(['%s' % artist.id for artist in self.track.artists]))))
         else:
-            cm.append((_T(Msg.i30221), 'Container.Update(%s)' % plugin.url_for_path('/artist/%s' % self.artist.id)))
-        cm.append((_T(Msg.i30245), 'Container.Update(%s)' % plugin.url_for_path('/album/%s' % self.album.id)))
+            cm.append((renderer.text(Msg.i30221), renderer.update_container('/artist/%s' % self.artist.id)))
+        cm.append((renderer.text(Msg.i30245), renderer.update_container('/album/%s' % self.album.id)))
         return cm
 
     @property
@@ -853,32 +941,37 @@ class BroadcastItem(tidal.Broadcast, HasListItem):
 
 class VideoItem(tidal.Video, HasListItem):
 
-    def __init__(self, item):
-        self.__dict__.update(vars(item))
-        self.artist = ArtistItem(self.artist)
-        self.artists = [ArtistItem(artist) for artist in self.artists]
-        self._ftArtists = [ArtistItem(artist) for artist in self._ftArtists]
-        self.album = AlbumItem(self.album) if self.album else None
-        self._userplaylists = {} # Filled by parser
+    _userplaylists = {} # Filled by parser
+
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            # Created from the JSON data. The parser adds the artists and the album.
+            tidal.Video.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
+            self.artist = ArtistItem(self.artist)
+            self.artists = [ArtistItem(artist) for artist in self.artists]
+            self._ftArtists = [ArtistItem(artist) for artist in self._ftArtists]
+            self.album = AlbumItem(self.album) if self.album else None
 
     def getLabel(self, extended=True):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         label1 = self.artist.name
         if extended and self.artist._isFavorite and self.available:
-            label1 = self.FAVORITE_MASK.format(label=label1)
+            label1 = renderer.FAVORITE_MASK.format(label=label1)
         label2 = self.getLongTitle()
         if extended and self._isFavorite and self.available and not '/favorites/' in sys.argv[0]:
-            label2 = self.FAVORITE_MASK.format(label=label2)
+            label2 = renderer.FAVORITE_MASK.format(label=label2)
         label = '%s - %s' % (label1, label2)
         if extended and not self.available:
-            label = self.STREAM_LOCKED_MASK.format(label=label, info=_T(Msg.i30242))
+            label = renderer.STREAM_LOCKED_MASK.format(label=label, info=renderer.text(Msg.i30242))
         txt = []
         plids = list(self._userplaylists.keys())
         for plid in plids:
             if plid != self._playlist_id:
                 txt.append('%s' % self._userplaylists.get(plid).get('title'))
         if extended and txt:
-            label = self.USER_PLAYLIST_MASK.format(label=label, userpl=', '.join(txt))
+            label = renderer.USER_PLAYLIST_MASK.format(label=label, userpl=', '.join(txt))
         return label
 
     def getLongTitle(self):
@@ -919,10 +1012,10 @@ class VideoItem(tidal.Video, HasListItem):
     def getListItem(self):
         li = HasListItem.getListItem(self)
         if self.available:
-            url = plugin.url_for_path('/play_video/%s' % self.id)
+            url = ListRenderer.current().url('/play_video/%s' % self.id)
             isFolder = False
         else:
-            url = plugin.url_for_path('/stream_locked')
+            url = ListRenderer.current().url('/stream_locked')
             isFolder = True
         if KODI_VERSION >= (20, 0):
             tag = li.getVideoInfoTag()
@@ -980,55 +1073,60 @@ class VideoItem(tidal.Video, HasListItem):
 
     def getContextMenuItems(self, onlyInfoItems=False):
         cm = []
+        renderer = ListRenderer.current()
         if self._is_logged_in and not onlyInfoItems:
             if self._isFavorite:
-                cm.append((_T(Msg.i30220), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/remove/videos/%s' % self.id)))
+                cm.append((renderer.text(Msg.i30220), renderer.run_plugin('/favorites/remove/videos/%s' % self.id)))
             else:
-                cm.append((_T(Msg.i30219), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/add/videos/%s' % self.id)))
+                cm.append((renderer.text(Msg.i30219), renderer.run_plugin('/favorites/add/videos/%s' % self.id)))
             if self._playlist_type == 'USER':
-                cm.append((_T(Msg.i30240).format(what=_T('playlist'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/remove/%s/%s' % (self._playlist_id, self._playlist_pos))))
-                cm.append((_T(Msg.i30248).format(what=_T('playlist'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/move/%s/%s/%s' % (self._playlist_id, self._playlist_pos, self.id))))
+                cm.append((renderer.menu_text(Msg.i30240, 'playlist'), renderer.run_plugin('/user_playlist/remove/%s/%s' % (self._playlist_id, self._playlist_pos))))
+                cm.append((renderer.menu_text(Msg.i30248, 'playlist'), renderer.run_plugin('/user_playlist/move/%s/%s/%s' % (self._playlist_id, self._playlist_pos, self.id))))
             else:
-                cm.append((_T(Msg.i30239).format(what=_T('playlist'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/add/video/%s' % self.id)))
+                cm.append((renderer.menu_text(Msg.i30239, 'playlist'), renderer.run_plugin('/user_playlist/add/video/%s' % self.id)))
             plids = list(self._userplaylists.keys())
             for plid in plids:
                 if plid != self._playlist_id:
-                    cm.append(((_T(Msg.i30247).format(name=self._userplaylists[plid].get('title'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/remove_id/%s/%s' % (plid, self.id)))))
+                    cm.append(((renderer.text(Msg.i30247).format(name=self._userplaylists[plid].get('title'))+' ...', renderer.run_plugin('/user_playlist/remove_id/%s/%s' % (plid, self.id)))))
         if len(self.artists) > 1:
-            cm.append((_T(Msg.i30221), 'RunPlugin(%s)' % plugin.url_for_path('/artists/%s' % '-'.join(['%s' % artist.id for artist in self.artists]))))
+            cm.append((renderer.text(Msg.i30221), renderer.run_plugin('/artists/%s' % '-'.join(['%s' % artist.id for artist in self.artists]))))
         else:
-            cm.append((_T(Msg.i30221), 'Container.Update(%s)' % plugin.url_for_path('/artist/%s' % self.artist.id)))
-        cm.append((_T(Msg.i30224), 'Container.Update(%s)' % plugin.url_for_path('/recommended/videos/%s' % self.id)))
+            cm.append((renderer.text(Msg.i30221), renderer.update_container('/artist/%s' % self.artist.id)))
+        cm.append((renderer.text(Msg.i30224), renderer.update_container('/recommended/videos/%s' % self.id)))
         return cm
 
 
 class PromotionItem(tidal.Promotion, HasListItem):
 
-    def __init__(self, item):
-        if item.type != 'EXTURL' and item.id.startswith('http:'):
-            item.type = 'EXTURL' # Fix some defect TIDAL Promotions
-        self.__dict__.update(vars(item))
-        self._userplaylists = {} # Filled by parser
+    _userplaylists = {} # Filled by parser
+
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            tidal.Promotion.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
+        if self.type != 'EXTURL' and self.id.startswith('http:'):
+            self.type = 'EXTURL' # Fix some defect TIDAL Promotions
 
     def getLabel(self, extended=True):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         if self.type in ['ALBUM', 'VIDEO']:
             label = '%s - %s' % (self.shortHeader, self.shortSubHeader)
         else:
             label = self.shortHeader
         if extended and self._isFavorite:
-            label = self.FAVORITE_MASK.format(label=label)
+            label = renderer.FAVORITE_MASK.format(label=label)
         if extended:
             if self.type == 'PLAYLIST':
                 if extended and self.parentFolderId and not 'user_folders' in sys.argv[0]:
-                    label = self.USER_PLAYLIST_MASK.format(label=label, userpl=self.parentFolderName)
+                    label = renderer.USER_PLAYLIST_MASK.format(label=label, userpl=self.parentFolderName)
             else:
                 txt = []
                 plids = list(self._userplaylists.keys())
                 for plid in plids:
                     txt.append('%s' % self._userplaylists.get(plid).get('title'))
                 if txt:
-                    label = self.USER_PLAYLIST_MASK.format(label=label, userpl=', '.join(txt))
+                    label = renderer.USER_PLAYLIST_MASK.format(label=label, userpl=', '.join(txt))
         return label
 
     def getSortCriteria(self, sortType=ItemSortType.DATE):
@@ -1045,7 +1143,7 @@ class PromotionItem(tidal.Promotion, HasListItem):
         li = HasListItem.getListItem(self)
         isFolder = True
         if self.type == 'PLAYLIST':
-            url = plugin.url_for_path('/playlist/%s/items' % self.id)
+            url = ListRenderer.current().url('/playlist/%s/items' % self.id)
             if KODI_VERSION >= (20, 0):
                 tag = li.getMusicInfoTag()
                 tag.setMediaType('music')
@@ -1064,7 +1162,7 @@ class PromotionItem(tidal.Promotion, HasListItem):
                     infoLabel.update({'userrating': '%s' % int(round(self.popularity / 10.0))})
                 li.setInfo('music', infoLabel)
         elif self.type == 'ALBUM':
-            url = plugin.url_for_path('/album/%s' % self.id)
+            url = ListRenderer.current().url('/album/%s' % self.id)
             if KODI_VERSION >= (20, 0):
                 tag = li.getMusicInfoTag()
                 tag.setMediaType('music')
@@ -1085,7 +1183,7 @@ class PromotionItem(tidal.Promotion, HasListItem):
                                       })
                 li.setInfo('music', infoLabel)
         elif self.type == 'VIDEO':
-            url = plugin.url_for_path('/play_video/%s' % self.id)
+            url = ListRenderer.current().url('/play_video/%s' % self.id)
             if KODI_VERSION >= (20, 0):
                 tag = li.getVideoInfoTag()
                 tag.setMediaType('musicvideo')
@@ -1113,7 +1211,7 @@ class PromotionItem(tidal.Promotion, HasListItem):
             li.setProperty('isplayable', 'true')
             isFolder = False
         elif self.type == 'ARTIST':
-            url = plugin.url_for_path('/artist/%s' % self.id)
+            url = ListRenderer.current().url('/artist/%s' % self.id)
             if KODI_VERSION >= (20, 0):
                 tag = li.getMusicInfoTag()
                 tag.setMediaType('artist')
@@ -1137,36 +1235,37 @@ class PromotionItem(tidal.Promotion, HasListItem):
 
     def getContextMenuItems(self, onlyInfoItems=False):
         cm = []
+        renderer = ListRenderer.current()
         if self.type == 'PLAYLIST':
             if self._is_logged_in and not onlyInfoItems:
                 if self._isFavorite:
-                    cm.append((_T(Msg.i30220), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/remove/playlists/%s' % self.id)))
+                    cm.append((renderer.text(Msg.i30220), renderer.run_plugin('/favorites/remove/playlists/%s' % self.id)))
                 else:
-                    cm.append((_T(Msg.i30219), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/add/playlists/%s' % self.id)))
-                cm.append((_T(Msg.i30239).format(what=_T('playlist'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/add/playlist/%s' % self.id)))
+                    cm.append((renderer.text(Msg.i30219), renderer.run_plugin('/favorites/add/playlists/%s' % self.id)))
+                cm.append((renderer.menu_text(Msg.i30239, 'playlist'), renderer.run_plugin('/user_playlist/add/playlist/%s' % self.id)))
                 if self.parentFolderId:
-                    cm.append((_T(Msg.i30240).format(what=_T('folder'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_folder/remove/%s/%s' % (self.parentFolderId, self.id))))
-                    cm.append((_T(Msg.i30248).format(what=_T('folder'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_folder/move/%s' % self.id)))
+                    cm.append((renderer.menu_text(Msg.i30240, 'folder'), renderer.run_plugin('/user_folder/remove/%s/%s' % (self.parentFolderId, self.id))))
+                    cm.append((renderer.menu_text(Msg.i30248, 'folder'), renderer.run_plugin('/user_folder/move/%s' % self.id)))
                 else:
-                    cm.append((_T(Msg.i30239).format(what=_T('folder'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_folder/add/%s' % self.id)))
-            cm.append((_T(Msg.i30255), 'Container.Update(%s)' % plugin.url_for_path('/playlist/%s/albums' % self.id)))
+                    cm.append((renderer.menu_text(Msg.i30239, 'folder'), renderer.run_plugin('/user_folder/add/%s' % self.id)))
+            cm.append((renderer.text(Msg.i30255), renderer.update_container('/playlist/%s/albums' % self.id)))
         elif self.type == 'ALBUM':
             if self._is_logged_in and not onlyInfoItems:
                 if self._isFavorite:
-                    cm.append((_T(Msg.i30220), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/remove/albums/%s' % self.id)))
+                    cm.append((renderer.text(Msg.i30220), renderer.run_plugin('/favorites/remove/albums/%s' % self.id)))
                 else:
-                    cm.append((_T(Msg.i30219), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/add/albums/%s' % self.id)))
+                    cm.append((renderer.text(Msg.i30219), renderer.run_plugin('/favorites/add/albums/%s' % self.id)))
         elif self.type == 'VIDEO':
             if self._is_logged_in and not onlyInfoItems:
                 if self._isFavorite:
-                    cm.append((_T(Msg.i30220), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/remove/videos/%s' % self.id)))
+                    cm.append((renderer.text(Msg.i30220), renderer.run_plugin('/favorites/remove/videos/%s' % self.id)))
                 else:
-                    cm.append((_T(Msg.i30219), 'RunPlugin(%s)' % plugin.url_for_path('/favorites/add/videos/%s' % self.id)))
-                cm.append((_T(Msg.i30239).format(what=_T('playlist'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/add/video/%s' % self.id)))
+                    cm.append((renderer.text(Msg.i30219), renderer.run_plugin('/favorites/add/videos/%s' % self.id)))
+                cm.append((renderer.menu_text(Msg.i30239, 'playlist'), renderer.run_plugin('/user_playlist/add/video/%s' % self.id)))
                 plids = list(self._userplaylists.keys())
                 for plid in plids:
-                    cm.append(((_T(Msg.i30247).format(name=self._userplaylists[plid].get('title'))+' ...', 'RunPlugin(%s)' % plugin.url_for_path('/user_playlist/remove_id/%s/%s' % (plid, self.id)))))
-                cm.append((_T(Msg.i30224), 'Container.Update(%s)' % plugin.url_for_path('/recommended/videos/%s' % self.id)))
+                    cm.append(((renderer.text(Msg.i30247).format(name=self._userplaylists[plid].get('title'))+' ...', renderer.run_plugin('/user_playlist/remove_id/%s/%s' % (plid, self.id)))))
+                cm.append((renderer.text(Msg.i30224), renderer.update_container('/recommended/videos/%s' % self.id)))
         return cm
 
 
@@ -1175,13 +1274,16 @@ class CategoryItem(tidal.Category, HasListItem):
     _force_subfolders = False
     _label = None
 
-    def __init__(self, item):
-        self.__dict__.update(vars(item))
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            tidal.Category.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
 
     def getLabel(self, extended=True):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         if extended:
-            return self.FOLDER_MASK.format(label=self._label)
+            return renderer.FOLDER_MASK.format(label=self._label)
         return self._label
 
     def getListItems(self):
@@ -1189,7 +1291,7 @@ class CategoryItem(tidal.Category, HasListItem):
         items = []
         if len(content_types) > 1 and self._group in ['moods', 'genres'] and not self._force_subfolders:
             # Use sub folders for multiple Content Types
-            url = plugin.url_for_path('/category/%s/%s' % (self._group, self.path))
+            url = ListRenderer.current().url('/category/%s/%s' % (self._group, self.path))
             self._label = _P(self.path, self.name)
             li = HasListItem.getListItem(self)
             if KODI_VERSION >= (20, 0):
@@ -1203,7 +1305,7 @@ class CategoryItem(tidal.Category, HasListItem):
             items.append((url, li, True))
         else:
             for content_type in content_types:
-                url = plugin.url_for_path('/category/%s/%s/%s' % (self._group, self.path, content_type))
+                url = ListRenderer.current().url('/category/%s/%s/%s' % (self._group, self.path, content_type))
                 if len(content_types) > 1:
                     if self._force_subfolders:
                         # Show only Content Type as sub folders
@@ -1231,25 +1333,25 @@ class CategoryItem(tidal.Category, HasListItem):
 
 class UserProfileItem(tidal.UserProfile, HasListItem):
 
-    def __init__(self, item):
-        #prompts = item.prompts
-        #item.prompts = []
-        self.__dict__.update(vars(item))
-        #self.prompts = prompts
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            tidal.UserProfile.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
 
     def getLabel(self, extended=True):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         label = self.name
         if extended:
             if self.blocked:
-                label = self.STREAM_LOCKED_MASK.format(label=label, info=_T(Msg.i30242))
+                label = renderer.STREAM_LOCKED_MASK.format(label=label, info=renderer.text(Msg.i30242))
             if self.imFollowing and not 'im_following' in sys.argv[0]:
-                label = self.FOLLOWER_MASK.format(label=label, follower=_T(Msg.i30313))
+                label = renderer.FOLLOWER_MASK.format(label=label, follower=renderer.text(Msg.i30313))
         return label
 
     def getListItem(self):
         li = HasListItem.getListItem(self)
-        url = plugin.url_for_path('/userprofile/%s' % self.id)
+        url = ListRenderer.current().url('/userprofile/%s' % self.id)
         if KODI_VERSION >= (20, 0):
             tag = li.getMusicInfoTag()
             tag.setMediaType('music')
@@ -1265,31 +1367,38 @@ class UserProfileItem(tidal.UserProfile, HasListItem):
 
     def getContextMenuItems(self, onlyInfoItems=False):
         cm = []
+        renderer = ListRenderer.current()
         if not onlyInfoItems:
             if self.imFollowing:
-                cm.append((_T(Msg.i30319), 'RunPlugin(%s)' % plugin.url_for_path('/unfollow_user/%s' % self.id)))
+                cm.append((renderer.text(Msg.i30319), renderer.run_plugin('/unfollow_user/%s' % self.id)))
             else:
-                cm.append((_T(Msg.i30318), 'RunPlugin(%s)' % plugin.url_for_path('/follow_user/%s' % self.id)))
+                cm.append((renderer.text(Msg.i30318), renderer.run_plugin('/follow_user/%s' % self.id)))
         return cm
 
 
 class UserPromptItem(tidal.UserPrompt, HasListItem):
 
-    def __init__(self, item):
-        self.__dict__.update(vars(item))
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            tidal.UserPrompt.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
 
     def getLabel(self, extended=True):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         label = self.name
         if self.data:
             if self.supportedContentType in ['TRACK', 'ALBUM']:
-                self.data.artist.name = self.name
-                self.data.artist._isFavorite = False
+                # The artist object is shared with the other items of the listing
+                artist = copy.copy(self.data.artist)
+                artist.name = self.name
+                artist._isFavorite = False
+                self.data.artist = artist
                 label = self.data.getLabel(extended=extended)
             elif self.supportedContentType == 'ARTIST':
                 label = '%s - %s' % (self.name, self.data.getLabel(extended=extended))
         elif self._my_prompt and not settings.isFreeSubscription():
-            label = label + ' - %s ...' % _T(Msg.i30325).format(what=_T(self.supportedContentType.lower()))
+            label = label + ' - %s ...' % renderer.text(Msg.i30325).format(what=_T(self.supportedContentType.lower()))
         return label
 
     def getListItem(self):
@@ -1300,7 +1409,7 @@ class UserPromptItem(tidal.UserPrompt, HasListItem):
             li.setLabel(self.getLabel())
             return (url, li, isFolder)
         li = HasListItem.getListItem(self)
-        url = plugin.url_for_path('/userprompt/add/%s/%s' % (self.id, self.supportedContentType)) if self._my_prompt and not settings.isFreeSubscription() else None
+        url = ListRenderer.current().url('/userprompt/add/%s/%s' % (self.id, self.supportedContentType)) if self._my_prompt and not settings.isFreeSubscription() else None
         if KODI_VERSION >= (20, 0):
             tag = li.getMusicInfoTag()
             tag.setMediaType('music')
@@ -1313,10 +1422,11 @@ class UserPromptItem(tidal.UserPrompt, HasListItem):
 
     def getContextMenuItems(self, onlyInfoItems=False):
         cm = []
+        renderer = ListRenderer.current()
         if not onlyInfoItems and self._my_prompt and not settings.isFreeSubscription():
             if self.data:
-                cm.append((_T(Msg.i30278).format(name=_T(self.supportedContentType.lower()), what=_T(Msg.i30310)), 'RunPlugin(%s)' % plugin.url_for_path('/userprompt/remove/%s' % self.id)))
-            cm.append(('%s ...' % _T(Msg.i30325).format(what=_T(self.supportedContentType.lower())), 'RunPlugin(%s)' % plugin.url_for_path('/userprompt/add/%s/%s' % (self.id, self.supportedContentType))))
+                cm.append((renderer.text(Msg.i30278).format(name=_T(self.supportedContentType.lower()), what=renderer.text(Msg.i30310)), renderer.run_plugin('/userprompt/remove/%s' % self.id)))
+            cm.append(('%s ...' % renderer.text(Msg.i30325).format(what=_T(self.supportedContentType.lower())), renderer.run_plugin('/userprompt/add/%s/%s' % (self.id, self.supportedContentType))))
         return cm
 
 
@@ -1331,10 +1441,10 @@ class DirectoryItem(tidal.BrowsableMedia, HasListItem):
         self._otherLabel = otherLabel
 
     def getLabel(self, extended=True):
-        self.setLabelFormat()
+        renderer = ListRenderer.current()
         label = self._otherLabel if self._otherLabel else self.name
         if extended:
-            label = self.FOLDER_MASK.format(label=label)
+            label = renderer.FOLDER_MASK.format(label=label)
         return label
 
     def getListItem(self):
@@ -1364,8 +1474,11 @@ class TrackUrlItem(tidal.TrackUrl, HasListItem):
     def unplayableItem():
         return TrackUrlItem(tidal.TrackUrl(url=settings.unplayable_m4a, codec=tidal.Codec.M4A, mimeType=tidal.MimeType.audio_m4a))
 
-    def __init__(self, item):
-        self.__dict__.update(vars(item))
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            tidal.TrackUrl.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
 
     def getLabel(self, extended=False):
         return _T('track') + '-%s' % self.trackId
@@ -1400,6 +1513,13 @@ class TrackUrlItem(tidal.TrackUrl, HasListItem):
         # li.setProperty('inputstream.adaptive.manifest_update_parameter', 'full')
         xbmcgui.Window(10000).setProperty('tidal2.%s' % self.trackId, quote_plus(self.manifest))
 
+    def use_stream(self, li):
+        log.info("Using local stream for Dash playback")
+        li.setContentLookup(False)
+        self.url = 'http://localhost:%s/stream?track_id=%s&quality=%s' % (settings.fanart_server_port, self.trackId, self._requested_quality)
+        li.setMimeType(tidal.MimeType.audio_m4a)
+        xbmcgui.Window(10000).setProperty('tidal2.%s' % self.trackId, quote_plus(self.manifest))
+
     def getListItem(self, track=None):
         if isinstance(track, TrackItem):
             li = track.getListItem()[1]
@@ -1407,10 +1527,12 @@ class TrackUrlItem(tidal.TrackUrl, HasListItem):
             li = xbmcgui.ListItem()
         if self.isDASH:
             log.info("Got Dash stream with MimeType: %s" % self.get_mimeType())
-            if (tidal.MimeType.isFLAC(self.get_mimeType()) and settings.dash_flac_mode == Const.is_ffmpegdirect) or \
-               (not tidal.MimeType.isFLAC(self.get_mimeType()) and settings.dash_aac_mode == Const.is_ffmpegdirect):
+            dash_mode = settings.dash_flac_mode if tidal.MimeType.isFLAC(self.get_mimeType()) else settings.dash_aac_mode
+            if dash_mode == Const.is_stream:
+                self.use_stream(li)
+            elif dash_mode == Const.is_ffmpegdirect:
                 self.use_ffmpegdirect(li, use_hls=False if settings.ffmpegdirect_has_mpd else True)
-            elif not tidal.MimeType.isFLAC(self.get_mimeType()) and settings.dash_aac_mode == Const.is_adaptive:
+            elif dash_mode == Const.is_adaptive:
                 self.use_adaptive(li, use_hls=False)
             else:
                 log.info("Using HLS converter for Dash playback")
@@ -1434,8 +1556,11 @@ class TrackUrlItem(tidal.TrackUrl, HasListItem):
 
 class BroadcastUrlItem(tidal.BroadcastUrl, HasListItem):
 
-    def __init__(self, item):
-        self.__dict__.update(vars(item))
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            tidal.BroadcastUrl.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
 
     def getListItem(self, track):
         #li = track.getListItem()[1]
@@ -1482,8 +1607,11 @@ class VideoUrlItem(tidal.VideoUrl, HasListItem):
     def unplayableItem():
         return TrackUrlItem(tidal.TrackUrl(url=settings.unplayable_m4a, codec=tidal.Codec.M4A, mimeType=tidal.MimeType.audio_m4a))
 
-    def __init__(self, item):
-        self.__dict__.update(vars(item))
+    def __init__(self, item=None, **kwargs):
+        if item is None:
+            tidal.VideoUrl.__init__(self, **kwargs)
+        else:
+            self.__dict__.update(vars(item))
 
     def getLabel(self, extended=False):
         return _T('video') + '-%s' % self.videoId
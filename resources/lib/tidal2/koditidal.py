@@ -18,36 +18,91 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import sys
+import copy
+import json
 import traceback
 import datetime
 
 from kodi_six import xbmc, xbmcvfs, xbmcgui, xbmcplugin
 from requests import HTTPError
 
-from .common import KODI_VERSION, plugin
+from .common import KODI_VERSION, Const, plugin
 from .textids import Msg, _T
 from .debug import log
 from .config import settings
-from .tidalapi import Session, PKCE_Authenticator, AuthenticationError, User, Favorites, models as tidal
+from .storage import CacheStore
+from .stream import BandwidthEstimator, BANDWIDTH_PROPERTY, NEXT_TRACK_PROPERTY, select_quality
+from .tidalapi import Session, PKCE_Authenticator, AuthenticationError, User, Favorites, ServiceClient, URL_API_V1, models as tidal
 from .items import AlbumItem, ArtistItem, PlaylistItem, TrackItem, VideoItem, MixItem, \
                    FolderItem, CategoryItem, PromotionItem, DirectoryItem, TrackUrlItem, VideoUrlItem, \
-                   UserProfileItem, UserPromptItem, BroadcastItem, BroadcastUrlItem
+                   UserProfileItem, UserPromptItem, BroadcastItem, BroadcastUrlItem, ListRenderer
 
+cache_store = CacheStore(settings.cache_db_file, legacy_files={'favorites': settings.favorites_file,
+                                                               'locked_artists': settings.locked_artist_file,
+                                                               'playlists': settings.playlist_file,
+                                                               'folders': settings.folders_file,
+                                                               'userprofiles': settings.profiles_file})
+
+# Attribute names of the TidalUser caches and their database tables
+USER_CACHE_TABLES = {'playlists': 'playlists', 'folders': 'folders', 'profiles': 'userprofiles'}
 
 class TidalSession(Session):
 
     errorCodes = []
 
-    def __init__(self, config=None):
+    # The parser creates the Kodi items directly
+    item_classes = {
+        'artist': ArtistItem,
+        'album': AlbumItem,
+        'track': TrackItem,
+        'track_url': TrackUrlItem,
+        'video': VideoItem,
+        'video_url': VideoUrlItem,
+        'playlist': PlaylistItem,
+        'folder': FolderItem,
+        'promotion': PromotionItem,
+        'category': CategoryItem,
+        'mix': MixItem,
+        'broadcast': BroadcastItem,
+        'broadcast_url': BroadcastUrlItem,
+        'userprofile': UserProfileItem,
+        'userprompt': UserPromptItem,
+    }
+
+    def __init__(self, config=None, http=None):
         self._config = config if config else settings
-        self._cursor = ''
-        self._cursor_pos = 0
+        self._http = http
         self.user = TidalUser(self)
         self.load_session()
 
+    _service = None
+
+    @property
+    def service(self):
+        """ Client for the catalog results of the service. False if disabled or the service isn't running """
+        if self._service is None:
+            self._service = False
+            if self._config.service_backend and self._config.fanart_server_port:
+                key = xbmcgui.Window(10000).getProperty(Const.service_key_property)
+                if key:
+                    self._service = ServiceClient('http://127.0.0.1:%s/rpc/api' % self._config.fanart_server_port, key)
+        return self._service
+
+    def request(self, method, url=URL_API_V1, path=None, params=None, data=None, headers=None, authenticate=True):
+        if method == 'GET' and not data and not headers and authenticate and self.is_logged_in and not self.token_expired() and self.service:
+            r = self.service.request(url, path, params=params)
+            if r is not None:
+                return self.check_response(r)
+        return Session.request(self, method, url=url, path=path, params=params, data=data, headers=headers, authenticate=authenticate)
+
     def cleanup(self):
         if self._config:
             self._config.addon = None
+        if self._service:
+            log.info(self._service.statistics())
+            self._service.close()
+            self._service = None
+        cache_store.close()
         Session.cleanup(self)
 
     def load_session(self):
@@ -61,8 +116,8 @@ class TidalSession(Session):
         if not self._config.user_country_code or self._config.user_country_code == 'WW':
             self._config.user_country_code = self._config.country_code
         if self.is_logged_in:
+            # The playlist, folder and userprofile caches are loaded when they are used
             self.user.favorites.load_cache()
-            self.user.load_cache()
 
     def check_subscription(self):
         abo = None
@@ -207,7 +262,8 @@ class TidalSession(Session):
     def get_item_albums(self, items):
         albums = []
         for item in items:
-            album = item.album
+            # Copy the album because it can be shared by other tracks
+            album = copy.copy(item.album)
             if not album.releaseDate:
                 album.releaseDate = item.streamStartDate
             # Item-Position in the Kodi-List (filled by _map_request)
@@ -226,6 +282,7 @@ class TidalSession(Session):
             album.audioQuality = item.audioQuality
             album.audioModes = item.audioModes
             album.mediaMetadata = item.mediaMetadata
+            album._mediaFlags = item._mediaFlags
             albums.append(album)
         return albums
 
@@ -296,39 +353,31 @@ class TidalSession(Session):
         return items
 
     def _parse_album(self, json_obj, artist=None):
-        album = AlbumItem(Session._parse_album(self, json_obj, artist=artist))
+        album = Session._parse_album(self, json_obj, artist=artist)
         album._is_logged_in = self.is_logged_in
         if self.is_logged_in:
             album._userplaylists = self.user.playlists_of_id(None, album.id)
         return album
 
     def _parse_artist(self, json_obj):
-        artist = ArtistItem(Session._parse_artist(self, json_obj))
+        artist = Session._parse_artist(self, json_obj)
         if self.is_logged_in and self.user.favorites:
             artist._isLocked = self.user.favorites.isLockedArtist(artist.id)
         artist._is_logged_in = self.is_logged_in
         return artist
 
     def _parse_mix(self, json_obj):
-        mix = MixItem(Session._parse_mix(self, json_obj))
+        mix = Session._parse_mix(self, json_obj)
         mix._is_logged_in = self.is_logged_in
         return mix
 
     def _parse_broadcast(self, json_obj):
-        item = BroadcastItem(Session._parse_broadcast(self, json_obj))
+        item = Session._parse_broadcast(self, json_obj)
         item.name = self._cleanup_text(item.name)
         return item
 
-    def _parse_broadcast_url(self, json_obj):
-        item = BroadcastUrlItem(Session._parse_broadcast_url(self, json_obj))
-        return item
-
-    def _parse_folder(self, json_obj):
-        item = FolderItem(Session._parse_folder(self, json_obj))
-        return item
-
     def _parse_playlist(self, json_obj):
-        playlist = PlaylistItem(Session._parse_playlist(self, json_obj))
+        playlist = Session._parse_playlist(self, json_obj)
         playlist._is_logged_in = self.is_logged_in
         if self.is_logged_in and not playlist.parentFolderId:
             cached = self.user.folders_cache.get(playlist.id, None)
@@ -344,10 +393,11 @@ class TidalSession(Session):
         return playlist
 
     def _parse_track(self, json_obj):
-        track = TrackItem(Session._parse_track(self, json_obj))
-        if not getattr(track.album, 'streamStartDate', None):
-            track.album.streamStartDate = track.streamStartDate
-        track.album.explicit = track.explicit
+        track = Session._parse_track(self, json_obj)
+        # The album can be shared by the tracks of the response
+        streamStartDate = json_obj['album'].get('streamStartDate', None)
+        streamStartDate = track.album.parse_date(streamStartDate) if streamStartDate else None
+        track.album = self._update_shared(track.album, streamStartDate=streamStartDate or track.streamStartDate, explicit=track.explicit)
         track._is_logged_in = self.is_logged_in
         if self.is_logged_in:
             track._userplaylists = self.user.playlists_of_id(track.id, track.album.id)
@@ -356,12 +406,8 @@ class TidalSession(Session):
             track.duration = 30
         return track
 
-    def _parse_track_url(self, json_obj):
-        item = TrackUrlItem(Session._parse_track_url(self, json_obj))
-        return item
-
     def _parse_video(self, json_obj):
-        video = VideoItem(Session._parse_video(self, json_obj))
+        video = Session._parse_video(self, json_obj)
         video._is_logged_in = self.is_logged_in
         if self.is_logged_in:
             video._userplaylists = self.user.playlists_of_id(video.id, video.album.id if video.album else None)
@@ -371,13 +417,13 @@ class TidalSession(Session):
         return video
 
     def _parse_video_url(self, json_obj):
-        media = VideoUrlItem(Session._parse_video_url(self, json_obj))
+        media = Session._parse_video_url(self, json_obj)
         if media.isEncrypted or not media.url:
             media.url = settings.unplayable_m4a
         return media
 
     def _parse_promotion(self, json_obj):
-        promotion = PromotionItem(Session._parse_promotion(self, json_obj))
+        promotion = Session._parse_promotion(self, json_obj)
         promotion._is_logged_in = self.is_logged_in
         if self.is_logged_in and promotion.type == 'VIDEO':
             promotion._userplaylists = self.user.playlists_of_id(promotion.id)
@@ -390,22 +436,33 @@ class TidalSession(Session):
                 promotion._parentFolderIdFromCache = True
         return promotion
 
-    def _parse_category(self, json_obj):
-        return CategoryItem(Session._parse_category(self, json_obj))
-
     def _parse_userprofile(self, json_obj):
-        item = UserProfileItem(Session._parse_userprofile(self, json_obj))
+        item = Session._parse_userprofile(self, json_obj)
         item.name = self._cleanup_text(item.name)
         if self.is_logged_in:
             self.user.check_cached_userprofile(item)
         return item
 
-    def _parse_userprompt(self, json_obj):
-        return UserPromptItem(Session._parse_userprompt(self, json_obj))
+    def adaptive_quality(self, track_id=None):
+        ''' Returns the configured quality or a lower one if the measured bandwidth is too low '''
+        if not self._config.adaptive_quality:
+            return self._config.quality
+        try:
+            resolved = json.loads(xbmcgui.Window(10000).getProperty(NEXT_TRACK_PROPERTY) or '{}')
+            if track_id and resolved.get('track_id', None) == '%s' % track_id and resolved.get('quality', None):
+                # Same quality as the service, so the resolved track URL is found in the cache
+                log.info('Using quality %s of the resolved next track' % resolved['quality'])
+                return resolved['quality']
+        except:
+            pass
+        kbps = BandwidthEstimator.from_json(xbmcgui.Window(10000).getProperty(BANDWIDTH_PROPERTY))
+        quality = select_quality(kbps, self._config.quality)
+        log.info('Bandwidth %s kbit/s: Using quality %s (configured: %s)' % (kbps if kbps else 'unknown', quality, self._config.quality))
+        return quality
 
     def get_track_url(self, track_id, quality=None):
         try:
-            soundQuality = quality if quality else self._config.quality
+            soundQuality = quality if quality else self.adaptive_quality(track_id)
             media = Session.get_track_url(self, track_id, quality=soundQuality)
             if media.isEncrypted:
                 log.warning('Got encrypted track %s ! Playing silence track to avoid kodi to crash ...' % track_id)
@@ -488,6 +545,8 @@ class TidalSession(Session):
                 xbmcplugin.addSortMethod(plugin.handle, xbmcplugin.SORT_METHOD_LABEL_IGNORE_FOLDERS, labelMask='%L')
                 xbmcplugin.addSortMethod(plugin.handle, xbmcplugin.SORT_METHOD_TITLE_IGNORE_THE, labelMask='%L')
                 xbmcplugin.addSortMethod(plugin.handle, xbmcplugin.SORT_METHOD_DATE, labelMask='%L')
+        # Label masks and context menu texts for all items of the list
+        ListRenderer.compile()
         list_items = []
         for item in items:
             if isinstance(item, tidal.Category):
@@ -592,7 +651,8 @@ class TidalFavorites(Favorites):
 
     def reset(self):
         Favorites.reset(self)
-        self.ids_on_disk = {}
+        # None until the favorites are loaded from or saved to disk
+        self.ids_on_disk = None
         self.locked_artists_loaded = False
         self.locked_artists_updated = False
         self.locked_artists = []
@@ -602,13 +662,12 @@ class TidalFavorites(Favorites):
             if not self.locked_artists_loaded:
                 self.locked_artists_loaded = False
                 self.locked_artists_updated = False
-                fd = xbmcvfs.File(settings.locked_artist_file, 'r')
-                data = fd.read()
-                fd.close()
-                self.locked_artists = eval(data)
-                log.debug('Loaded %s Favorites from disk.' % sum(len(self.ids[content]) for content in ['artists', 'albums', 'playlists', 'tracks', 'videos']))
+                self.locked_artists = cache_store.load_locked_artists()
+                if self.locked_artists is None:
+                    raise Exception('No locked artists')
+                log.debug('Loaded %s Locked Artists from disk.' % len(self.locked_artists))
         except:
-            log.warning('Locked Artists file not found: %s' % settings.locked_artist_file)
+            log.warning('Locked Artists not found in %s' % settings.cache_db_file)
             self.locked_artists = [tidal.VARIOUS_ARTIST_ID]
             self.locked_artists_updated = True
             self.save_locked_artists()
@@ -619,9 +678,7 @@ class TidalFavorites(Favorites):
         try:
             if self.locked_artists_updated:
                 self.locked_artists_updated = False
-                fd = xbmcvfs.File(settings.locked_artist_file, 'w')
-                fd.write(repr(self.locked_artists))
-                fd.close()
+                cache_store.save_locked_artists(self.locked_artists)
         except:
             log.error('Failed to save Locked Artists to cache file !')
             return False
@@ -629,12 +686,14 @@ class TidalFavorites(Favorites):
 
     def load_cache(self):
         try:
-            fd = xbmcvfs.File(settings.favorites_file, 'r')
-            data = fd.read()
-            fd.close()
-            self.ids_on_disk = eval(data)
-            self.ids.update(self.ids_on_disk)
-            self.ids_loaded = isinstance(self.ids.get('tracks', None), list)
+            ids_on_disk = cache_store.load_favorites()
+            if ids_on_disk is None:
+                raise Exception('No favorites')
+            for content_type, ids in ids_on_disk.items():
+                self.set_ids(content_type, ids)
+            # Same content types as self.ids, so unchanged favorites compare equal
+            self.ids_on_disk = dict([(content_type, set(ids)) for content_type, ids in self.ids.items()])
+            self.ids_loaded = True
             self.ids_modified = False
             if self.ids_loaded:
                 log.debug('Loaded %s Favorites from disk.' % sum(len(self.ids[content]) for content in ['artists', 'albums', 'playlists', 'tracks', 'videos']))
@@ -645,13 +704,10 @@ class TidalFavorites(Favorites):
     def save_cache(self):
         try:
             if self.ids_loaded:
-                for k in self.ids.keys():
-                    self.ids[k] = sorted(self.ids[k])
                 if self.ids != self.ids_on_disk:
-                    fd = xbmcvfs.File(settings.favorites_file, 'w')
-                    fd.write(repr(self.ids))
-                    fd.close()
-                    self.ids_on_disk.update(self.ids)
+                    # Only added and removed IDs are written
+                    cache_store.save_favorites(self.ids, self.ids_on_disk or {})
+                    self.ids_on_disk = dict([(content_type, set(ids)) for content_type, ids in self.ids.items()])
                     self.ids_modified = False
                     log.info('Saved %s Favorites to disk.' % sum(len(self.ids[content]) for content in ['artists', 'albums', 'playlists', 'tracks', 'videos']))
         except:
@@ -661,9 +717,9 @@ class TidalFavorites(Favorites):
 
     def delete_cache(self):
         try:
-            if xbmcvfs.exists(settings.favorites_file):
-                xbmcvfs.delete(settings.favorites_file)
-                log.debug('Deleted Favorites file.')
+            cache_store.clear_favorites()
+            self.ids_on_disk = None
+            log.debug('Deleted Favorites cache.')
         except:
             return False
         return True
@@ -732,15 +788,14 @@ class TidalUser(User):
 
     def __init__(self, session, favorites=None):
         User.__init__(self, session, favorites=favorites if favorites else TidalFavorites(session))
-        self.playlists_loaded = False
-        self.playlists_updated = False
-        self.playlists_cache = {}
-        self.folders_loaded = False
-        self.folders_updated = False
-        self.folders_cache = {}
-        self.profiles_loaded = False
-        self.profiles_updated = False
-        self.profiles_cache = {}
+        for name in USER_CACHE_TABLES.keys():
+            setattr(self, '%s_loaded' % name, False)
+            setattr(self, '%s_updated' % name, False)
+            setattr(self, '_%s_cache' % name, {})
+            setattr(self, '_%s_on_disk' % name, {})
+        # Inverted index of track/video/album IDs to the IDs of the cached playlists
+        self.item_index = {}
+        self.album_index = {}
 
     def session(self):
         user_session = User.session(self)
@@ -775,83 +830,62 @@ class TidalUser(User):
                 xbmc.sleep(500)
                 progress.close()
 
-    def load_cache(self, force_reload=False):
-        try:
-            if not self.playlists_loaded or force_reload:
-                fd = xbmcvfs.File(settings.playlist_file, 'r')
-                self.playlists_cache = eval(fd.read())
-                fd.close()
-                self.playlists_loaded = True
-                self.playlists_updated = False
-                log.debug('Loaded %s Playlists from disk.' % len(list(self.playlists_cache.keys())))
-        except:
-            log.warning('Playlist Cache file not found. Creating a new one ...')
-            self.playlists_loaded = True
-            self.playlists_updated = True
-            self.playlists_cache = {}
-            self.save_cache()
+    def _load_table(self, name, force_reload=False):
+        if getattr(self, '%s_loaded' % name) and not force_reload:
+            return
+        table = USER_CACHE_TABLES[name]
         try:
-            if not self.folders_loaded or force_reload:
-                fd = xbmcvfs.File(settings.folders_file, 'r')
-                self.folders_cache = eval(fd.read())
-                fd.close()
-                self.folders_loaded = True
-                self.folders_updated = False
-                log.debug('Loaded %s Playlist Folder entries from disk.' % len(list(self.folders_cache.keys())))
+            cache = cache_store.load_dict(table)
+            if cache is None:
+                raise Exception('No %s cache' % table)
+            setattr(self, '%s_updated' % name, False)
+            log.debug('Loaded %s %s cache entries from disk.' % (len(cache), table))
         except:
-            log.warning('Folders Cache file not found. Creating a new one ...')
-            self.folders_loaded = True
-            self.folders_updated = True
-            self.folders_cache = {}
-            self.save_cache()
-        try:
-            if not self.profiles_loaded or force_reload:
-                fd = xbmcvfs.File(settings.profiles_file, 'r')
-                self.profiles_cache = eval(fd.read())
-                fd.close()
-                self.profiles_loaded = True
-                self.profiles_updated = False
-                log.debug('Loaded %s Userprofile entries from disk.' % len(list(self.profiles_cache.keys())))
-        except:
-            log.warning('Userprofile Cache file not found. Creating a new one ...')
-            self.profiles_loaded = True
-            self.profiles_updated = True
-            self.profiles_cache = {}
-            self.save_cache()
+            log.warning('%s cache not found. Creating a new one ...' % table.capitalize())
+            cache = {}
+            setattr(self, '%s_updated' % name, True)
+        setattr(self, '_%s_cache' % name, cache)
+        setattr(self, '_%s_on_disk' % name, dict(cache))
+        setattr(self, '%s_loaded' % name, True)
+        if name == 'playlists':
+            self.build_playlist_index()
+
+    def _save_table(self, name):
+        if getattr(self, '%s_loaded' % name) and getattr(self, '%s_updated' % name):
+            setattr(self, '%s_updated' % name, False)
+            cache = getattr(self, '_%s_cache' % name)
+            changes = cache_store.save_dict(USER_CACHE_TABLES[name], cache, getattr(self, '_%s_on_disk' % name))
+            setattr(self, '_%s_on_disk' % name, dict(cache))
+            log.info('Saved %s changes of %s %s cache entries to disk.' % (changes, len(cache), name))
+
+    def _cache_property(name):
+        def fget(self):
+            self._load_table(name)
+            return getattr(self, '_%s_cache' % name)
+        def fset(self, value):
+            self._load_table(name)
+            setattr(self, '_%s_cache' % name, value)
+        return property(fget, fset)
+
+    # The caches are loaded from the database when they are used the first time
+    playlists_cache = _cache_property('playlists')
+    folders_cache = _cache_property('folders')
+    profiles_cache = _cache_property('profiles')
+    del _cache_property
+
+    def load_cache(self, force_reload=False):
+        for name in USER_CACHE_TABLES.keys():
+            self._load_table(name, force_reload=force_reload)
         return self.playlists_loaded and self.folders_loaded and self.profiles_loaded
 
     def save_cache(self):
         ok = self.favorites.save_cache()
-        try:
-            if self.playlists_loaded and self.playlists_updated:
-                self.playlists_updated = False
-                fd = xbmcvfs.File(settings.playlist_file, 'w')
-                fd.write(repr(self.playlists_cache))
-                fd.close()
-                log.info('Saved %s Playlists to disk.' % len(list(self.playlists_cache.keys())))
-        except:
-            log.error('Error writing Playlist Cache file')
-            ok = False
-        try:
-            if self.folders_loaded and self.folders_updated:
-                self.folders_updated = False
-                fd = xbmcvfs.File(settings.folders_file, 'w')
-                fd.write(repr(self.folders_cache))
-                fd.close()
-                log.info('Saved %s Folders to disk.' % len(list(self.folders_cache.keys())))
-        except:
-            log.error('Error writing Folders Cache file')
-            ok = False
-        try:
-            if self.profiles_loaded and self.profiles_updated:
-                self.profiles_updated = False
-                fd = xbmcvfs.File(settings.profiles_file, 'w')
-                fd.write(repr(self.profiles_cache))
-                fd.close()
-                log.info('Saved %s Userprofiles to disk.' % len(list(self.profiles_cache.keys())))
-        except:
-            log.error('Error writing Userprofile Cache file')
-            ok = False
+        for name in USER_CACHE_TABLES.keys():
+            try:
+                self._save_table(name)
+            except Exception as e:
+                log.logException(e, 'Error writing %s cache' % name)
+                ok = False
         return ok
 
     def check_cached_userprofile(self, userprofile):
@@ -882,11 +916,11 @@ class TidalUser(User):
             if settings.album_playlist_tag in playlist.description and playlist.isUserPlaylist:
                 album_ids = ['%s' % item.album.id for item in items if (isinstance(item, TrackItem) or (isinstance(item, VideoItem) and item.album))]
             # Save Playlist and Track-IDs into the Cache
-            self.playlists_cache.update({playlist.id: {'title': playlist.title,
-                                                       'description': playlist.description,
-                                                       'lastUpdated': playlist.lastUpdated,
-                                                       'ids': ['%s' % item.id for item in items],
-                                                       'album_ids': album_ids}})
+            self.set_cached_playlist(playlist.id, {'title': playlist.title,
+                                                   'description': playlist.description,
+                                                   'lastUpdated': playlist.lastUpdated,
+                                                   'ids': ['%s' % item.id for item in items],
+                                                   'album_ids': album_ids})
             self.playlists_updated = True
         if playlist.isUserPlaylist or playlist._isFavorite:
             # Check if Folder Cache entry changed (for all Playlists)
@@ -904,7 +938,7 @@ class TidalUser(User):
         # Remove Deleted Playlists from Cache
         for plid in cached_ids:
             if plid not in act_ids:
-                playlist = self.playlists_cache.pop(plid)
+                playlist = self.pop_cached_playlist(plid)
                 if playlist:
                     self.playlists_updated = True
                     log.info('Removed playlist "%s" from playlist cache' % playlist['title'])
@@ -923,37 +957,67 @@ class TidalUser(User):
 
     def delete_cache(self):
         ok = True
-        try:
-            if xbmcvfs.exists(settings.playlist_file):
-                xbmcvfs.delete(settings.playlist_file)
-                log.debug('Deleted Playlists file.')
-                self.playlists_loaded = False
-                self.playlists_cache = {}
-        except:
-            ok = False
-        try:
-            if xbmcvfs.exists(settings.profiles_file):
-                xbmcvfs.delete(settings.profiles_file)
-                log.debug('Deleted Userprofiles file.')
-                self.profiles_loaded = False
-                self.profiles_cache = {}
-        except:
-            ok = False
+        for name in ['playlists', 'profiles']:
+            try:
+                cache_store.clear_dict(USER_CACHE_TABLES[name])
+                log.debug('Deleted %s cache.' % name)
+                setattr(self, '%s_loaded' % name, False)
+                setattr(self, '_%s_cache' % name, {})
+                setattr(self, '_%s_on_disk' % name, {})
+            except:
+                ok = False
+        self.item_index = {}
+        self.album_index = {}
         return ok
 
     def playlists_of_id(self, item_id, album_id=None):
         userpl = {}
-        self.load_cache()
+        # Only the playlists cache with its item index is needed
+        self._load_table('playlists')
         if not self.playlists_loaded:
             self.playlists()
-        plids = list(self.playlists_cache.keys())
-        for plid in plids:
-            if item_id and '%s' % item_id in self.playlists_cache.get(plid).get('ids', []):
+        if item_id:
+            for plid in tuple(self.item_index.get('%s' % item_id, ())):
                 userpl.update({plid: self.playlists_cache.get(plid)})
-            if album_id and '%s' % album_id in self.playlists_cache.get(plid).get('album_ids', []):
+        if album_id:
+            for plid in tuple(self.album_index.get('%s' % album_id, ())):
                 userpl.update({plid: self.playlists_cache.get(plid)})
         return userpl
 
+    def build_playlist_index(self):
+        self.item_index = {}
+        self.album_index = {}
+        for plid, playlist in self.playlists_cache.items():
+            self._index_playlist(plid, playlist)
+
+    def _index_playlist(self, plid, playlist):
+        for item_id in playlist.get('ids', []):
+            self.item_index.setdefault(item_id, set()).add(plid)
+        for album_id in playlist.get('album_ids', []):
+            self.album_index.setdefault(album_id, set()).add(plid)
+
+    def _unindex_playlist(self, plid, playlist):
+        for index, ids in [(self.item_index, playlist.get('ids', [])), (self.album_index, playlist.get('album_ids', []))]:
+            for _id in ids:
+                plids = index.get(_id, None)
+                if plids is not None:
+                    plids.discard(plid)
+                    if not plids:
+                        index.pop(_id, None)
+
+    def set_cached_playlist(self, plid, playlist):
+        old_playlist = self.playlists_cache.get(plid, None)
+        if old_playlist:
+            self._unindex_playlist(plid, old_playlist)
+        self.playlists_cache.update({plid: playlist})
+        self._index_playlist(plid, playlist)
+
+    def pop_cached_playlist(self, plid):
+        playlist = self.playlists_cache.pop(plid, None)
+        if playlist:
+            self._unindex_playlist(plid, playlist)
+        return playlist
+
     def detect_default_playlists(self):
         # Find Default Playlists via title if ID is not available anymore
         try:
@@ -1027,7 +1091,7 @@ class TidalUser(User):
         self.load_cache()
         ok = User.delete_playlist(self, playlist_id)
         if ok:
-            self.playlists_cache.pop(playlist_id)
+            self.pop_cached_playlist(playlist_id)
             self.playlists_updated = True
             self.save_cache()
         return ok
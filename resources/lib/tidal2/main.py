@@ -30,9 +30,8 @@ from .debug import log
 from .tidalapi.models import DeviceCode, Category
 from .config import settings
 from .koditidal import TidalSession
-from .items import DirectoryItem, TrackUrlItem, VideoUrlItem, HasListItem
-from .devices import DeviceSelectorDialog
-from .lyricsInstaller import LyricsInstaller
+from .items import DirectoryItem, HasListItem
+from . import resolver
 try:
     # Python 3
     from urllib.parse import quote_plus, unquote_plus
@@ -93,6 +92,8 @@ def settings_dialog():
 
 @plugin.route('/settings_choose_apk')
 def settings_choose_apk():
+    # Loads the APK parser only when it is needed
+    from .devices import DeviceSelectorDialog
     client = DeviceSelectorDialog.select_device(config=settings)
     if client:
         # Ask for Logout when a device type is selected
@@ -1330,41 +1331,18 @@ def refresh_token():
 
 @plugin.route('/play_track/<track_id>/<album_id>')
 def play_track(track_id, album_id):
-    try:
-        media = session.get_track_url(track_id)
-        track = session.get_track(track_id, withAlbum=False) if settings.set_playback_info else None
-        li = media.getListItem(track)
-    except Exception as e:
-        xbmcgui.Dialog().notification('%s Fatal Error' % plugin.name, '%s' % e, xbmcgui.NOTIFICATION_ERROR)
-        traceback.print_exc()
-        li = TrackUrlItem.unplayableItem().getListItem()
-    xbmcplugin.setResolvedUrl(plugin.handle, True, li)
+    # Normally handled by the resolver module without loading this module
+    resolver.play_track(session, track_id, album_id)
 
 
 @plugin.route('/play_broadcast/<broadcast_id>/<track_id>')
 def play_broadcast(broadcast_id, track_id):
-    try:
-        media = session.get_broadcast_url(broadcast_id)
-        track = None # session.get_track(track_id, withAlbum=False)
-        li = media.getListItem(track)
-    except Exception as e:
-        xbmcgui.Dialog().notification('%s Fatal Error' % plugin.name, '%s' % e, xbmcgui.NOTIFICATION_ERROR)
-        traceback.print_exc()
-        li = TrackUrlItem.unplayableItem().getListItem()
-    xbmcplugin.setResolvedUrl(plugin.handle, True, li)
+    resolver.play_broadcast(session, broadcast_id, track_id)
 
 
 @plugin.route('/play_video/<video_id>')
 def play_video(video_id):
-    try:
-        media = session.get_video_url(video_id)
-        video = session.get_video(video_id) if settings.set_playback_info else None
-        li = media.getListItem(video if isinstance(media, VideoUrlItem) else None)
-    except Exception as e:
-        xbmcgui.Dialog().notification('%s Fatal Error' % plugin.name, repr(e), xbmcgui.NOTIFICATION_ERROR)
-        traceback.print_exc()
-        li = VideoUrlItem.unplayableItem().getListItem()
-    xbmcplugin.setResolvedUrl(plugin.handle, True, li)
+    resolver.play_video(session, video_id)
 
 
 @plugin.route('/stream_locked')
@@ -1374,6 +1352,7 @@ def stream_locked():
 
 @plugin.route('/install_lyrics_scraper')
 def install_lyrics_scraper():
+    from .lyricsInstaller import LyricsInstaller
     li = LyricsInstaller()
     li.install(checkInstalled=False)
     log.info("LyricsInstaller %s" % "successful" if li.success else "failed")
@@ -1381,6 +1360,7 @@ def install_lyrics_scraper():
 
 @plugin.route('/check_lyrics_scraper')
 def check_lyrics_scraper():
+    from .lyricsInstaller import LyricsInstaller
     li = LyricsInstaller()
     li.install(checkInstalled=True)
     log.info("LyricsInstaller %s" % "successful" if li.success else "failed")
@@ -1388,6 +1368,7 @@ def check_lyrics_scraper():
 
 @plugin.route('/uninstall_lyrics_scraper')
 def uninstall_lyrics_scraper():
+    from .lyricsInstaller import LyricsInstaller
     li = LyricsInstaller()
     li.uninstall()
     log.info("LyricsInstaller %s" % "successful" if li.success else "failed")
@@ -1399,6 +1380,7 @@ def install_lyrics_addon():
 
 @plugin.route('/lyrics_settings')
 def lyrics_settings():
+    from .lyricsInstaller import LyricsInstaller
     LyricsInstaller.lyrics_settings()
     settings_dialog()
 
@@ -17,19 +17,24 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-import requests
+import re
 import traceback
+import os
 import base64
+import hmac
+import json
 import time
-from threading import Thread
+import socket
+import select
+from threading import Thread, Lock
 from collections import OrderedDict
 
 try:
     # Python 3
-    from urllib.parse import urlparse, parse_qs, unquote_plus
+    from urllib.parse import urlparse, urljoin, parse_qs, unquote_plus
 except:
     # Python 2.7
-    from urlparse import urlparse, parse_qs
+    from urlparse import urlparse, urljoin, parse_qs
     from urllib import unquote_plus
 
 try:
@@ -39,24 +44,79 @@ except:
     # Python 2.7
     from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
 
+try:
+    # for Python 3
+    from queue import PriorityQueue
+except:
+    # Python 2.7
+    from Queue import PriorityQueue
+
 from kodi_six import xbmc, xbmcaddon, xbmcgui, xbmcvfs
+from requests import HTTPError
 
 from .common import Const, plugin, __addon_id__
 from .textids import Msg, _T
 from .debug import log
 from .config import TidalConfig
-from .tidalapi import Session, PKCE_Authenticator
+from .tidalapi import Session, PKCE_Authenticator, HttpTransport, SERVICE_API_URLS, SERVICE_KEY_HEADER
 from .tidalapi.models import DashInfo
+from .artwork import ArtworkCache
+from .stream import SegmentStream, SegmentProxy, BandwidthEstimator, BANDWIDTH_PROPERTY, NEXT_TRACK_PROPERTY, RANGE_NOT_SATISFIABLE, parse_range, select_quality
 
 #------------------------------------------------------------------------------
 # HTTP Server for Images
 #------------------------------------------------------------------------------
 
+# Lower values are handled first. Requests with PRIORITY_BACKGROUND or higher
+# are handled by separate worker threads, so they can't delay the playback.
+PRIORITY_PLAYBACK = 0
+PRIORITY_DEFAULT = 5
+PRIORITY_BACKGROUND = 10
+PRIORITY_STOP = 99
+
+ENDPOINT_PRIORITY = {
+    '/manifest.mpd': PRIORITY_PLAYBACK,
+    '/manifest.m3u8': PRIORITY_PLAYBACK,
+    '/stream': PRIORITY_PLAYBACK,
+    '/segment': PRIORITY_PLAYBACK,
+    '/rpc/api': 1,
+    '/lyrics': 2,
+    '/artist_fanart': PRIORITY_BACKGROUND,
+}
+
+# Requests which take longer are logged at info level (seconds)
+SLOW_REQUEST_TIME = 1.0
+
+# Connections which sent no request line within this time are queued with PRIORITY_DEFAULT
+REQUEST_LINE_TIMEOUT = 0.5
+
+# Number of converted HLS playlists which are kept in memory
+HLS_CACHE_SIZE = 10
+
+# The next track of the playlist is resolved when the current track ends within this time
+NEXT_TRACK_RESOLVE_TIME = 45
+
+RE_PLAY_TRACK = re.compile(r'/play_track/(\d+)/')
+
+
 class LocalHttpRequestHandler(BaseHTTPRequestHandler):
 
-    protocol_version = "HTTP/1.0"
+    protocol_version = "HTTP/1.1"
+    # Socket timeout for the first request of a connection
+    timeout = 10
+
+    def handle(self):
+        # Like BaseHTTPRequestHandler.handle(), but idle keep-alive connections
+        # are closed early to release the worker thread
+        self.close_connection = True
+        self.handle_one_request()
+        if not self.close_connection:
+            self.connection.settimeout(self.server.keep_alive_timeout)
+        while not self.close_connection:
+            self.handle_one_request()
 
     def do_GET(self):
+        start = time.time()
         try:
             url = urlparse(self.path)
             params = parse_qs(url.query)
@@ -64,6 +124,7 @@ class LocalHttpRequestHandler(BaseHTTPRequestHandler):
             if url.path in ['/', '', '/client']:
                 self.send_response(302)
                 self.send_header('Location', '/login')
+                self.send_header('Content-Length', '0')
                 self.end_headers()
 
             elif url.path == '/artist_fanart':
@@ -95,6 +156,24 @@ class LocalHttpRequestHandler(BaseHTTPRequestHandler):
                 else:
                     self.send_error(501, 'Missing Parameter "track_id" or "quality"')
 
+            elif url.path == '/segment':
+                if 'track_id' in params and 'quality' in params and 'index' in params:
+                    self.send_segment(params['track_id'][0], params['quality'][0], int(params['index'][0]))
+                else:
+                    self.send_error(501, 'Missing Parameter "track_id", "quality" or "index"')
+
+            elif url.path == '/segment_stats':
+                stats = json.dumps(self.server.segment_proxy.statistics() if self.server.segment_proxy else {}).encode('utf-8')
+                self.send_response(200)
+                self._send_headers(content_type='application/json', content_length=len(stats))
+                self.wfile.write(stats)
+
+            elif url.path == '/stream':
+                if 'track_id' in params and 'quality' in params:
+                    self.send_stream(params['track_id'][0], params['quality'][0])
+                else:
+                    self.send_error(501, 'Missing Parameter "track_id" or "quality"')
+
             elif url.path == '/login':
                 self.send_login_page()
 
@@ -120,6 +199,32 @@ class LocalHttpRequestHandler(BaseHTTPRequestHandler):
             self.send_error(404, 'Request failed')
             log.logException(e, "HTTP Request failed.")
             traceback.print_exc()
+        finally:
+            self._log_request_time('GET', start)
+
+    def do_POST(self):
+        start = time.time()
+        try:
+            url = urlparse(self.path)
+            if url.path == '/rpc/api':
+                self.send_api_result()
+            else:
+                self.send_error(501, 'Illegal Request: %s' % self.path)
+        except Exception as e:
+            self.send_error(404, 'Request failed')
+            log.logException(e, "HTTP Request failed.")
+            traceback.print_exc()
+        finally:
+            self._log_request_time('POST', start)
+
+    def _log_request_time(self, method, start):
+        # Only slow requests are logged at info level, so playback doesn't flood the log
+        elapsed = time.time() - start
+        text = 'HTTP %s %s handled in %.1f ms' % (method, self.path.split('?')[0], elapsed * 1000)
+        if elapsed >= SLOW_REQUEST_TIME:
+            log.info(text)
+        else:
+            log.debug(text)
 
     def log_message(self, format, *args):
         try:
@@ -131,69 +236,43 @@ class LocalHttpRequestHandler(BaseHTTPRequestHandler):
     def _send_headers(self, content_type=None, content_length=0, cacheable=False ):
         if content_type:
             self.send_header('Content-Type', content_type)
-        if content_length:
-            self.send_header('Content-Length', str(content_length))
+        # Content-Length is always needed for keep-alive connections
+        self.send_header('Content-Length', str(content_length))
         if not cacheable:
             self.send_header('Last-Modified', self.date_time_string(time.time()))
             self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate, max-age=0')
             self.send_header('Pragma', 'no-cache')
             self.send_header('Expires', '0')
-        self.send_header('Connection', 'close')
         self.end_headers()
 
     def send_fanart(self, artist_ids):
+        jpg_data = None
         try:
-            # If the Fanart is fetched multiple times, it is allready in the buffer
-            if self.server.last_fanart_ids == ','.join(artist_ids) and self.server.last_fanart_data:
-                self.send_response(200)
-                self._send_headers(content_type='image/jpg', content_length=len(self.server.last_fanart_data), cacheable=True)
-                self.wfile.write(self.server.last_fanart_data)
-                return
-        except Exception as e:
-            log.logException(e, "Failed to send buffered fanart.")
-        try:
-            ok = False
-            session = Session(config=TidalConfig(tidal_addon=xbmcaddon.Addon(__addon_id__)))
-            session.user = None # No user favorites should be loaded
             for artist_id in artist_ids:
-                artist = session.get_artist(artist_id)
-                if artist and artist.fanart:
-                    jpg_data = requests.get(artist.fanart)
-                    if jpg_data.ok:
-                        ok = True
-                        self.send_response(200)
-                        self._send_headers(content_type='image/jpg', content_length=len(jpg_data.content), cacheable=True)
-                        self.wfile.write(jpg_data.content)
-                        # Save last found Fanart into the buffer, because Kodi fetches the data multiple times
-                        self.server.last_fanart_ids = ','.join(artist_ids)
-                        self.server.last_fanart_data = jpg_data.content
-                        break
-            session.cleanup()
-            del session
+                jpg_data = self.server.fanart_cache.get(artist_id, self.get_fanart_url)
+                if jpg_data:
+                    break
         except Exception as e:
             log.logException(e, "HTTP Request failed.")
             traceback.print_exc()
-        finally:
-            if not ok:
-                # Using addon fanart if TIDAL fanart is missing
-                try:
-                    fd = xbmcvfs.File(Const.addon_fanart, 'r')
-                    self.server.last_fanart_ids = ','.join(artist_ids)
-                    self.server.last_fanart_data = fd.readBytes()
-                    fd.close()
-                    ok = True
-                    self.send_response(200)
-                    self._send_headers(content_type='image/jpg', content_length=len(self.server.last_fanart_data), cacheable=True)
-                    self.wfile.write(self.server.last_fanart_data)
-                except:
-                    pass
-                if not ok:
-                    self.send_error(404, 'Failed to get fanart for Artist %s' % artist_ids[0])
-            session = None
+        if not jpg_data:
+            # Using addon fanart if TIDAL fanart is missing
+            jpg_data = self.server.get_default_fanart()
+        if jpg_data:
+            self.send_response(200)
+            self._send_headers(content_type='image/jpg', content_length=len(jpg_data), cacheable=True)
+            self.wfile.write(jpg_data)
+        else:
+            self.send_error(404, 'Failed to get fanart for Artist %s' % artist_ids[0])
+
+    def get_fanart_url(self, artist_id):
+        # Called by the fanart cache if the image of the artist is not cached
+        artist = self.server.get_session().get_artist(artist_id)
+        return artist.fanart if artist else None
 
     def send_lyrics(self, track_id):
         try:
-            session = Session(config=TidalConfig(tidal_addon=xbmcaddon.Addon(__addon_id__)))
+            session = self.server.get_session()
             if not session._config.enable_lyrics:
                 self.send_error(404, 'Lyrics are disabled in settings.')
                 return
@@ -208,16 +287,46 @@ class LocalHttpRequestHandler(BaseHTTPRequestHandler):
             if not json_obj.get('subtitles', None) and not json_obj.get('lyrics', None):
                 self.send_error(404, 'No lyrics for track %s' % track_id)
                 return
+            lyrics = r.text.encode("utf-8")
             self.send_response(200)
-            self._send_headers(content_type='application/json')
-            self.wfile.write(r.text.encode("utf-8"))
-            session.cleanup()
-            del session
+            self._send_headers(content_type='application/json', content_length=len(lyrics))
+            self.wfile.write(lyrics)
         except Exception as e:
             self.send_error(404, 'No lyrics for track %s' % track_id)
             log.logException(e, txt='Error getting lyrics for track %s' % track_id)
-        finally:
-            session = None
+
+    def send_api_result(self):
+        # Runs a catalog request for the plugin with the session and the response cache of the service.
+        # The plugin sends the key of the window property, the access token stays in the service.
+        if self.client_address[0] not in ['127.0.0.1', '::1', '::ffff:127.0.0.1']:
+            self.send_error(403, 'Only local clients are allowed')
+            return
+        if not hmac.compare_digest(self.headers.get(SERVICE_KEY_HEADER, ''), self.server.service_key):
+            self.send_error(403, 'Invalid service key')
+            return
+        if self.headers.get('Content-Type', '').split(';')[0].strip().lower() != 'application/json':
+            self.send_error(415, 'Only application/json is accepted')
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8'))
+        url = SERVICE_API_URLS.get(body.get('api', None), None)
+        path = body.get('path', None) or ''
+        if not url or not urljoin(url, path).startswith(url):
+            self.send_error(403, 'Only TIDAL API requests are allowed')
+            return
+        session = self.server.get_session()
+        if not session.is_logged_in:
+            self.send_error(503, 'Service session is not logged in')
+            return
+        try:
+            r = session.request('GET', url=url, path=path, params=body.get('params', None))
+        except HTTPError as e:
+            r = e.response
+        result = json.dumps({ 'status': r.status_code,
+                              'url': r.url,
+                              'content': r.text }).encode('utf-8')
+        self.send_response(200)
+        self._send_headers(content_type='application/json', content_length=len(result))
+        self.wfile.write(result)
 
     def get_mpd_manifest(self, track_id, quality):
         try:
@@ -227,27 +336,15 @@ class LocalHttpRequestHandler(BaseHTTPRequestHandler):
             if mpd_data:
                 log.info("Got MPD-Data from window property %s" % prop)
                 mpd_data = unquote_plus(mpd_data)
-                self.server.add_cached_mpd(prop, mpd_data)
             else:
-                mpd_data = self.server.get_cached_mpd(prop)
-                if mpd_data:
-                    log.info("Got MPD-Data from cached entry %s" % prop)
-                else:
-                    session = Session(config=TidalConfig(tidal_addon=xbmcaddon.Addon(__addon_id__)))
-                    track_url = session.get_track_url(track_id, quality)
-                    if track_url:
-                        mpd_data = track_url.manifest
-                        if mpd_data:
-                            log.info("Got new MPD-Data for track %s" % track_id)
-                            self.server.add_cached_mpd(prop, mpd_data)
-                    session.cleanup()
-                    del session
+                # Taken from the track URL cache as long as the stream URLs are valid
+                track_url = self.server.get_session().get_track_url(track_id, quality)
+                if track_url:
+                    mpd_data = track_url.manifest
             if mpd_data:
                 return mpd_data
         except Exception as e:
             log.logException(e, txt='Error getting MPD data for track %s' % track_id)
-        finally:
-            session = None
         self.send_error(404, 'MPD data for track %s not found' % track_id)
         return None
 
@@ -258,7 +355,7 @@ class LocalHttpRequestHandler(BaseHTTPRequestHandler):
             mpd_data = self.get_mpd_manifest(track_id, quality)
             if mpd_data:
                 mpd_xml = base64.b64decode(mpd_data)
-                if xbmcaddon.Addon(__addon_id__).getSetting('debug_json') == 'true':
+                if self.server.enable_messages:
                     log.info("MPD-Data: %s" % mpd_xml)
                 self.send_response(200)
                 self._send_headers(content_type='application/dash+xml', content_length=len(mpd_xml))
@@ -272,18 +369,103 @@ class LocalHttpRequestHandler(BaseHTTPRequestHandler):
         try:
             mpd_data = self.get_mpd_manifest(track_id, quality)
             if mpd_data:
-                hls = DashInfo.fromBase64(mpd_data)
-                if xbmcaddon.Addon(__addon_id__).getSetting('debug_json') == 'true':
-                    log.info("M3U8-Data: %s" % hls.m3u8())
-                else:
-                    log.info("Converting MPD manifest to HLS stream")
-                m3u8 = hls.m3u8().encode("utf-8")
+                key = (track_id, quality, self.server.use_segment_proxy)
+                m3u8 = self.server.get_cached_hls(key, mpd_data)
+                if not m3u8:
+                    # Converted once per manifest. ffmpeg requests the playlist again while playing.
+                    hls = DashInfo.fromBase64(mpd_data)
+                    urls = None
+                    if self.server.use_segment_proxy:
+                        # The segments are loaded by the service
+                        self.server.segment_proxy.register('%s_%s' % (track_id, quality), hls.urls())
+                        urls = ['http://127.0.0.1:%s/segment?track_id=%s&quality=%s&index=%s' % (self.server.server_address[1], track_id, quality, index) for index in range(len(hls.urls()))]
+                    m3u8 = hls.m3u8(urls)
+                    if self.server.enable_messages:
+                        log.info("M3U8-Data: %s" % m3u8)
+                    else:
+                        log.info("Converting MPD manifest to HLS stream")
+                    m3u8 = self.server.add_cached_hls(key, mpd_data, m3u8.encode("utf-8"))
                 self.send_response(200)
                 self._send_headers(content_type='application/vnd.apple.mpegurl', content_length=len(m3u8))
                 self.wfile.write(m3u8)
         except:
             self.send_error(501, 'MPD contains invalid data')
 
+    def send_segment(self, track_id, quality, index):
+        key = '%s_%s' % (track_id, quality)
+        try:
+            if not self.server.segment_proxy.has_track(key):
+                mpd_data = self.get_mpd_manifest(track_id, quality)
+                if not mpd_data:
+                    return
+                self.server.segment_proxy.register(key, DashInfo.fromBase64(mpd_data).urls())
+            data = self.server.segment_proxy.get(key, index)
+        except Exception as e:
+            log.logException(e, txt='Error getting segment %s of track %s' % (index, track_id))
+            self.send_error(404, 'Segment %s of track %s not found' % (index, track_id))
+            return
+        self.send_response(200)
+        self._send_headers(content_type='audio/mp4', content_length=len(data), cacheable=True)
+        self.wfile.write(data)
+
+    def send_stream(self, track_id, quality):
+        # Sends the DASH segments as one fragmented MP4 file with support for byte ranges
+        try:
+            stream = self.server.get_stream(track_id, quality)
+            if not stream:
+                mpd_data = self.get_mpd_manifest(track_id, quality)
+                if not mpd_data:
+                    return
+                stream = self.server.add_stream(track_id, quality, SegmentStream(DashInfo.fromBase64(mpd_data), self.server.http,
+                                                                                 self.server.segment_proxy, 'stream_%s_%s' % (track_id, quality)))
+            stream.start_layout()
+            if not stream.has_layout() and self.headers.get('Range', 'bytes=0-') == 'bytes=0-':
+                # The playback starts while the sizes of the segments are read
+                self.send_chunked_stream(track_id, stream)
+                return
+            length = stream.layout()
+        except Exception as e:
+            log.logException(e, txt='Error getting stream of track %s' % track_id)
+            self.send_error(404, 'Stream of track %s not found' % track_id)
+            return
+        byte_range = parse_range(self.headers.get('Range', None), length)
+        if byte_range == RANGE_NOT_SATISFIABLE:
+            self.send_response(416)
+            self.send_header('Content-Range', 'bytes */%s' % length)
+            self._send_headers(content_length=0)
+            return
+        start, end = byte_range if byte_range else (0, length - 1)
+        if byte_range:
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %s-%s/%s' % (start, end, length))
+        else:
+            self.send_response(200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self._send_headers(content_type=stream.mimeType, content_length=end - start + 1, cacheable=True)
+        try:
+            for chunk in stream.iter_range(start, end):
+                self.wfile.write(chunk)
+        except Exception as e:
+            # The player closes the connection when it seeks
+            log.info('Stream of track %s stopped: %s' % (track_id, e))
+            self.close_connection = True
+
+    def send_chunked_stream(self, track_id, stream):
+        # Sends the whole stream without a length. An aborted transfer is detected
+        # by the player because the last chunk is missing.
+        self.send_response(200)
+        self.send_header('Content-Type', stream.mimeType)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for data in stream.iter_all():
+                self.wfile.write(('%x\r\n' % len(data)).encode('ascii') + data + b'\r\n')
+            self.wfile.write(b'0\r\n\r\n')
+        except Exception as e:
+            log.info('Stream of track %s stopped: %s' % (track_id, e))
+            self.close_connection = True
+
     def send_login_page(self):
         try:
             try:
@@ -296,7 +478,7 @@ class LocalHttpRequestHandler(BaseHTTPRequestHandler):
             html = self.server.pages.login_page(settings, msg).encode('utf-8')
             del settings
             self.send_response(200)
-            self._send_headers(content_type='text/html;charset=utf-8')
+            self._send_headers(content_type='text/html;charset=utf-8', content_length=len(html))
             self.wfile.write(html)
         except:
             self.send_error(404, 'Failed to start OAuth login')
@@ -307,7 +489,7 @@ class LocalHttpRequestHandler(BaseHTTPRequestHandler):
             try:
                 linkurl = _T(Msg.i30253)
                 settings = TidalConfig(tidal_addon=xbmcaddon.Addon(__addon_id__))
-                session = Session(config=settings)
+                session = Session(config=settings, http=self.server.http)
                 if settings.client_name:
                     # Use ID and secret from the TIDAL APK 
                     client_id = ''
@@ -341,7 +523,7 @@ class LocalHttpRequestHandler(BaseHTTPRequestHandler):
                 pass
             del settings
             self.send_response(200)
-            self._send_headers(content_type='text/html;charset=utf-8')
+            self._send_headers(content_type='text/html;charset=utf-8', content_length=len(html))
             self.wfile.write(html)
         except:
             self.send_error(404, 'Failed to start OAuth login')
@@ -363,53 +545,297 @@ class LocalHttpRequestHandler(BaseHTTPRequestHandler):
             html = self.server.pages.pkce_success_page(settings).encode('utf-8')
             del settings
             self.send_response(200)
-            self._send_headers(content_type='text/html;charset=utf-8')
+            self._send_headers(content_type='text/html;charset=utf-8', content_length=len(html))
             self.wfile.write(html)
         except:
             self.send_error(404, 'Failed to login with one-time authentication code')
             traceback.print_exc()
 
 
+def socket_pair():
+    ''' Returns two connected sockets. Python 2 has no socket.socketpair() on Windows. '''
+    try:
+        return socket.socketpair()
+    except:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            listener.bind(('127.0.0.1', 0))
+            listener.listen(1)
+            client = socket.create_connection(listener.getsockname())
+            server, address = listener.accept()
+            return (server, client)
+        finally:
+            listener.close()
+
+
+class ServiceSession(Session):
+    ''' Long-lived session which is shared by all request handler threads of the service '''
+
+    def __init__(self, config, http):
+        Session.__init__(self, config, http=http)
+        # No user favorites should be loaded
+        self.user.favorites = None
+        self.token_lock = Lock()
+
+    def token_refresh(self):
+        access_token = self._config.access_token
+        with self.token_lock:
+            if self._config.access_token != access_token:
+                # Another thread got a new token while this thread was waiting
+                return None
+            return Session.token_refresh(self)
+
+
 class LocalHTTPServer(HTTPServer):
+    ''' HTTP server with a bounded pool of worker threads.
+        Accepted connections are queued by the priority of the requested endpoint.
+        Fanart requests have their own worker threads, so a slow fanart download
+        never blocks a manifest request of the player.
+        The priority is taken from the first request of a connection. Further requests
+        on a keep-alive connection are handled by the same worker thread.
+    '''
 
-    def __init__(self, server_address, RequestHandlerClass, bind_and_activate=True):
+    def __init__(self, server_address, RequestHandlerClass, bind_and_activate=True, workers=4, background_workers=2):
         HTTPServer.allow_reuse_address = True
         HTTPServer.__init__(self, server_address, RequestHandlerClass, bind_and_activate=bind_and_activate)
         self.socket.settimeout(float(2))
         self.timeout = 2
+        self.keep_alive_timeout = 2
         self.enable_messages = True
+        self.request_seq = 0
+        self.queues = {'default': PriorityQueue(), 'background': PriorityQueue()}
+        # Accepted connections which are waiting for their request line
+        self.pending = []
+        self.pending_lock = Lock()
+        # Wakes up the dispatcher thread from select()
+        self.wakeup_recv, self.wakeup_send = socket_pair()
+        self.dispatching = True
+        self.dispatcher = Thread(target=self.dispatch_requests, name='HttpDispatcher')
+        self.dispatcher.daemon = True
+        self.dispatcher.start()
+        self.workers = {'default': [], 'background': []}
+        for lane, count in [('default', workers), ('background', background_workers)]:
+            for i in range(max(1, count)):
+                worker = Thread(target=self.process_queue, args=(self.queues[lane],), name='HttpWorker.%s.%s' % (lane, i))
+                worker.daemon = True
+                worker.start()
+                self.workers[lane].append(worker)
         self.pages = Pages()
-        # Cache for the last Fanart (because Kodi calls the same URL multiple times)
-        self.last_fanart_ids = ''
-        self.last_fanart_data = b''
-        self.mpd_cache_size = 10
-        self.mpd_cache = OrderedDict()
-
-    def get_cached_mpd(self, key):
-        while len(self.mpd_cache) > self.mpd_cache_size:
-            # Remove the oldest if cache is full (if cache size changes)
-            self.mpd_cache.popitem(last=False)
-        return self.mpd_cache.get(key, None)
-
-    def add_cached_mpd(self, key, mpd_data):
-        self.mpd_cache.pop(key, None)   # Remove old data if exist
-        self.mpd_cache[key] = mpd_data  # Add new data at the end of the OrderedDict
-        while len(self.mpd_cache) > self.mpd_cache_size:
-            # Remove the oldest if cache is full
-            self.mpd_cache.popitem(last=False)
+        # Session and settings for all requests. Rebuilt when the settings are changed.
+        self.session = None
+        self.session_lock = Lock()
+        # Fanart images of the artists (Kodi calls the same URL multiple times)
+        self.fanart_cache = None
+        self.default_fanart = None
+        self.streams_lock = Lock()
+        # Segment layouts of the last streams for range requests
+        self.streams = OrderedDict()
+        # Encoded HLS playlists with the manifest they were converted from
+        self.hls_cache = OrderedDict()
+        # Memory buffer for the segments of the HLS converter
+        self.segment_proxy = None
+        # Measured by the segment downloads for the audio quality of the next tracks
+        self.bandwidth = BandwidthEstimator()
+        self.bandwidth_kbps = 0
+        self.bandwidth_time = 0
+        self.use_segment_proxy = False
+        # Keep-alive connections to the TIDAL servers for all request handlers
+        self.http = HttpTransport()
+        # Secret of the plugin for the catalog requests. Published in a window property.
+        self.service_key = base64.urlsafe_b64encode(os.urandom(18)).decode('ascii')
+
+    def get_session(self):
+        with self.session_lock:
+            if not self.session:
+                start = time.time()
+                self.session = ServiceSession(TidalConfig(tidal_addon=xbmcaddon.Addon(__addon_id__)), self.http)
+                log.info('Created service session in %.1f ms' % ((time.time() - start) * 1000))
+            return self.session
+
+    def reset_session(self):
+        # Running requests keep their reference to the old session
+        with self.session_lock:
+            self.session = None
+
+    def init_fanart_cache(self, cache_dir, max_disk):
+        self.fanart_cache = ArtworkCache(cache_dir, self.http, max_disk=max_disk)
+
+    def get_default_fanart(self):
+        if not self.default_fanart:
+            try:
+                fd = xbmcvfs.File(Const.addon_fanart, 'r')
+                self.default_fanart = fd.readBytes()
+                fd.close()
+            except:
+                pass
+        return self.default_fanart
+
+    def init_segment_proxy(self, enabled, prefetch, max_bytes):
+        self.use_segment_proxy = enabled
+        if not self.segment_proxy:
+            self.segment_proxy = SegmentProxy(self.http, prefetch=prefetch, max_bytes=max_bytes, bandwidth=self.bandwidth)
+        else:
+            self.segment_proxy.prefetch = prefetch
+            self.segment_proxy.max_bytes = max_bytes
+
+    def publish_bandwidth(self):
+        # Hands the bandwidth estimate over to the plugin
+        if self.bandwidth.last_sample == self.bandwidth_time:
+            return
+        self.bandwidth_time = self.bandwidth.last_sample
+        kbps = self.bandwidth.kbps()
+        if abs(kbps - self.bandwidth_kbps) > self.bandwidth_kbps * 0.1:
+            log.info('Bandwidth estimate: %d kbit/s' % kbps)
+            self.bandwidth_kbps = kbps
+        xbmcgui.Window(10000).setProperty(BANDWIDTH_PROPERTY, self.bandwidth.to_json())
+
+    def resolve_track(self, track_id, quality=None, with_track=False):
+        ''' Requests the playback info of a track before the plugin is called to play it.
+            The plugin takes it from the track URL cache. An entry which expires soon is renewed.
+        '''
+        try:
+            start = time.time()
+            session = self.get_session()
+            if not session.is_logged_in or not session.get_track_url(track_id, quality):
+                return
+            if with_track:
+                # Puts the track into the response cache
+                session.get_track(track_id)
+            log.info('Resolved next track %s in %.1f ms' % (track_id, (time.time() - start) * 1000))
+        except Exception as e:
+            log.logException(e, 'Failed to resolve next track %s' % track_id)
+
+    def get_cached_hls(self, key, mpd_data):
+        with self.streams_lock:
+            entry = self.hls_cache.get(key, None)
+            if entry and entry[0] == mpd_data:
+                return entry[1]
+        return None
+
+    def add_cached_hls(self, key, mpd_data, m3u8):
+        with self.streams_lock:
+            self.hls_cache.pop(key, None)
+            self.hls_cache[key] = (mpd_data, m3u8)
+            while len(self.hls_cache) > HLS_CACHE_SIZE:
+                self.hls_cache.popitem(last=False)
+        return m3u8
+
+    def get_stream(self, track_id, quality):
+        with self.streams_lock:
+            return self.streams.get('%s_%s' % (track_id, quality), None)
+
+    def add_stream(self, track_id, quality, stream):
+        with self.streams_lock:
+            self.streams['%s_%s' % (track_id, quality)] = stream
+            while len(self.streams) > 2:
+                self.streams.popitem(last=False)
+        return stream
+
+    def request_priority(self, request):
+        # Peek into the request line without removing it from the socket buffer.
+        # Only called when select() reported data, so recv() doesn't block.
+        try:
+            line = request.recv(1024, socket.MSG_PEEK).split(b'\r\n', 1)[0].decode('ascii', 'ignore')
+            path = urlparse(line.split(' ')[1]).path
+            return ENDPOINT_PRIORITY.get(path, PRIORITY_DEFAULT)
+        except:
+            return PRIORITY_DEFAULT
 
     def process_request(self, request, client_address):
+        # Called by the accept loop. The request line is awaited by the dispatcher thread.
+        with self.pending_lock:
+            self.pending.append((time.time(), request, client_address))
+        self.wake_dispatcher()
+
+    def wake_dispatcher(self):
         try:
-            # Avoid Broken-Pipe errors in error log
-            HTTPServer.process_request(self, request, client_address)
+            self.wakeup_send.send(b'x')
         except:
             pass
 
+    def dispatch_requests(self):
+        # Waits in select() until a connection sent its request line, a new connection
+        # was accepted or the request line timeout of a waiting connection expires.
+        while self.dispatching:
+            with self.pending_lock:
+                pending = list(self.pending)
+            timeout = max(0, min([accepted for accepted, request, client_address in pending]) + REQUEST_LINE_TIMEOUT - time.time()) if pending else None
+            try:
+                ready = select.select([self.wakeup_recv] + [request for accepted, request, client_address in pending], [], [], timeout)[0]
+            except:
+                # A connection was closed in the meantime
+                ready = [request for accepted, request, client_address in pending if not self.is_selectable(request)]
+            if self.wakeup_recv in ready:
+                try:
+                    self.wakeup_recv.recv(1024)
+                except:
+                    pass
+            now = time.time()
+            for entry in pending:
+                accepted, request, client_address = entry
+                if request in ready:
+                    priority = self.request_priority(request)
+                elif now - accepted >= REQUEST_LINE_TIMEOUT:
+                    priority = PRIORITY_DEFAULT
+                else:
+                    continue
+                with self.pending_lock:
+                    self.pending.remove(entry)
+                self.request_seq += 1
+                lane = 'background' if priority >= PRIORITY_BACKGROUND else 'default'
+                self.queues[lane].put((priority, self.request_seq, request, client_address))
+
+    def is_selectable(self, request):
+        try:
+            select.select([request], [], [], 0)
+            return True
+        except:
+            return False
+
+    def process_queue(self, queue):
+        while True:
+            priority, seq, request, client_address = queue.get()
+            if priority == PRIORITY_STOP:
+                break
+            try:
+                self.finish_request(request, client_address)
+            except:
+                # Avoid Broken-Pipe errors in error log
+                pass
+            finally:
+                self.shutdown_request(request)
+
     def serve_forever(self, poll_interval=0.5):
         log.info('Starting HTTP-Server ...')
         HTTPServer.serve_forever(self, poll_interval=poll_interval)
         log.info('HTTP-Server terminated.')
 
+    def server_close(self):
+        HTTPServer.server_close(self)
+        self.dispatching = False
+        self.wake_dispatcher()
+        self.dispatcher.join(2)
+        with self.pending_lock:
+            for accepted, request, client_address in self.pending:
+                self.shutdown_request(request)
+            self.pending = []
+        self.wakeup_recv.close()
+        self.wakeup_send.close()
+        for lane, workers in self.workers.items():
+            for worker in workers:
+                self.request_seq += 1
+                self.queues[lane].put((PRIORITY_STOP, self.request_seq, None, None))
+        for lane, workers in self.workers.items():
+            for worker in workers:
+                worker.join(2)
+        if self.fanart_cache:
+            log.info(self.fanart_cache.statistics())
+        if self.segment_proxy:
+            log.info('Segment Proxy: %s' % self.segment_proxy.statistics())
+            self.segment_proxy.close()
+        log.info(self.http.statistics())
+        self.http.close()
+
 #------------------------------------------------------------------------------
 # Service 
 #------------------------------------------------------------------------------
@@ -421,6 +847,7 @@ class TidalMonitor(xbmc.Monitor):
         self.http_server = None
         self.http_thread = None
         self.settings = None
+        self.next_track_id = None
 
     def __del__(self):
         log.info('TidalMonitor() Object destroyed.')
@@ -428,15 +855,24 @@ class TidalMonitor(xbmc.Monitor):
     def _start_servers(self):
         if self.http_server == None and self.http_thread == None:
             try:
-                self.http_server = LocalHTTPServer(('', self.settings.fanart_server_port), LocalHttpRequestHandler)
+                self.http_server = LocalHTTPServer(('', self.settings.fanart_server_port), LocalHttpRequestHandler,
+                                                   workers=self.settings.http_server_threads,
+                                                   background_workers=self.settings.fanart_server_threads)
                 self.http_server.enable_messages = self.settings.debug_json
-                self.http_server.mpd_cache_size = self.settings.mpd_cache_size
             except:
                 log.error('HTTP Server not startet on port %d' % self.settings.fanart_server_port)
-                self.http_server = LocalHTTPServer(('', 0), LocalHttpRequestHandler)
+                self.http_server = LocalHTTPServer(('', 0), LocalHttpRequestHandler,
+                                                   workers=self.settings.http_server_threads,
+                                                   background_workers=self.settings.fanart_server_threads)
                 self.settings.setSetting('fanart_server_port', '%d' % self.http_server.server_address[1])
+            if self.settings.http_pool_size != self.http_server.http.pool_size:
+                self.http_server.http.close()
+                self.http_server.http = HttpTransport(pool_size=self.settings.http_pool_size)
+            self.http_server.init_fanart_cache(self.settings.fanart_cache_dir, self.settings.fanart_cache_size * 1024 * 1024)
+            self.http_server.init_segment_proxy(self.settings.segment_proxy, self.settings.segment_prefetch, self.settings.segment_buffer_size * 1024 * 1024)
             self.http_thread = Thread(target=self.http_server.serve_forever)
             self.http_thread.start()
+            xbmcgui.Window(10000).setProperty(Const.service_key_property, self.http_server.service_key)
             log.info('HTTP Server started on port %d' % self.http_server.server_address[1])
         else:
             log.warning('HTTP Server already running')
@@ -452,6 +888,7 @@ class TidalMonitor(xbmc.Monitor):
         except Exception as e:
             log.logException(e, 'Failed to stop HTTP Server')
         finally:
+            xbmcgui.Window(10000).clearProperty(Const.service_key_property)
             self.http_server = None
             self.http_thread = None
 
@@ -460,7 +897,34 @@ class TidalMonitor(xbmc.Monitor):
         self.settings = TidalConfig(tidal_addon=xbmcaddon.Addon(__addon_id__))
         if self.http_server:
             self.http_server.enable_messages = self.settings.debug_json
-            self.http_server.mpd_cache_size = self.settings.mpd_cache_size
+            self.http_server.init_segment_proxy(self.settings.segment_proxy, self.settings.segment_prefetch, self.settings.segment_buffer_size * 1024 * 1024)
+            # Also called after the plugin saved a new access token
+            self.http_server.reset_session()
+
+    def check_next_track(self):
+        # Resolves the next track of the music playlist while the current track is ending
+        try:
+            player = xbmc.Player()
+            if not player.isPlayingAudio() or player.getTotalTime() - player.getTime() > NEXT_TRACK_RESOLVE_TIME:
+                return
+            playlist = xbmc.PlayList(xbmc.PLAYLIST_MUSIC)
+            pos = playlist.getposition() + 1
+            if pos <= 0 or pos >= playlist.size():
+                return
+            m = RE_PLAY_TRACK.search(playlist[pos].getPath())
+            if not m or m.group(1) == self.next_track_id:
+                return
+            self.next_track_id = m.group(1)
+            quality = None
+            if self.settings.adaptive_quality:
+                kbps = self.http_server.bandwidth.kbps()
+                quality = select_quality(kbps, self.settings.quality)
+                log.info('Bandwidth %s kbit/s: Resolving next track with quality %s (configured: %s)' % (kbps if kbps else 'unknown', quality, self.settings.quality))
+                # The plugin plays the track with the same quality, even if the bandwidth estimate changes until then
+                xbmcgui.Window(10000).setProperty(NEXT_TRACK_PROPERTY, json.dumps({'track_id': self.next_track_id, 'quality': quality}))
+            Thread(target=self.http_server.resolve_track, args=(self.next_track_id, quality, self.settings.set_playback_info), name='ResolveNextTrack').start()
+        except Exception as e:
+            log.logException(e, 'Failed to check the next track')
 
     def run(self):
         log.info('TidalMonitor: Service Started')
@@ -470,6 +934,10 @@ class TidalMonitor(xbmc.Monitor):
         while not self.abortRequested():
             if self.waitForAbort(wait_time):
                 break
+            if self.http_server and self.settings.adaptive_quality:
+                self.http_server.publish_bandwidth()
+            if self.http_server and self.settings.resolve_next_track:
+                self.check_next_track()
         self._stop_servers()
         log.info('TidalMonitor: Service Terminated')
 
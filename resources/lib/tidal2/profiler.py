@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import sys
+import time
+import threading
+
+try:
+    # Python 3
+    import builtins
+except:
+    # Python 2.7
+    import __builtin__ as builtins
+
+from kodi_six import xbmc, xbmcaddon
+
+try:
+    # LOGNOTICE not available in Kodi 19
+    LOGNOTICE = xbmc.LOGNOTICE
+except:
+    # Use LOGINFO in Kodi 19
+    LOGNOTICE = xbmc.LOGINFO
+
+#------------------------------------------------------------------------------
+# Import Time Profiler for the Plugin Entry Point
+#------------------------------------------------------------------------------
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+class ImportProfiler(object):
+    ''' Measures the import time of the modules which are loaded while the profiler is active.
+        The self time of a module does not include the modules which it imports itself.
+        Only imports of the thread which started the profiler are measured.
+    '''
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.modules = {}
+        self.stack = []
+        self.thread = None
+        self.original_import = None
+        self.start_time = 0
+
+    @staticmethod
+    def start_if_enabled(setting='debug_imports'):
+        try:
+            enabled = xbmcaddon.Addon().getSetting(setting) == 'true'
+        except:
+            enabled = False
+        profiler = ImportProfiler(enabled=enabled)
+        if enabled:
+            profiler.start()
+        return profiler
+
+    def start(self):
+        self.thread = threading.current_thread()
+        self.original_import = builtins.__import__
+        builtins.__import__ = self._import
+        self.start_time = timer()
+
+    def stop(self):
+        if not self.original_import:
+            return
+        builtins.__import__ = self.original_import
+        self.original_import = None
+        total = timer() - self.start_time
+        for line in self.report(total):
+            xbmc.log('[Import Profile] %s' % line, LOGNOTICE)
+
+    def _module_name(self, name, globals, fromlist, level):
+        if level > 0 and globals:
+            # Relative import
+            package = globals.get('__package__') or globals.get('__name__', '')
+            package = package.rsplit('.', level - 1)[0] if level > 1 else package
+            name = '%s.%s' % (package, name) if name else package
+        return name
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if threading.current_thread() is not self.thread:
+            return self.original_import(name, globals, locals, fromlist, level)
+        count = len(sys.modules)
+        start = timer()
+        self.stack.append(0.0)
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = timer() - start
+            nested = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            if len(sys.modules) > count:
+                # The module or one of its submodules was loaded
+                module = self._module_name(name, globals, fromlist, level)
+                # from package import module
+                submodules = [f for f in (fromlist or []) if '%s.%s' % (module, f) in sys.modules]
+                if submodules:
+                    module = '%s.%s' % (module, ','.join(submodules))
+                cumulative, own = self.modules.get(module, (0.0, 0.0))
+                self.modules[module] = (cumulative + elapsed, own + elapsed - nested)
+
+    def report(self, total, limit=30):
+        lines = ['%d modules loaded in %.1f ms' % (len(self.modules), total * 1000),
+                 '%10s %10s  %s' % ('self [ms]', 'cum. [ms]', 'module')]
+        for module, times in sorted(self.modules.items(), key=lambda item: item[1][1], reverse=True)[:limit]:
+            lines.append('%10.1f %10.1f  %s' % (times[1] * 1000, times[0] * 1000, module))
+        return lines
+
+
+# End of File
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import re
+import sys
+import traceback
+
+from kodi_six import xbmcgui, xbmcplugin
+
+from .common import plugin
+from .debug import log
+from .config import settings
+from .koditidal import TidalSession
+from .items import TrackUrlItem, VideoUrlItem
+
+#------------------------------------------------------------------------------
+# Resolver for the playable Items
+#------------------------------------------------------------------------------
+
+# Kodi starts the plugin for every playlist entry to get its stream URL.
+# These paths are resolved without the route table and the modules of main.py.
+RESOLVER_PATHS = [
+    (re.compile(r'^/play_track/([^/]+)/([^/]+)/?$'), 'play_track'),
+    (re.compile(r'^/play_broadcast/([^/]+)/([^/]+)/?$'), 'play_broadcast'),
+    (re.compile(r'^/play_video/([^/]+)/?$'), 'play_video'),
+]
+
+
+def play_track(session, track_id, album_id):
+    try:
+        media = session.get_track_url(track_id)
+        track = session.get_track(track_id, withAlbum=False) if settings.set_playback_info else None
+        li = media.getListItem(track)
+    except Exception as e:
+        xbmcgui.Dialog().notification('%s Fatal Error' % plugin.name, '%s' % e, xbmcgui.NOTIFICATION_ERROR)
+        traceback.print_exc()
+        li = TrackUrlItem.unplayableItem().getListItem()
+    xbmcplugin.setResolvedUrl(plugin.handle, True, li)
+
+
+def play_broadcast(session, broadcast_id, track_id):
+    try:
+        media = session.get_broadcast_url(broadcast_id)
+        track = None # session.get_track(track_id, withAlbum=False)
+        li = media.getListItem(track)
+    except Exception as e:
+        xbmcgui.Dialog().notification('%s Fatal Error' % plugin.name, '%s' % e, xbmcgui.NOTIFICATION_ERROR)
+        traceback.print_exc()
+        li = TrackUrlItem.unplayableItem().getListItem()
+    xbmcplugin.setResolvedUrl(plugin.handle, True, li)
+
+
+def play_video(session, video_id):
+    try:
+        media = session.get_video_url(video_id)
+        video = session.get_video(video_id) if settings.set_playback_info else None
+        li = media.getListItem(video if isinstance(media, VideoUrlItem) else None)
+    except Exception as e:
+        xbmcgui.Dialog().notification('%s Fatal Error' % plugin.name, repr(e), xbmcgui.NOTIFICATION_ERROR)
+        traceback.print_exc()
+        li = VideoUrlItem.unplayableItem().getListItem()
+    xbmcplugin.setResolvedUrl(plugin.handle, True, li)
+
+
+def get_path(argv):
+    ''' Returns the path of a plugin URL, e.g. /play_track/1234/5678 '''
+    url = argv[0] if argv else ''
+    return '/' + url.split('://', 1)[-1].split('?', 1)[0].partition('/')[2]
+
+
+def is_resolver_path(argv=sys.argv):
+    path = get_path(argv)
+    return any([pattern.match(path) for pattern, func in RESOLVER_PATHS])
+
+
+def run(argv=sys.argv):
+    path = get_path(argv)
+    session = None
+    try:
+        plugin.handle = int(argv[1])
+        session = TidalSession(config=settings)
+        for pattern, func in RESOLVER_PATHS:
+            m = pattern.match(path)
+            if m:
+                globals()[func](session, *m.groups())
+                break
+    except Exception as e:
+        xbmcgui.Dialog().notification('%s Fatal Error' % plugin.name, repr(e), xbmcgui.NOTIFICATION_ERROR)
+        traceback.print_exc()
+    finally:
+        if session:
+            session.cleanup()
+        log.killDebugThreads()
+
+# End of File
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import re
+import json
+import datetime
+import threading
+import sqlite3
+
+from .debug import log
+
+#------------------------------------------------------------------------------
+# SQLite storage for the cached user data
+#------------------------------------------------------------------------------
+
+STORAGE_VERSION = 1
+
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+# Tables with one JSON object per key
+DICT_TABLES = ['playlists', 'folders', 'userprofiles']
+
+
+def _encode(obj):
+    if isinstance(obj, datetime.datetime):
+        return {'$datetime': obj.strftime(DATETIME_FORMAT)}
+    raise TypeError('%s is not JSON serializable' % repr(obj))
+
+
+def _decode(obj):
+    if '$datetime' in obj:
+        try:
+            # Not using strptime because it is not thread safe in Python 2
+            return datetime.datetime(*[int(v) for v in re.split(r'[-T:.]', obj['$datetime'])])
+        except:
+            return None
+    return obj
+
+
+class CacheStore(object):
+    ''' Stores favorite IDs, locked artists and the playlist, folder and userprofile caches
+        in a SQLite database. Every table is loaded only when it is used, and only
+        changed rows are written within one transaction.
+    '''
+
+    def __init__(self, filename, legacy_files=None):
+        self.filename = filename
+        # Old repr/eval cache files which are imported into the database once
+        self.legacy_files = legacy_files if legacy_files else {}
+        self.lock = threading.RLock()
+        self.conn = None
+
+    def connect(self):
+        with self.lock:
+            if self.conn:
+                return self.conn
+            folder = os.path.dirname(self.filename)
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+            self.conn = sqlite3.connect(self.filename, timeout=10, check_same_thread=False)
+            self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS favorites (content_type TEXT, id TEXT, PRIMARY KEY (content_type, id))')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS locked_artists (id TEXT PRIMARY KEY)')
+            for table in DICT_TABLES:
+                self.conn.execute('CREATE TABLE IF NOT EXISTS %s (id TEXT PRIMARY KEY, data TEXT)' % table)
+            self.conn.commit()
+            version = self.get_meta('version')
+            if version is None:
+                self.migrate()
+                self.set_meta('version', STORAGE_VERSION)
+            return self.conn
+
+    def close(self):
+        with self.lock:
+            if self.conn:
+                try:
+                    self.conn.close()
+                except:
+                    pass
+                self.conn = None
+
+    def get_meta(self, key):
+        row = self.connect().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, '%s' % value))
+
+    def del_meta(self, key):
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                conn.execute('DELETE FROM meta WHERE key = ?', (key,))
+
+    def migrate(self):
+        ''' Imports the old repr/eval cache files '''
+        for table, filename in self.legacy_files.items():
+            if not os.path.isfile(filename):
+                continue
+            try:
+                with open(filename, 'r') as fd:
+                    data = eval(fd.read())
+                if table == 'favorites':
+                    self.save_favorites(data, {})
+                elif table == 'locked_artists':
+                    self.save_locked_artists(data)
+                else:
+                    self.save_dict(table, data, {})
+                os.rename(filename, filename + '.bak')
+                log.info('Migrated %s into the cache database' % filename)
+            except Exception as e:
+                log.logException(e, 'Failed to migrate %s' % filename)
+
+    def load_favorites(self):
+        ''' Returns a dict with sets of favorite IDs or None if the favorites were never saved '''
+        if not self.get_meta('favorites'):
+            return None
+        ids = {}
+        for content_type, _id in self.connect().execute('SELECT content_type, id FROM favorites'):
+            ids.setdefault(content_type, set()).add(_id)
+        return ids
+
+    def save_favorites(self, ids, ids_on_disk):
+        ''' Writes the added and removed favorite IDs '''
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                for content_type in ids.keys():
+                    new_ids = set(ids.get(content_type, []))
+                    old_ids = set(ids_on_disk.get(content_type, []))
+                    conn.executemany('INSERT OR REPLACE INTO favorites (content_type, id) VALUES (?, ?)', [(content_type, _id) for _id in new_ids - old_ids])
+                    conn.executemany('DELETE FROM favorites WHERE content_type = ? AND id = ?', [(content_type, _id) for _id in old_ids - new_ids])
+                conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('favorites', '1'))
+
+    def clear_favorites(self):
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                conn.execute('DELETE FROM favorites')
+                conn.execute('DELETE FROM meta WHERE key = ?', ('favorites',))
+
+    def load_locked_artists(self):
+        ''' Returns the list of locked artist IDs or None if it was never saved '''
+        if not self.get_meta('locked_artists'):
+            return None
+        return sorted([row[0] for row in self.connect().execute('SELECT id FROM locked_artists')])
+
+    def save_locked_artists(self, artist_ids):
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                conn.execute('DELETE FROM locked_artists')
+                conn.executemany('INSERT OR REPLACE INTO locked_artists (id) VALUES (?)', [('%s' % _id,) for _id in artist_ids])
+                conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('locked_artists', '1'))
+
+    def load_dict(self, table):
+        ''' Returns the cache dict of a table or None if it was never saved '''
+        if not self.get_meta(table):
+            return None
+        return dict([(_id, json.loads(data, object_hook=_decode)) for _id, data in self.connect().execute('SELECT id, data FROM %s' % table)])
+
+    def save_dict(self, table, items, items_on_disk):
+        ''' Writes new and changed entries and deletes the removed ones. Returns the number of changes '''
+        changed = [(_id, json.dumps(item, default=_encode)) for _id, item in items.items() if items_on_disk.get(_id, None) != item]
+        removed = [(_id,) for _id in items_on_disk.keys() if _id not in items]
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO %s (id, data) VALUES (?, ?)' % table, changed)
+                conn.executemany('DELETE FROM %s WHERE id = ?' % table, removed)
+                conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (table, '1'))
+        return len(changed) + len(removed)
+
+    def clear_dict(self, table):
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                conn.execute('DELETE FROM %s' % table)
+                conn.execute('DELETE FROM meta WHERE key = ?', (table,))
+
+# End of File
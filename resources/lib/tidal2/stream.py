@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import re
+import json
+import time
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+
+try:
+    # for Python 3
+    from queue import Queue, Empty
+except:
+    # Python 2.7
+    from Queue import Queue, Empty
+
+from .debug import log
+from .tidalapi import PagePrefetch
+from .tidalapi.models import Quality
+
+#------------------------------------------------------------------------------
+# Bandwidth Estimation for the Audio Quality
+#------------------------------------------------------------------------------
+
+# Window property with the bandwidth estimate of the service for the plugin
+BANDWIDTH_PROPERTY = 'tidal2.bandwidth'
+
+# Window property with the track ID and the quality of the next track which the service resolved
+NEXT_TRACK_PROPERTY = 'tidal2.next_track'
+
+# Audio qualities from the best to the worst with the bitrate in kbit/s which they need
+QUALITY_BITRATE = [
+    (Quality.hi_res_lossless, 4800),
+    (Quality.hi_res, 1500),
+    (Quality.lossless, 1100),
+    (Quality.high, 320),
+    (Quality.low, 96),
+]
+
+
+def select_quality(kbps, max_quality, headroom=1.5):
+    ''' Returns the best quality up to max_quality which plays with the given bandwidth '''
+    qualities = [q for q, bitrate in QUALITY_BITRATE]
+    if not kbps or max_quality not in qualities:
+        return max_quality
+    for quality, bitrate in QUALITY_BITRATE[qualities.index(max_quality):]:
+        if bitrate * headroom <= kbps:
+            return quality
+    return Quality.low
+
+
+class BandwidthEstimator(object):
+    ''' Rolling estimate of the download bandwidth from the segment downloads of the last window seconds.
+        The bytes are divided by the time in which at least one download was running,
+        so parallel downloads are measured together.
+    '''
+
+    def __init__(self, window=30, min_bytes=64*1024):
+        self.window = window
+        self.min_bytes = min_bytes
+        self.lock = threading.Lock()
+        self.samples = []
+        self.last_sample = 0
+
+    def add(self, start, end, size):
+        if size < self.min_bytes or end <= start:
+            # Small downloads only measure the latency
+            return
+        with self.lock:
+            self.samples.append((start, end, size))
+            self.last_sample = end
+
+    def kbps(self):
+        ''' Returns the estimate in kbit/s or 0 without downloads within the window '''
+        with self.lock:
+            limit = time.time() - self.window
+            self.samples = [s for s in self.samples if s[1] >= limit]
+            samples = sorted(self.samples)
+        busy = 0.0
+        busy_end = 0.0
+        for start, end, size in samples:
+            start = max(start, busy_end)
+            if end > start:
+                busy += end - start
+                busy_end = end
+        if busy <= 0:
+            return 0
+        return int(sum([s[2] for s in samples]) * 8 / busy / 1000)
+
+    def to_json(self):
+        return json.dumps({'kbps': self.kbps(), 'time': self.last_sample})
+
+    @staticmethod
+    def from_json(data, max_age=600):
+        ''' Returns the estimate of a to_json() string or 0 if it is too old '''
+        try:
+            info = json.loads(data)
+            return info.get('kbps', 0) if info.get('time', 0) + max_age > time.time() else 0
+        except:
+            return 0
+
+#------------------------------------------------------------------------------
+# DASH Segments as one continuous Stream
+#------------------------------------------------------------------------------
+
+RE_RANGE = re.compile(r'bytes=(\d*)-(\d*)')
+
+# Returned by parse_range for ranges which are answered with 416
+RANGE_NOT_SATISFIABLE = (-1, -1)
+
+
+def parse_range(range_header, length):
+    ''' Returns the (start, end) byte positions of a Range header, None for the whole file
+        or RANGE_NOT_SATISFIABLE if the range is outside of the file or reversed.
+    '''
+    m = RE_RANGE.match(range_header or '')
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if not m.group(1):
+        # Suffix range: the last n bytes
+        start = max(0, length - int(m.group(2)))
+        end = length - 1
+    else:
+        start = int(m.group(1))
+        end = min(length - 1, int(m.group(2))) if m.group(2) else length - 1
+    if start > end:
+        return RANGE_NOT_SATISFIABLE
+    return (start, end)
+
+
+class SegmentStream(object):
+    ''' Presents the initialization segment and all media segments of a DASH manifest
+        as one fragmented MP4 file. The byte sizes of the segments are read with parallel
+        HEAD requests in the background, so that byte ranges can be mapped onto the segments.
+        Until then, the stream can only be sent from the start without a length.
+        The segments are loaded by the SegmentProxy, which also loads the next segments in advance.
+    '''
+
+    def __init__(self, dash, http, proxy, key, layout_threads=8):
+        self.urls = dash.urls()
+        self.mimeType = dash.mimeType or 'audio/mp4'
+        self.http = http
+        self.proxy = proxy
+        self.key = key
+        self.layout_threads = layout_threads
+        self.lock = threading.Lock()
+        self.layout_thread = None
+        self.layout_done = threading.Event()
+        self.sizes = [None] * len(self.urls)
+        self.offsets = None
+        self.length = 0
+
+    def start_layout(self):
+        ''' Starts to read the sizes of the segments in the background '''
+        with self.lock:
+            if self.layout_thread is None:
+                self.layout_thread = threading.Thread(target=self._layout, name='SegmentStream.layout')
+                self.layout_thread.daemon = True
+                self.layout_thread.start()
+
+    def has_layout(self):
+        return self.layout_done.is_set() and self.offsets is not None
+
+    def layout(self, timeout=60):
+        ''' Waits for the sizes of all segments and returns the total length '''
+        self.start_layout()
+        self.layout_done.wait(timeout)
+        if not self.has_layout():
+            raise IOError('No layout for the stream %s' % self.key)
+        return self.length
+
+    def _layout(self):
+        try:
+            queue = Queue()
+            for index, size in enumerate(self.sizes):
+                if size is None:
+                    queue.put(index)
+            def worker():
+                while True:
+                    try:
+                        index = queue.get_nowait()
+                    except Empty:
+                        return
+                    if self.sizes[index] is None:
+                        self.sizes[index] = self._segment_size(index)
+            threads = [PagePrefetch(worker) for i in range(min(self.layout_threads, queue.qsize()))]
+            for thread in threads:
+                thread.get()
+            offsets = [0]
+            for size in self.sizes:
+                offsets.append(offsets[-1] + size)
+            self.length = offsets[-1]
+            self.offsets = offsets
+            log.info('Stream layout: %s segments with %s bytes' % (len(self.sizes), self.length))
+        except Exception as e:
+            log.logException(e, 'Failed to read the layout of stream %s' % self.key)
+        finally:
+            self.layout_done.set()
+
+    def _segment_size(self, index):
+        r = self.http.request('HEAD', self.urls[index], allow_redirects=True)
+        if r.ok and r.headers.get('Content-Length', None):
+            return int(r.headers['Content-Length'])
+        # No size from the CDN. Load the segment instead.
+        return len(self.segment(index))
+
+    def segment(self, index):
+        if not self.proxy.has_track(self.key):
+            self.proxy.register(self.key, self.urls)
+        data = self.proxy.get(self.key, index)
+        if self.sizes[index] is None:
+            # Saves the HEAD request of the layout
+            self.sizes[index] = len(data)
+        return data
+
+    def iter_all(self):
+        ''' Yields all segments. Doesn't need the layout. '''
+        for index in range(len(self.urls)):
+            yield self.segment(index)
+
+    def iter_range(self, start, end):
+        ''' Yields the bytes from start to end (inclusive).
+            Raises an IOError if a segment doesn't match the layout, so the connection is aborted
+            instead of sending less bytes than announced.
+        '''
+        index = bisect_right(self.offsets, start) - 1
+        pos = start
+        while index < len(self.urls) and pos <= end:
+            data = self.segment(index)
+            if len(data) != self.sizes[index]:
+                raise IOError('Segment %s has %s bytes instead of %s' % (index, len(data), self.sizes[index]))
+            offset = pos - self.offsets[index]
+            chunk = data[offset:offset + end - pos + 1]
+            yield chunk
+            pos += len(chunk)
+            index += 1
+        if pos <= end:
+            raise IOError('Stream ended at byte %s instead of %s' % (pos, end + 1))
+
+
+class SegmentProxy(object):
+    ''' Serves the segments of HLS playlists from a memory buffer.
+        When a segment is requested, the next segments of the track are loaded
+        by a pool of worker threads. The buffer is capped at max_bytes and the
+        oldest segments are removed first.
+    '''
+
+    def __init__(self, http, prefetch=4, max_bytes=16*1024*1024, threads=4, max_tracks=4, bandwidth=None):
+        self.http = http
+        self.bandwidth = bandwidth
+        self.prefetch = prefetch
+        self.max_bytes = max_bytes
+        self.max_tracks = max_tracks
+        self.lock = threading.Lock()
+        self.tracks = OrderedDict()
+        self.buffer = OrderedDict()
+        self.buffer_size = 0
+        self.loading = {}
+        self.queue = Queue()
+        self.workers = []
+        for i in range(max(1, threads)):
+            worker = threading.Thread(target=self._worker, name='SegmentProxy.%s' % i)
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+        self.requests = 0
+        self.hits = 0
+        self.stalls = 0
+        self.prefetched = 0
+        self.evicted = 0
+
+    def register(self, key, urls):
+        with self.lock:
+            self.tracks.pop(key, None)
+            self.tracks[key] = urls
+            while len(self.tracks) > self.max_tracks:
+                self.tracks.popitem(last=False)
+
+    def has_track(self, key):
+        with self.lock:
+            return key in self.tracks
+
+    def get(self, key, index):
+        ''' Returns the data of a segment and starts to load the next segments '''
+        with self.lock:
+            self.requests += 1
+            data = self.buffer.get((key, index), None)
+            loading = self.loading.get((key, index), None) if data is None else None
+            if data is not None:
+                self.hits += 1
+            else:
+                # The player has to wait for the network
+                self.stalls += 1
+                if not loading:
+                    self.loading[(key, index)] = threading.Event()
+        self._prefetch(key, index + 1)
+        if data is not None:
+            return data
+        if loading:
+            loading.wait(60)
+            with self.lock:
+                data = self.buffer.get((key, index), None)
+            if data is not None:
+                return data
+        try:
+            data = self._load(key, index)
+            self._store(key, index, data)
+            return data
+        finally:
+            if not loading:
+                with self.lock:
+                    self.loading.pop((key, index)).set()
+
+    def _load(self, key, index):
+        with self.lock:
+            url = self.tracks[key][index]
+        start = time.time()
+        r = self.http.get(url)
+        r.raise_for_status()
+        if self.bandwidth:
+            self.bandwidth.add(start, time.time(), len(r.content))
+        return r.content
+
+    def _store(self, key, index, data):
+        with self.lock:
+            if (key, index) in self.buffer:
+                return
+            self.buffer[(key, index)] = data
+            self.buffer_size += len(data)
+            while self.buffer_size > self.max_bytes and len(self.buffer) > 1:
+                k, old = self.buffer.popitem(last=False)
+                self.buffer_size -= len(old)
+                self.evicted += 1
+
+    def _prefetch(self, key, first_index):
+        with self.lock:
+            count = len(self.tracks.get(key, []))
+            for index in range(first_index, min(count, first_index + self.prefetch)):
+                if (key, index) not in self.buffer and (key, index) not in self.loading:
+                    self.loading[(key, index)] = threading.Event()
+                    self.queue.put((key, index))
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            key, index = item
+            try:
+                self._store(key, index, self._load(key, index))
+                with self.lock:
+                    self.prefetched += 1
+            except Exception as e:
+                log.warning('Prefetch of segment %s of %s failed: %s' % (index, key, e))
+            finally:
+                with self.lock:
+                    self.loading.pop((key, index)).set()
+
+    def statistics(self):
+        with self.lock:
+            return {'prefetch': self.prefetch,
+                    'requests': self.requests,
+                    'hits': self.hits,
+                    'hit_rate': round(100.0 * self.hits / self.requests, 1) if self.requests else 0.0,
+                    'stalls': self.stalls,
+                    'prefetched': self.prefetched,
+                    'evicted': self.evicted,
+                    'buffered_segments': len(self.buffer),
+                    'buffered_bytes': self.buffer_size,
+                    'max_bytes': self.max_bytes}
+
+    def close(self):
+        for worker in self.workers:
+            self.queue.put(None)
+
+
+# End of File
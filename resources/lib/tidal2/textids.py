@@ -252,6 +252,20 @@ class Msg(object):
     i30525 = 30525 # Sony Real Audio 360
     i30526 = 30526 # Follower Profiles
     i30527 = 30527 # MPD Cache size
+    i30529 = 30529 # HTTP connection pool size
+    i30530 = 30530 # Concurrent page requests
+    i30531 = 30531 # Response cache size (0 = off)
+    i30532 = 30532 # Load catalog results through the service (experimental)
+    i30533 = 30533 # HTTP server worker threads
+    i30534 = 30534 # HTTP server threads for fanart
+    i30535 = 30535 # Fanart cache size (MB)
+    i30536 = 30536 # Play as single file
+    i30537 = 30537 # HLS converter: Load segments through the service
+    i30538 = 30538 # Number of prefetched segments
+    i30539 = 30539 # Segment buffer size (MB)
+    i30540 = 30540 # Resolve the next track in advance
+    i30541 = 30541 # Adapt audio quality to the bandwidth
+    i30542 = 30542 # Log the import time of the modules
 
 
 def _T(txtid):
@@ -30,9 +30,13 @@ import base64
 import hashlib
 import pyaes
 import uuid
+import copy
+import threading
+from requests.adapters import HTTPAdapter
 from requests.structures import CaseInsensitiveDict
 
 from .models import *
+from .cache import ResponseCache, TrackUrlCache, build_response
 
 try:
     from urlparse import parse_qs, urljoin, urlsplit
@@ -40,6 +44,15 @@ try:
 except ImportError:
     from urllib.parse import parse_qs, urljoin, urlsplit, urlencode, unquote
 
+try:
+    from http.cookiejar import DefaultCookiePolicy
+except ImportError:
+    from cookielib import DefaultCookiePolicy
+
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
 
 # log = logging.getLogger(__name__.split('.')[-1])
 from ..debug import log
@@ -57,6 +70,9 @@ URL_LOGIN = 'https://login.tidal.com/'
 OAUTH_BASE_URL = 'https://auth.tidal.com/v1/oauth2/'
 DEFAULT_SCOPE = 'r_usr+w_usr+w_sub' # w_usr=WRITE_USR, r_usr=READ_USR_DATA, w_sub=WRITE_SUBSCRIPTION
 REFRESH_SCOPE = 'r_usr+w_usr'
+# API versions which the service runs for the plugin
+SERVICE_API_URLS = {'v1': URL_API_V1, 'v2': URL_API_V2}
+SERVICE_KEY_HEADER = 'X-Tidal2-Key'
 
 ALL_SAERCH_FIELDS = ['ARTISTS', 'ALBUMS', 'PLAYLISTS', 'TRACKS', 'VIDEOS', 'USERPROFILES']
 
@@ -83,6 +99,175 @@ class AuthenticationError(requests.RequestException):
         return '\n'.join(errtab)
 
 
+class CountingHTTPAdapter(HTTPAdapter):
+    ''' HTTPAdapter which counts the connections when they are opened.
+        The pools of the pool manager can be evicted, so their counters get lost.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        self.connections_opened = 0
+        self.count_lock = threading.Lock()
+        HTTPAdapter.__init__(self, *args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+        adapter = self
+        def counting_pool_class(pool_class):
+            class CountingPool(pool_class):
+                def _new_conn(self):
+                    with adapter.count_lock:
+                        adapter.connections_opened += 1
+                    return pool_class._new_conn(self)
+            return CountingPool
+        self.poolmanager.pool_classes_by_scheme = dict([(scheme, counting_pool_class(pool_class)) for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items()])
+
+
+class HttpTransport(object):
+    ''' Pool of keep-alive connections which is used for all HTTP requests of a Session '''
+
+    def __init__(self, pool_size=10):
+        self.pool_size = max(1, pool_size)
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self.adapter = CountingHTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.http = requests.Session()
+        self.http.mount('https://', self.adapter)
+        self.http.mount('http://', self.adapter)
+        self.http.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+        # Don't keep cookies between the requests like the module-level requests functions
+        self.http.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    def request(self, method, url, **kwargs):
+        r = self.http.request(method, url, **kwargs)
+        with self.lock:
+            self.request_count += 1
+        return r
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def connection_count(self):
+        return self.adapter.connections_opened
+
+    def statistics(self):
+        connections = self.connection_count()
+        reused = max(0, self.request_count - connections)
+        rate = 100.0 * reused / self.request_count if self.request_count else 0.0
+        return 'HTTP Transport: %d requests with %d connections (%.0f%% reused)' % (self.request_count, connections, rate)
+
+    def close(self):
+        try:
+            self.http.close()
+        except:
+            pass
+
+
+class ServiceClient(object):
+    ''' Gets the results of catalog requests from the long running service process.
+        The service runs the requests with its own session and response cache,
+        so the access token is never sent to the service.
+    '''
+
+    def __init__(self, rpc_url, key):
+        self.rpc_url = rpc_url
+        self.key = key
+        self.http = HttpTransport(pool_size=1)
+        self.service_available = True
+        self.rpc_count = 0
+
+    def request(self, url, path, params=None):
+        ''' Returns the response of a GET request or None if the plugin has to send it itself '''
+        api = [k for k, v in SERVICE_API_URLS.items() if v == url]
+        if not self.service_available or not api:
+            return None
+        try:
+            rpc = self.http.post(self.rpc_url, json={'api': api[0], 'path': path, 'params': params},
+                                 headers={SERVICE_KEY_HEADER: self.key}, timeout=(0.5, 60))
+            if not rpc.ok:
+                log.warning('Service request failed with status %s, using direct request' % rpc.status_code)
+                return None
+            result = rpc.json()
+            self.rpc_count += 1
+            return build_response(result['status'], {}, result['content'].encode('utf-8'), 'GET', result['url'])
+        except requests.exceptions.ConnectionError as e:
+            log.warning('Service is not available, using direct requests: %s' % e)
+            self.service_available = False
+        except Exception as e:
+            log.warning('Service request failed, using direct request: %s' % e)
+        return None
+
+    def statistics(self):
+        return 'Service Client: %d results from the service' % self.rpc_count
+
+    def close(self):
+        self.http.close()
+
+
+class PagePrefetch(threading.Thread):
+    ''' Reads the next page of a list in the background '''
+
+    def __init__(self, func, *args):
+        threading.Thread.__init__(self, name='PagePrefetch')
+        self.daemon = True
+        self.func = func
+        self.args = args
+        self.result = None
+        self.error = None
+        self.start()
+
+    def run(self):
+        try:
+            self.result = self.func(*self.args)
+        except Exception as e:
+            self.error = e
+
+    def get(self):
+        self.join()
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class CursorIterator(object):
+    ''' Iterates over all items of a cursor based V2 list.
+        The paging state is kept in this object and the next page is requested
+        in the background while the items of the current page are parsed.
+    '''
+
+    def __init__(self, session, path, url=URL_API_V2, params=None, data=None, headers=None, authenticate=True, ret=None):
+        self.session = session
+        self.path = path
+        self.url = url
+        self.params = dict(params) if params else {}
+        self.data = data
+        self.headers = headers
+        self.authenticate = authenticate
+        self.ret = ret
+        self.position = 0
+        self.pages = 0
+
+    def _fetch(self, cursor):
+        params = dict(self.params)
+        if cursor:
+            params['cursor'] = cursor
+        r = self.session.request('GET', url=self.url, path=self.path, params=params, data=self.data, headers=self.headers, authenticate=self.authenticate)
+        return r.json() if r.ok else None
+
+    def __iter__(self):
+        json_obj = self._fetch('')
+        while json_obj:
+            self.pages += 1
+            cursor = json_obj.get('cursor', '')
+            prefetch = PagePrefetch(self._fetch, cursor) if cursor else None
+            for item in self.session._map_items(json_obj, url=self.url, params=self.params, ret=self.ret, position=self.position):
+                self.position += 1
+                yield item
+            json_obj = prefetch.get() if prefetch else None
+
+
 class PKCE_Authenticator(object):
 
     def __init__(self, config, **kwargs):
@@ -140,17 +325,106 @@ class PKCE_Authenticator(object):
         return self.token
 
 
+# Parser methods for the item types. The item type must start with the prefix.
+ITEM_PARSERS = [
+    ('artist', '_parse_artist'),
+    ('album', '_parse_album'),
+    ('track_url', '_parse_track_url'),
+    ('track', '_parse_track'),
+    ('video_url', '_parse_video_url'),
+    ('video', '_parse_video'),
+    ('playlist', '_parse_playlist'),
+    ('folder', '_parse_folder'),
+    ('category', '_parse_category'),
+    ('search', '_parse_search'),
+    ('mix', '_parse_mix'),
+    ('broadcast_url', '_parse_broadcast_url'),
+    ('broadcast', '_parse_broadcast'),
+    ('lyrics', '_parse_lyrics'),
+    ('userprofile', '_parse_userprofile'),
+    ('userprompt', '_parse_userprompt'),
+    ('user_session', '_parse_user_session'),
+    ('user', '_parse_user'),
+    ('refresh_token', '_parse_refresh_token'),
+    ('subscription', '_parse_subscription'),
+    ('device_code', '_parse_device_code'),
+    ('auth_token', '_parse_auth_token'),
+]
+
+# Parser method names of the requested item types
+ITEM_PARSER_CACHE = {}
+
+# Table of the nested artists and albums of the response which is parsed by the thread
+INTERNED_ITEMS = threading.local()
+
+
 class Session(object):
 
-    def __init__(self, config):
+    _http = None
+    _http_owner = False
+    _response_cache = None
+    _track_url_cache = None
+
+    # Classes of the parsed items. Derived sessions can use derived classes
+    # which are created directly from the JSON data.
+    item_classes = {
+        'artist': Artist,
+        'album': Album,
+        'track': Track,
+        'track_url': TrackUrl,
+        'video': Video,
+        'video_url': VideoUrl,
+        'playlist': Playlist,
+        'folder': Folder,
+        'promotion': Promotion,
+        'category': Category,
+        'mix': Mix,
+        'broadcast': Broadcast,
+        'broadcast_url': BroadcastUrl,
+        'userprofile': UserProfile,
+        'userprompt': UserPrompt,
+    }
+
+    def __init__(self, config, http=None):
         """:type _config: :class:`Config`"""
         self._config = config
+        self._http = http
         self.user = User(self)
-        self._cursor = ''
-        self._cursor_pos = 0
         self._streamingSessionId = None
 
+    @property
+    def http(self):
+        """ Connection pool of this Session. Shared pools are given to the constructor """
+        if not self._http:
+            self._http = HttpTransport(pool_size=getattr(self._config, 'http_pool_size', 10))
+            self._http_owner = True
+        return self._http
+
+    @property
+    def response_cache(self):
+        """ Persistent cache for catalog responses. None if disabled in the config """
+        if self._response_cache is None and getattr(self._config, 'response_cache_dir', '') and getattr(self._config, 'response_cache_size', 0) > 0:
+            self._response_cache = ResponseCache(self._config.response_cache_dir, max_entries=self._config.response_cache_size)
+        return self._response_cache
+
+    @property
+    def track_url_cache(self):
+        """ Cache for track URLs which is shared with other processes. None if disabled in the config """
+        if self._track_url_cache is None and getattr(self._config, 'track_url_cache_dir', '') and getattr(self._config, 'mpd_cache_size', 0) > 0:
+            self._track_url_cache = TrackUrlCache(self._config.track_url_cache_dir, max_entries=self._config.mpd_cache_size)
+        return self._track_url_cache
+
     def cleanup(self):
+        if self._response_cache:
+            log.info(self._response_cache.statistics())
+            self._response_cache = None
+        if self._track_url_cache:
+            log.info(self._track_url_cache.statistics())
+            self._track_url_cache = None
+        if self._http and self._http_owner:
+            log.info(self._http.statistics())
+            self._http.close()
+        self._http = None
         self._config = None
         if self.user:
             self.user._session = None
@@ -163,7 +437,7 @@ class Session(object):
         try:
             url = urljoin(URL_API_V1, 'country/context')
             headers = { 'X-Tidal-Token': self._config.preview_token}
-            r = requests.get(url, params={'countryCode': 'WW'}, headers=headers)
+            r = self.http.get(url, params={'countryCode': 'WW'}, headers=headers)
             if not r.ok:
                 return default
             return r.json().get('countryCode', default)
@@ -178,7 +452,7 @@ class Session(object):
             'client_id': pyaes.AESModeOfOperationCTR(self._config.token_secret).decrypt(base64.b64decode(client_id)).decode('utf-8') if self._config.client_name else client_id,
             'scope': DEFAULT_SCOPE
         }
-        r = requests.post(urljoin(OAUTH_BASE_URL, 'device_authorization'), data=data)
+        r = self.http.post(urljoin(OAUTH_BASE_URL, 'device_authorization'), data=data)
         r = self.check_response(r)
         device_code = self._parse_device_code(r.json())
         device_code._client_id = client_id
@@ -193,7 +467,7 @@ class Session(object):
             'grant_type': 'urn:ietf:params:oauth:grant-type:device_code',
             'scope': DEFAULT_SCOPE
         }
-        r = requests.post(urljoin(OAUTH_BASE_URL, 'token'), data=data)
+        r = self.http.post(urljoin(OAUTH_BASE_URL, 'token'), data=data)
         if self._config.debug_json:
             r = self.check_response(r, raiseOnError=False)
         try:
@@ -262,7 +536,7 @@ class Session(object):
         if self._config.client_secret:
             data['client_secret'] = pyaes.AESModeOfOperationCTR(self._config.token_secret).decrypt(base64.b64decode(self._config.client_secret)).decode('utf-8') if self._config.client_name else self._config.client_secret
         log.debug('Requesting new Access Token...')
-        r = requests.post(urljoin(OAUTH_BASE_URL, 'token'), data=data)
+        r = self.http.post(urljoin(OAUTH_BASE_URL, 'token'), data=data)
         if self._config.debug_json:
             r = self.check_response(r, raiseOnError=False)
         try:
@@ -301,6 +575,10 @@ class Session(object):
             except:
                 pass
         self._config.init()
+        if self.response_cache:
+            self.response_cache.clear()
+        if self.track_url_cache:
+            self.track_url_cache.clear()
         self.user = None
 
     def request(self, method, url=URL_API_V1, path=None, params=None, data=None, headers=None, authenticate=True):
@@ -326,11 +604,34 @@ class Session(object):
             # Request with Preview-Token. Remove SessionId if given via headers parameter
             # request_headers.pop('X-Tidal-SessionId', None)
             request_params.update({'token': self._config.preview_token})
-        r = requests.request(method, url, params=request_params, data=data, headers=request_headers)
+        cache = self.response_cache if method == 'GET' and not data else None
+        ttl = cache.ttl(path) if cache else None
+        cache_entry = None
+        if ttl is not None:
+            cache_key = cache.key(method, url, request_params, self._config.country_code, self._config.locale, self._config.user_id)
+            cache_entry = cache.get(cache_key)
+            if cache_entry:
+                if cache.is_fresh(cache_entry):
+                    cache.hits += 1
+                    log.info('Using cached response for %s' % url)
+                    return self.check_response(cache.response(cache_entry, method, url, request_params))
+                etag = cache.etag(cache_entry)
+                if etag:
+                    request_headers.update({'If-None-Match': etag})
+        r = self.http.request(method, url, params=request_params, data=data, headers=request_headers)
         if self.token_expired(r):
             self.token_refresh()
             request_headers.update({'Authorization': '{} {}'.format(self._config.token_type, self._config.access_token)})
-            r = requests.request(method, url, params=request_params, data=data, headers=request_headers)
+            r = self.http.request(method, url, params=request_params, data=data, headers=request_headers)
+        if ttl is not None:
+            if r.status_code == 304 and cache_entry:
+                cache.revalidated += 1
+                cache.refresh(cache_key, cache_entry, ttl)
+                log.info('Cached response for %s is not modified' % url)
+                return self.check_response(cache.response(cache_entry, method, url, request_params))
+            cache.misses += 1
+            if r.ok:
+                cache.put(cache_key, r, ttl)
         return self.check_response(r)
 
     def check_response(self, r, raiseOnError=True, debugJson=True):
@@ -381,27 +682,23 @@ class Session(object):
         if not playlist or playlist.numberOfItems == 0:
             return []
         itemCount = playlist.numberOfItems - offset
-        remaining = min(itemCount, limit)
+        lastOffset = offset + min(itemCount, limit)
+        # Number of Items is limited to 100, so read all pages concurrently if more than 100 entries are requested
+        pages = [(pageOffset, min(100, lastOffset - pageOffset)) for pageOffset in range(offset, lastOffset, 100)]
         result = []
-        # Number of Items is limited to 100, so read multiple times if more than 100 entries are requested
-        while remaining > 0:
-            nextLimit = min(100, remaining)
-            items = self._map_request('playlists/%s/items' % playlist.id, params={'offset': offset, 'limit': nextLimit}, ret='playlistitems')
-            if items:
-                track_no = offset
-                for item in items:
-                    item._playlist_id = playlist.id
-                    item._playlist_pos = track_no
-                    item._etag = playlist._etag
-                    item._playlist_name = playlist.title
-                    item._playlist_type = playlist.type
-                    item._pageSize = limit
-                    track_no += 1
-                remaining -= len(items)
-                result += items
-            else:
-                remaining = 0
-            offset += 100
+        for pageOffset, items in self._fetch_pages('playlists/%s/items' % playlist.id, pages, ret='playlistitems'):
+            if not items:
+                break
+            track_no = pageOffset
+            for item in items:
+                item._playlist_id = playlist.id
+                item._playlist_pos = track_no
+                item._etag = playlist._etag
+                item._playlist_name = playlist.title
+                item._playlist_type = playlist.type
+                item._pageSize = limit
+                track_no += 1
+            result += items
         if ret.startswith('track'):
             # Return tracks only
             result = [item for item in result if isinstance(item, Track)]
@@ -417,20 +714,16 @@ class Session(object):
         return self._map_request('albums/%s/tracks' % album_id, ret='tracks')
 
     def get_album_items(self, album_id, ret='playlistitems'):
-        offset = 0
-        remaining = 9999
-        result = []
-        # Number of Items is limited to 100, so read multiple times if more than 100 entries are requested
-        while remaining > 0:
-            items = self._map_request('albums/%s/items' % album_id, params={'offset': offset, 'limit': 100}, ret='playlistitems')
-            if items:
-                if remaining == 9999:
-                    remaining = items[0]._totalNumberOfItems
-                remaining -= len(items)
+        path = 'albums/%s/items' % album_id
+        # First page contains the total number of items
+        result = self._map_request(path, params={'offset': 0, 'limit': 100}, ret='playlistitems')
+        if result and result[0]._totalNumberOfItems > len(result):
+            # Number of Items is limited to 100, so read the remaining pages concurrently
+            pages = [(pageOffset, 100) for pageOffset in range(100, result[0]._totalNumberOfItems, 100)]
+            for pageOffset, items in self._fetch_pages(path, pages, ret='playlistitems'):
+                if not items:
+                    break
                 result += items
-            else:
-                remaining = 0
-            offset += 100
         if ret.startswith('track'):
             # Return tracks only
             result = [item for item in result if isinstance(item, Track)]
@@ -615,22 +908,43 @@ class Session(object):
         if ret == 'json':
             return json_obj
         if 'items' in json_obj:
-            items = json_obj.get('items')
-            result = []
-            offset = 0
-            if params and 'offset' in params:
-                offset = params.get('offset')
-            itemPosition = offset
-            if self._cursor:
-                itemPosition = itemPosition + self._cursor_pos
-            else:
-                self._cursor_pos = 0
-            try:
-                self._cursor = json_obj.get('cursor', '')
-                numberOfItems = int('0%s' % json_obj.get('totalNumberOfItems')) if 'totalNumberOfItems' in json_obj else 9999
-            except:
-                numberOfItems = 9999
-            log.info('NumberOfItems=%s, %s items in list' % (numberOfItems, len(items)))
+            result = self._map_items(json_obj, url=url, params=params, ret=ret)
+        else:
+            if 'data' in json_obj and URL_API_V2 in url:
+                parent = json_obj.get('parent', {})
+                json_obj = json_obj['data']
+                if not 'parent' in json_obj:
+                    json_obj['parent'] = parent if isinstance(parent, dict) else {}
+                retType = json_obj.get('itemType', ret).lower()
+            result = self._parse_one_item(json_obj, ret)
+            if isinstance(result, TrackUrl) and ret == 'track_url':
+                result._requested_quality = params.get('audioquality', Quality.hi_res)
+            if isinstance(result, Playlist) and result.isUserPlaylist:
+                # Get ETag of Playlist which must be used to add/remove entries of playlists
+                try: 
+                    result._etag = r.headers._store['etag'][1]
+                except:
+                    result._etag = None
+                    if URL_API_V1 in url:
+                        # ETag is only for API V1
+                        log.error('No ETag in response header for playlist "%s" (%s)' % (json_obj.get('title'), json_obj.get('id')))
+        return result
+
+    def _map_items(self, json_obj, url=URL_API_V1, params=None, ret=None, position=0):
+        """ Parses the 'items' list of a response. position is the number of items of previous cursor pages """
+        items = json_obj.get('items', [])
+        result = []
+        offset = 0
+        if params and 'offset' in params:
+            offset = params.get('offset')
+        itemPosition = offset + position
+        try:
+            numberOfItems = int('0%s' % json_obj.get('totalNumberOfItems')) if 'totalNumberOfItems' in json_obj else 9999
+        except:
+            numberOfItems = 9999
+        log.info('NumberOfItems=%s, %s items in list' % (numberOfItems, len(items)))
+        interning = self._start_interning()
+        try:
             for item in items:
                 retType = ret
                 if 'type' in item and ret.startswith('playlistitem'):
@@ -663,39 +977,110 @@ class Session(object):
                     nextItem._totalNumberOfItems = numberOfItems
                 result.append(nextItem)
                 itemPosition = itemPosition + 1
-                self._cursor_pos = self._cursor_pos + 1
-        else:
-            if 'data' in json_obj and URL_API_V2 in url:
-                parent = json_obj.get('parent', {})
-                json_obj = json_obj['data']
-                if not 'parent' in json_obj:
-                    json_obj['parent'] = parent if isinstance(parent, dict) else {}
-                retType = json_obj.get('itemType', ret).lower()
-            result = self._parse_one_item(json_obj, ret)
-            if isinstance(result, TrackUrl) and ret == 'track_url':
-                result._requested_quality = params.get('audioquality', Quality.hi_res)
-            if isinstance(result, Playlist) and result.isUserPlaylist:
-                # Get ETag of Playlist which must be used to add/remove entries of playlists
-                try: 
-                    result._etag = r.headers._store['etag'][1]
-                except:
-                    result._etag = None
-                    if URL_API_V1 in url:
-                        # ETag is only for API V1
-                        log.error('No ETag in response header for playlist "%s" (%s)' % (json_obj.get('title'), json_obj.get('id')))
+        finally:
+            if interning:
+                self._stop_interning(len(result))
         return result
 
+    def _start_interning(self):
+        ''' Starts the intern table for the items of a response. Returns False if it is already running '''
+        if getattr(INTERNED_ITEMS, 'items', None) is not None:
+            return False
+        INTERNED_ITEMS.items = {}
+        INTERNED_ITEMS.decorated = set()
+        INTERNED_ITEMS.counts = {'artist': [0, 0], 'album': [0, 0]}
+        return True
+
+    def _stop_interning(self, numberOfItems):
+        counts = INTERNED_ITEMS.counts
+        INTERNED_ITEMS.items = None
+        INTERNED_ITEMS.decorated = None
+        log.debug('Parsed %s items with %s artists (%s shared) and %s albums (%s shared)' % \
+                  (numberOfItems, counts['artist'][0], counts['artist'][1], counts['album'][0], counts['album'][1]))
+
+    def _parse_shared(self, item_type, json_obj, artist=None):
+        ''' Parses an artist or album which is nested in other items.
+            Within a response every (type, id) is parsed and decorated only once and then shared.
+        '''
+        parse = getattr(self, '_parse_%s' % item_type)
+        args = {'artist': artist} if artist else {}
+        items = getattr(INTERNED_ITEMS, 'items', None)
+        if items is None or not json_obj.get('id', None):
+            return parse(json_obj, **args)
+        # The given artist replaces the album artist
+        key = (item_type, json_obj['id'], artist.id if artist else None)
+        item = items.get(key, None)
+        if item is None:
+            item = parse(json_obj, **args)
+            items[key] = item
+            INTERNED_ITEMS.counts[item_type][0] += 1
+        else:
+            INTERNED_ITEMS.counts[item_type][1] += 1
+        return item
+
+    def _update_shared(self, item, **kwargs):
+        ''' Sets attributes of a nested item for its parent item.
+            A shared item which has other values for another parent is copied.
+        '''
+        decorated = getattr(INTERNED_ITEMS, 'decorated', None)
+        if decorated is not None:
+            if id(item) in decorated:
+                if all(getattr(item, name, None) == value for name, value in kwargs.items()):
+                    return item
+                item = copy.copy(item)
+            else:
+                decorated.add(id(item))
+        for name, value in kwargs.items():
+            setattr(item, name, value)
+        return item
+
+    def _fetch_pages(self, path, pages, url=URL_API_V1, params=None, ret=None):
+        """ Reads the pages of a list with a bounded number of concurrent requests.
+            pages is a list of (offset, limit) tuples.
+            Returns a list of (offset, items) tuples in the order of the given pages.
+        """
+        results = {}
+        errors = []
+        queue = Queue()
+        for page in pages:
+            queue.put(page)
+
+        def worker(maxPages=len(pages)):
+            while not errors and maxPages > 0:
+                try:
+                    offset, limit = queue.get_nowait()
+                except Empty:
+                    return
+                page_params = dict(params) if params else {}
+                page_params.update({'offset': offset, 'limit': limit})
+                try:
+                    results[offset] = self._map_request(path, url=url, params=page_params, ret=ret)
+                except Exception as e:
+                    errors.append(e)
+                maxPages -= 1
+
+        # The first page is read without threads to refresh the access token and to load the caches only once
+        worker(maxPages=1)
+        threadCount = min(len(pages) - 1, max(1, getattr(self._config, 'page_fetch_threads', 1)))
+        if threadCount > 1 and not errors:
+            log.info('Reading %s pages of %s with %s threads' % (len(pages), path, threadCount))
+            threads = [threading.Thread(target=worker, name='PageFetcher.%s' % i) for i in range(threadCount)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            worker()
+        if errors:
+            raise errors[0]
+        return [(offset, results.get(offset, [])) for offset, limit in pages]
+
+    def _iter_request_v2(self, path, url=URL_API_V2, params=None, data=None, headers=None, authenticate=True, ret=None):
+        """ Generator for all items of a cursor based list """
+        return CursorIterator(self, path, url=url, params=params, data=data, headers=headers, authenticate=authenticate, ret=ret)
+
     def _map_request_v2(self, path, url=URL_API_V2, params=None, data=None, headers=None, authenticate=True, ret=None):
-        self._cursor = ''
-        self._cursor_pos = 0
-        firstRun = True
-        items = []
-        while self._cursor or firstRun:
-            firstRun = False
-            items = items + self._map_request(path=path, url=url, params=params, data=data, headers=headers, authenticate=authenticate, ret=ret)
-            params['cursor'] = self._cursor
-        self._cursor = ''
-        self._cursor_pos = 0
+        items = list(self._iter_request_v2(path, url=url, params=params, data=data, headers=headers, authenticate=authenticate, ret=ret))
         # Build item numbers because all line are loaded everytime
         offset = 0
         for item in items:
@@ -710,7 +1095,7 @@ class Session(object):
             self._streamingSessionId = uuid.uuid4()
         return self._streamingSessionId
 
-    def get_track_url(self, track_id, quality=None):
+    def _track_url_request(self, track_id, quality=None):
         params = {}
         if not self.is_logged_in:
             url = 'tracks/%s/previewurl' % track_id
@@ -723,7 +1108,26 @@ class Session(object):
                        'locale': self._config.locale,
                        'countryCode': self._config.user_country_code,
                        'streamingsessionid':  self.get_streaming_session_id(forceNew=True) }
-        return self._map_request(url,  params=params, ret='track_url')
+        return (url, params)
+
+    def get_track_url(self, track_id, quality=None):
+        url, params = self._track_url_request(track_id, quality)
+        cache = self.track_url_cache if params else None
+        if not cache:
+            return self._map_request(url,  params=params, ret='track_url')
+        key = cache.key(track_id, params['audioquality'], self._config.client_id, self._config.user_id)
+        json_obj = cache.get(key)
+        if not json_obj:
+            json_obj = self._map_request(url,  params=params, ret='json')
+            if not json_obj:
+                return None
+            cache.put(key, json_obj)
+        return self.parse_track_url(json_obj, params['audioquality'])
+
+    def parse_track_url(self, json_obj, quality=None):
+        result = self._parse_one_item(json_obj, 'track_url')
+        result._requested_quality = quality if quality else self._config.quality
+        return result
 
     def get_broadcast_url(self, broadcast_id, quality=None):
         url = 'broadcasts/%s/playbackinfo' % broadcast_id
@@ -769,56 +1173,17 @@ class Session(object):
 #------------------------------------------------------------------------------
 
     def _parse_one_item(self, json_obj, ret=None):
-        parse = None
         ret = ret.lower()
-        if ret.startswith('artist'):
-            parse = self._parse_artist
-        elif ret.startswith('album'):
-            parse = self._parse_album
-        elif ret.startswith('track_url'):
-            parse = self._parse_track_url
-        elif ret.startswith('track'):
-            parse = self._parse_track
-        elif ret.startswith('video_url'):
-            parse = self._parse_video_url
-        elif ret.startswith('video'):
-            parse = self._parse_video
-        elif ret.startswith('playlist'):
-            parse = self._parse_playlist
-        elif ret.startswith('folder'):
-            parse = self._parse_folder
-        elif ret.startswith('category'):
-            parse = self._parse_category
-        elif ret.startswith('search'):
-            parse = self._parse_search
-        elif ret.startswith('mix'):
-            parse = self._parse_mix
-        elif ret.startswith('broadcast_url'):
-            parse = self._parse_broadcast_url
-        elif ret.startswith('broadcast'):
-            parse = self._parse_broadcast
-        elif ret.startswith('lyrics'):
-            parse = self._parse_lyrics
-        elif ret.startswith('userprofile'):
-            parse = self._parse_userprofile
-        elif ret.startswith('userprompt'):
-            parse = self._parse_userprompt
-        elif ret.startswith('user_session'):
-            parse = self._parse_user_session
-        elif ret.startswith('user'):
-            parse = self._parse_user
-        elif ret.startswith('refresh_token'):
-            parse = self._parse_refresh_token
-        elif ret.startswith('subscription'):
-            parse = self._parse_subscription
-        elif ret.startswith('device_code'):
-            parse = self._parse_device_code
-        elif ret.startswith('auth_token'):
-            parse = self._parse_auth_token
-        else:
-            raise NotImplementedError()
-        oneItem = parse(json_obj)
-        return oneItem
+        parse = ITEM_PARSER_CACHE.get(ret, None)
+        if not parse:
+            # The first parser with a matching prefix, e.g. 'track_url' before 'track'
+            for prefix, parse in ITEM_PARSERS:
+                if ret.startswith(prefix):
+                    break
+            else:
+                raise NotImplementedError()
+            ITEM_PARSER_CACHE[ret] = parse
+        return getattr(self, parse)(json_obj)
 
     def _parse_user(self, json_obj):
         return UserInfo(**json_obj)
@@ -830,7 +1195,7 @@ class Session(object):
         return Subscription(**json_obj)
 
     def _parse_artist(self, json_obj):
-        artist = Artist(**json_obj)
+        artist = self.item_classes['artist'](**json_obj)
         if self.is_logged_in and self.user.favorites:
             artist._isFavorite = self.user.favorites.isFavoriteArtist(artist.id)
         return artist
@@ -839,20 +1204,20 @@ class Session(object):
         allArtists = []
         ftArtists = []
         for item in json_obj:
-            nextArtist = self._parse_artist(item)
+            nextArtist = self._parse_shared('artist', item)
             allArtists.append(nextArtist)
             if nextArtist.id != artist_id:
                 ftArtists.append(nextArtist)
         return (allArtists, ftArtists)
 
     def _parse_album(self, json_obj, artist=None):
-        album = Album(**json_obj)
+        album = self.item_classes['album'](**json_obj)
         if artist:
             album.artist = artist
         elif 'artist' in json_obj:
-            album.artist = self._parse_artist(json_obj['artist'])
+            album.artist = self._parse_shared('artist', json_obj['artist'])
         elif 'artists' in json_obj:
-            album.artist = self._parse_artist(json_obj['artists'][0])
+            album.artist = self._parse_shared('artist', json_obj['artists'][0])
         if 'artists' in json_obj:
             album.artists, album._ftArtists = self._parse_all_artists(album.artist.id, json_obj['artists'])
         else:
@@ -863,10 +1228,10 @@ class Session(object):
         return album
 
     def _parse_folder(self, json_obj):
-        return Folder(**json_obj)
+        return self.item_classes['folder'](**json_obj)
 
     def _parse_playlist(self, json_obj):
-        playlist = Playlist(**json_obj)
+        playlist = self.item_classes['playlist'](**json_obj)
         if self.is_logged_in and playlist.isUserPlaylist and '%s' % playlist.creatorId != '%s' % self._config.user_id:
             playlist.type = 'OTHER_USER' # This is a User Playlist from a different user
         if self.is_logged_in and self.user.favorites:
@@ -874,7 +1239,7 @@ class Session(object):
         return playlist
 
     def _parse_promotion(self, json_obj):
-        item = Promotion(**json_obj)
+        item = self.item_classes['promotion'](**json_obj)
         if self.is_logged_in and self.user.favorites:
             if item.type == 'ALBUM':
                 item._isFavorite = self.user.favorites.isFavoriteAlbum(item.id)
@@ -885,33 +1250,33 @@ class Session(object):
         return item
 
     def _parse_track_url(self, json_obj):
-        return TrackUrl(**json_obj)
+        return self.item_classes['track_url'](**json_obj)
 
     def _parse_track(self, json_obj):
-        track = Track(**json_obj)
+        track = self.item_classes['track'](**json_obj)
         if 'artist' in json_obj:
-            track.artist = self._parse_artist(json_obj['artist'])
+            track.artist = self._parse_shared('artist', json_obj['artist'])
         elif 'artists' in json_obj:
-            track.artist = self._parse_artist(json_obj['artists'][0])
+            track.artist = self._parse_shared('artist', json_obj['artists'][0])
         if 'artists' in json_obj:
             track.artists, track._ftArtists = self._parse_all_artists(track.artist.id, json_obj['artists'])
         else:
             track.artists = [track.artist]
             track._ftArtists = []
-        track.album = self._parse_album(json_obj['album'], artist=track.artist)
+        track.album = self._parse_shared('album', json_obj['album'], artist=track.artist)
         if self.is_logged_in and self.user.favorites:
             track._isFavorite = self.user.favorites.isFavoriteTrack(track.id)
         return track
 
     def _parse_video_url(self, json_obj):
-        return VideoUrl(**json_obj)
+        return self.item_classes['video_url'](**json_obj)
 
     def _parse_video(self, json_obj):
-        video = Video(**json_obj)
+        video = self.item_classes['video'](**json_obj)
         if 'artist' in json_obj:
-            video.artist = self._parse_artist(json_obj['artist'])
+            video.artist = self._parse_shared('artist', json_obj['artist'])
         elif 'artists' in json_obj:
-            video.artist = self._parse_artist(json_obj['artists'][0])
+            video.artist = self._parse_shared('artist', json_obj['artists'][0])
         if 'artists' in json_obj:
             video.artists, video._ftArtists = self._parse_all_artists(video.artist.id, json_obj['artists'])
             if not 'artist' in json_obj and len(video.artists) > 0:
@@ -920,13 +1285,13 @@ class Session(object):
             video.artists = [video.artist]
             video._ftArtists = []
         if 'album' in json_obj and json_obj['album']:
-            video.album = self._parse_album(json_obj['album'], artist=video.artist)
+            video.album = self._parse_shared('album', json_obj['album'], artist=video.artist)
         if self.is_logged_in and self.user.favorites:
             video._isFavorite = self.user.favorites.isFavoriteVideo(video.id)
         return video
 
     def _parse_category(self, json_obj):
-        return Category(**json_obj)
+        return self.item_classes['category'](**json_obj)
 
     def _parse_search(self, json_obj):
         result = SearchResult()
@@ -959,16 +1324,16 @@ class Session(object):
         return result
 
     def _parse_mix(self, json_obj):
-        item = Mix(**json_obj)
+        item = self.item_classes['mix'](**json_obj)
         if self.is_logged_in and self.user.favorites:
             item._isFavorite = self.user.favorites.isFavoriteMix(item.id)
         return item
 
     def _parse_broadcast_url(self, json_obj):
-        return BroadcastUrl(**json_obj)
+        return self.item_classes['broadcast_url'](**json_obj)
 
     def _parse_broadcast(self, json_obj):
-        item = Broadcast(**json_obj)
+        item = self.item_classes['broadcast'](**json_obj)
         item.track = self._parse_track(json_obj['track'])
         item.profile = self._parse_userprofile(json_obj['profile'])
         item.album = item.track.album
@@ -986,7 +1351,7 @@ class Session(object):
         return AuthToken(**json_obj)
 
     def _parse_userprofile(self, json_obj):
-        item = UserProfile(**json_obj)
+        item = self.item_classes['userprofile'](**json_obj)
         item._own_id = self._config.user_id
         # Convert prompts values to UserPrompt objects
         prompts = item.prompts
@@ -998,7 +1363,7 @@ class Session(object):
         return item
 
     def _parse_userprompt(self, json_obj):
-        item = UserPrompt(**json_obj)
+        item = self.item_classes['userprompt'](**json_obj)
         if item.data:
             if item.supportedContentType == 'TRACK':
                 item.data = self._parse_track(item.data)
@@ -1032,7 +1397,11 @@ class Favorites(object):
     def reset(self):
         self.ids_loaded = False
         self.ids_modified = False
-        self.ids = {'artists': [], 'albums': [], 'playlists': [], 'tracks': [], 'videos': [], 'mixes': []}
+        # Sets of ID strings for fast membership checks
+        self.ids = {'artists': set(), 'albums': set(), 'playlists': set(), 'tracks': set(), 'videos': set(), 'mixes': set()}
+
+    def set_ids(self, content_type, item_ids):
+        self.ids[content_type] = set(['%s' % _id for _id in item_ids]) if item_ids else set()
 
     def add_buffered_ids(self, content_type, item_ids):
         ids = item_ids if isinstance(item_ids, list) else [item_ids]
@@ -1040,7 +1409,7 @@ class Favorites(object):
             _id = _id.id if isinstance(_id, BrowsableMedia) else _id
             try:
                 if not '%s' % _id in self.ids[content_type]:
-                    self.ids[content_type].append('%s' % _id)
+                    self.ids[content_type].add('%s' % _id)
                     self.ids_modified = True
             except:
                 pass
@@ -1052,7 +1421,7 @@ class Favorites(object):
             _id = _id.id if isinstance(_id, BrowsableMedia) else _id
             try:
                 if '%s' % _id in self.ids[content_type]:
-                    self.ids[content_type].remove('%s' % _id)
+                    self.ids[content_type].discard('%s' % _id)
                     self.ids_modified = True
             except:
                 pass
@@ -1066,19 +1435,19 @@ class Favorites(object):
             if r.ok:
                 json_obj = r.json()
                 if 'ARTIST' in json_obj:
-                    self.ids['artists'] = json_obj.get('ARTIST')
+                    self.set_ids('artists', json_obj.get('ARTIST'))
                 if 'ALBUM' in json_obj:
-                    self.ids['albums'] = json_obj.get('ALBUM')
+                    self.set_ids('albums', json_obj.get('ALBUM'))
                 if 'PLAYLIST' in json_obj:
-                    self.ids['playlists'] = json_obj.get('PLAYLIST')
+                    self.set_ids('playlists', json_obj.get('PLAYLIST'))
                 if 'TRACK' in json_obj:
-                    self.ids['tracks'] = json_obj.get('TRACK')
+                    self.set_ids('tracks', json_obj.get('TRACK'))
                 if 'VIDEO' in json_obj:
-                    self.ids['videos'] = json_obj.get('VIDEO')
+                    self.set_ids('videos', json_obj.get('VIDEO'))
                 try:
                     mix_ids = self._session._map_request(path='favorites/mixes/ids', url=URL_API_V2, params={'limit': 500}, ret='json')
                     if mix_ids:
-                        self.ids['mixes'] = mix_ids.get('content')
+                        self.set_ids('mixes', mix_ids.get('content'))
                 except:
                     pass
                 self.ids_loaded = True
@@ -1166,42 +1535,42 @@ class Favorites(object):
 
     def isFavoriteArtist(self, artist_id):
         self.load_all()
-        return '%s' % artist_id in self.ids.get('artists', [])
+        return '%s' % artist_id in self.ids.get('artists', ())
 
     def albums(self):
         return self.get('albums')
 
     def isFavoriteAlbum(self, album_id):
         self.load_all()
-        return '%s' % album_id in self.ids.get('albums', [])
+        return '%s' % album_id in self.ids.get('albums', ())
 
     def playlists(self):
         return self.get('playlists')
 
     def isFavoritePlaylist(self, playlist_id):
         self.load_all()
-        return '%s' % playlist_id in self.ids.get('playlists', [])
+        return '%s' % playlist_id in self.ids.get('playlists', ())
 
     def tracks(self):
         return self.get('tracks')
 
     def isFavoriteTrack(self, track_id):
         self.load_all()
-        return '%s' % track_id in self.ids.get('tracks', [])
+        return '%s' % track_id in self.ids.get('tracks', ())
 
     def videos(self):
         return self.get('videos', limit=100)
 
     def isFavoriteVideo(self, video_id):
         self.load_all()
-        return '%s' % video_id in self.ids.get('videos', [])
+        return '%s' % video_id in self.ids.get('videos', ())
 
     def mixes(self):
         return self.get('mixes')
 
     def isFavoriteMix(self, mix_id):
         self.load_all()
-        return '%s' % mix_id in self.ids.get('mixes', [])
+        return '%s' % mix_id in self.ids.get('mixes', ())
 
 #------------------------------------------------------------------------------
 # Class to work with users playlists
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import re
+import io
+import json
+import time
+import base64
+import hashlib
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from ..debug import log
+
+# Time to live in seconds of cached responses for catalog endpoints.
+# A TTL of 0 means that the response is always revalidated with its ETag.
+RESPONSE_CACHE_TTL = [
+    (re.compile(r'^albums/\d+(/tracks|/items)?$'), 86400),
+    (re.compile(r'^artists/\d+(/albums|/toptracks|/videos|/bio|/similar|/playlistscreatedby)?$'), 21600),
+    (re.compile(r'^tracks/\d+$'), 86400),
+    (re.compile(r'^videos/\d+$'), 86400),
+    (re.compile(r'^(genres|moods)(/[^/]+/(playlists|albums|tracks|videos))?$'), 86400),
+    (re.compile(r'^pages/'), 3600),
+    (re.compile(r'^playlists/[0-9a-f-]+(/items|/tracks)?$'), 0),
+]
+
+# Parameters which are not part of the cache key
+IGNORED_PARAMS = ['token']
+
+# Expiry timestamps in signed stream URLs. The URLs in DASH manifests are XML escaped.
+RE_URL_EXPIRY = [
+    re.compile(r'(?:[?&]|&amp;)(?:Expires|expires|exp)=(\d{10})\b'),
+    re.compile(r'(?:[?&]|&amp;)token=(\d{10})~'),
+]
+
+# Lifetime of a track URL without an expiry timestamp
+DEFAULT_TRACK_URL_TTL = 600
+
+
+def build_response(status_code, headers, content, method, url, params=None):
+    ''' Creates a requests.Response object from data which was not read from the network '''
+    r = requests.Response()
+    r.status_code = status_code
+    r.headers = CaseInsensitiveDict(headers)
+    r.url = url
+    r.encoding = 'utf-8'
+    r._content = content
+    r.request = requests.Request(method, url, params=params).prepare()
+    return r
+
+
+def track_url_expiry(json_obj, default_ttl=DEFAULT_TRACK_URL_TTL):
+    ''' Returns the earliest expiry time of the stream URLs in a playback info '''
+    text = json.dumps(json_obj)
+    try:
+        text = text + base64.b64decode(json_obj.get('manifest', '')).decode('utf-8')
+    except:
+        pass
+    expiry = [int(t) for pattern in RE_URL_EXPIRY for t in pattern.findall(text)]
+    return min(expiry) if expiry else time.time() + default_ttl
+
+
+class ResponseCache(object):
+    ''' Persistent cache for GET responses of catalog endpoints.
+        Every response is stored in its own file. The modification time of the file is used
+        for the LRU eviction when the number of cached responses exceeds max_entries.
+        The number of entries is counted once at the first write and then kept in memory,
+        so the folder is only listed again when the cache is full.
+    '''
+
+    name = 'response cache'
+
+    def __init__(self, cache_dir, max_entries=1000):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.entry_count = None
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            self.enabled = max_entries > 0
+        except Exception as e:
+            log.logException(e, 'Failed to create response cache folder %s' % self.cache_dir)
+            self.enabled = False
+
+    def ttl(self, path):
+        ''' Returns the TTL of the endpoint or None if the endpoint is not cacheable '''
+        if not self.enabled or not path:
+            return None
+        path = path.lstrip('/')
+        for pattern, ttl in RESPONSE_CACHE_TTL:
+            if pattern.match(path):
+                return ttl
+        return None
+
+    def key(self, method, url, params, country_code='', locale='', user_id=''):
+        params = sorted(['%s=%s' % (k, v) for k, v in params.items() if k not in IGNORED_PARAMS]) if params else []
+        key = '|'.join([method.upper(), url, '&'.join(params), '%s' % country_code, '%s' % locale, '%s' % user_id])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _filename(self, key):
+        return os.path.join(self.cache_dir, '%s.json' % key)
+
+    def get(self, key):
+        ''' Returns the cached entry or None '''
+        filename = self._filename(key)
+        try:
+            if not os.path.isfile(filename):
+                return None
+            with io.open(filename, 'r', encoding='utf-8') as fd:
+                entry = json.load(fd)
+            # Touch the file for the LRU eviction
+            os.utime(filename, None)
+            return entry
+        except:
+            return None
+
+    def is_fresh(self, entry):
+        return entry.get('expires', 0) > time.time()
+
+    def etag(self, entry):
+        return CaseInsensitiveDict(entry.get('headers', {})).get('etag', None)
+
+    def put(self, key, r, ttl):
+        ''' Stores a successful response '''
+        try:
+            entry = { 'url': r.url,
+                      'status': r.status_code,
+                      'expires': time.time() + ttl,
+                      'headers': dict([(k, v) for k, v in r.headers.items() if k.lower() in ['content-type', 'etag']]),
+                      'content': r.content.decode('utf-8') }
+            self._write(key, entry, new_entry=True)
+        except Exception as e:
+            log.logException(e, 'Failed to cache response of %s' % r.url)
+
+    def refresh(self, key, entry, ttl):
+        ''' Extends the lifetime of an entry after a 304 Not Modified response '''
+        try:
+            entry['expires'] = time.time() + ttl
+            self._write(key, entry)
+        except:
+            pass
+
+    def _write(self, key, entry, new_entry=False):
+        # Write into a temp file and rename it to avoid half written files if two processes write the same entry
+        filename = self._filename(key)
+        new_entry = new_entry and not os.path.exists(filename)
+        tmpname = '%s.%s.tmp' % (filename, os.getpid())
+        with io.open(tmpname, 'w', encoding='utf-8') as fd:
+            fd.write('%s' % json.dumps(entry))
+        try:
+            os.replace(tmpname, filename)
+        except AttributeError:
+            # Python 2
+            if os.path.exists(filename):
+                os.remove(filename)
+            os.rename(tmpname, filename)
+        if new_entry:
+            self._count_entry()
+
+    def response(self, entry, method, url, params=None):
+        ''' Builds a requests.Response object from a cached entry '''
+        return build_response(entry.get('status', 200), entry.get('headers', {}), entry.get('content', '').encode('utf-8'),
+                              method, entry.get('url', url), params=params)
+
+    def _count_entry(self):
+        if self.entry_count is None:
+            self.entry_count = len([f for f in os.listdir(self.cache_dir) if f.endswith('.json')])
+        self.entry_count += 1
+        if self.entry_count > self.max_entries:
+            # Other processes may have added or removed entries in the meantime
+            self.evict()
+
+    def evict(self):
+        ''' Removes the least recently used entries if the cache is full '''
+        try:
+            files = [f for f in os.listdir(self.cache_dir) if f.endswith('.json')]
+            self.entry_count = len(files)
+            if len(files) <= self.max_entries:
+                return
+            files = sorted(files, key=lambda f: os.path.getmtime(os.path.join(self.cache_dir, f)))
+            # Remove 10% more than necessary to avoid an eviction run for each new response
+            remove_count = len(files) - int(self.max_entries * 0.9)
+            for f in files[:remove_count]:
+                try:
+                    os.remove(os.path.join(self.cache_dir, f))
+                    self.entry_count -= 1
+                except:
+                    pass
+            log.info('Removed %s entries from the %s' % (remove_count, self.name))
+        except:
+            pass
+
+    def clear(self):
+        try:
+            for f in os.listdir(self.cache_dir):
+                if f.endswith('.json') or f.endswith('.tmp'):
+                    os.remove(os.path.join(self.cache_dir, f))
+            self.entry_count = 0
+        except:
+            pass
+
+    def statistics(self):
+        return 'Response Cache: %d hits, %d revalidated, %d misses' % (self.hits, self.revalidated, self.misses)
+
+
+class TrackUrlCache(ResponseCache):
+    ''' Persistent cache for the playback infos of tracks with the expiry time of their stream URLs.
+        The plugin and the service use the same folder, so a track URL which was resolved by one
+        of them is used by the other one. Entries which expire within min_validity seconds are
+        not returned, so they are resolved again before the stream URLs become invalid.
+    '''
+
+    name = 'track URL cache'
+
+    def __init__(self, cache_dir, max_entries=10, min_validity=300):
+        ResponseCache.__init__(self, cache_dir, max_entries=max_entries)
+        self.min_validity = min_validity
+        self.expired = 0
+
+    def key(self, track_id, quality, client_id='', user_id=''):
+        key = '|'.join(['%s' % track_id, '%s' % quality, '%s' % client_id, '%s' % user_id])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        ''' Returns the cached playback info or None '''
+        if not self.enabled:
+            return None
+        entry = ResponseCache.get(self, key)
+        if not entry:
+            self.misses += 1
+            return None
+        if entry.get('expires', 0) < time.time() + self.min_validity:
+            self.expired += 1
+            return None
+        self.hits += 1
+        return entry.get('json', None)
+
+    def put(self, key, json_obj):
+        if not self.enabled:
+            return
+        try:
+            self._write(key, {'expires': track_url_expiry(json_obj), 'json': json_obj}, new_entry=True)
+        except Exception as e:
+            log.logException(e, 'Failed to cache track URL')
+
+    def statistics(self):
+        return 'Track URL Cache: %d hits, %d expired, %d misses' % (self.hits, self.expired, self.misses)
+
+
+# End of File
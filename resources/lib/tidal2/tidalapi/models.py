@@ -21,10 +21,15 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 import sys
 import locale
 import re
+import math
 import datetime
 import json
 import base64
+import hashlib
+import threading
 import pyaes
+from collections import OrderedDict
+from xml.sax.saxutils import unescape as xml_unescape
 
 PY2 = sys.version_info[0] == 2
 
@@ -55,6 +60,10 @@ RE_ISO8601 = re.compile(r'^(?P<full>((?P<year>\d{4})([/-]?(?P<month>(0[1-9])|(1[
 
 RE_ISO8601_PERIOD = re.compile(r'^(?P<sign>[+-])?P(?!\b)(?P<years>[0-9]+([,.][0-9]+)?Y)?(?P<months>[0-9]+([,.][0-9]+)?M)?(?P<weeks>[0-9]+([,.][0-9]+)?W)?(?P<days>[0-9]+([,.][0-9]+)?D)?((?P<separator>T)(?P<hours>[0-9]+([,.][0-9]+)?H)?(?P<minutes>[0-9]+([,.][0-9]+)?M)?(?P<seconds>[0-9]+([,.][0-9]+)?S)?)?$')
 
+RE_XML_TAG = re.compile(r'<([A-Za-z][\w:]*)([^>]*)>')
+
+RE_XML_ATTRIBUTE = re.compile(r'([\w:]+)\s*=\s*"([^"]*)"')
+
 
 class Quality(object):
     hi_res_lossless = 'HI_RES_LOSSLESS'
@@ -87,6 +96,37 @@ class MediaMetadataTags(object):
     sony_360 = 'SONY_360RA'
     dolby_atmos = 'DOLBY_ATMOS'
 
+class MediaFlags(object):
+    ''' Bitmask of the audio capabilities of albums and tracks '''
+    mqa = 1
+    hires_lossless = 2
+    dolby_atmos = 4
+    sony_360 = 8
+
+    @staticmethod
+    def parse(mediaMetadata, audioModes, audioQuality):
+        flags = 0
+        try:
+            if AudioMode.dolby_atmos in audioModes:
+                flags |= MediaFlags.dolby_atmos
+            if AudioMode.sony_360 in audioModes:
+                flags |= MediaFlags.sony_360
+        except:
+            pass
+        try:
+            tags = mediaMetadata['tags']
+        except:
+            tags = None
+        if tags:
+            if MediaMetadataTags.hires_lossless in tags:
+                flags |= MediaFlags.hires_lossless
+            if MediaMetadataTags.mqa in tags and not flags & (MediaFlags.dolby_atmos | MediaFlags.sony_360):
+                flags |= MediaFlags.mqa
+        elif audioQuality == Quality.hi_res:
+            # Fallback to old method
+            flags |= MediaFlags.mqa
+        return flags
+
 class Codec(object):
     MP3 = 'MP3'
     AAC = 'AAC'
@@ -134,6 +174,11 @@ class Config(object):
         self.user_country_code = 'WW'
         self.locale = 'en_US'
         self.debug_json = False
+        self.http_pool_size = 10
+        self.page_fetch_threads = 4
+        self.response_cache_dir = ''
+        self.response_cache_size = 0
+        self.service_backend = False
         self.client_name = ''
         self.client_id = ''
         self.client_secret = ''
@@ -220,10 +265,23 @@ class Iso8601(object):
 class Model(object):
     id = None
     name = 'Unknown'
+    _trn_type = None  # Item type for the default TRN
 
     def parse_date(self, datestring, default=None):
         return Iso8601.parse_date(datestring, default)
 
+    @property
+    def trn(self):
+        # Built on access, so that large lists don't keep a TRN string for every item
+        trn = self.__dict__.get('trn', None)
+        if not trn and self._trn_type:
+            return 'trn:%s:%s' % (self._trn_type, self.id)
+        return trn
+
+    @trn.setter
+    def trn(self, value):
+        self.__dict__['trn'] = value
+
     def __eq__(self, other):
         return True if isinstance(other, Model) and self.id == other.id else False
 
@@ -269,18 +327,24 @@ class Album(BrowsableMedia):
     popularity = 0
     audioModes = [AudioMode.stereo]
     mediaMetadata = { 'tags': [] }
-    trn = None
+    _trn_type = 'album'
+    _mediaFlags = 0  # Set from mediaMetadata, audioModes and audioQuality
 
     def __init__(self, **kwargs):
         self.__dict__.update(kwargs)
         super(Album, self).__init__()
         self.releaseDate = self.parse_date(self.releaseDate)
         self.streamStartDate = self.parse_date(self.streamStartDate)
-        self.num_tracks = self.numberOfTracks # For Backward Compatibility
-        self.release_date = self.releaseDate  # For Backward Compatibility
+        self._mediaFlags = MediaFlags.parse(self.mediaMetadata, self.audioModes, self.audioQuality)
         self.name = self.title                # For Backward Compatibility
-        if not self.trn:
-            self.trn = 'trn:album:%s' % self.id
+
+    @property
+    def num_tracks(self):
+        return self.numberOfTracks  # For Backward Compatibility
+
+    @property
+    def release_date(self):
+        return self.releaseDate  # For Backward Compatibility
 
     @property
     def year(self):
@@ -306,36 +370,19 @@ class Album(BrowsableMedia):
 
     @property
     def isMqa(self):
-        try:
-            if self.mediaMetadata['tags']:
-                return True if MediaMetadataTags.mqa in self.mediaMetadata['tags'] and not self.isSony360RA and not self.isDolbyAtmos else False
-        except:
-            pass
-        # Fallback to old method
-        return True if self.audioQuality == Quality.hi_res else False
+        return True if self._mediaFlags & MediaFlags.mqa else False
 
     @property
     def isHiRes(self):
-        try:
-            if self.mediaMetadata['tags'] and MediaMetadataTags.hires_lossless in self.mediaMetadata['tags']:
-                return True
-        except:
-            pass
-        return False
+        return True if self._mediaFlags & MediaFlags.hires_lossless else False
 
     @property
     def isDolbyAtmos(self):
-        try:
-            return True if AudioMode.dolby_atmos in self.audioModes else False
-        except:
-            return False
+        return True if self._mediaFlags & MediaFlags.dolby_atmos else False
 
     @property
     def isSony360RA(self):
-        try:
-            return True if AudioMode.sony_360 in self.audioModes else False
-        except:
-            return False
+        return True if self._mediaFlags & MediaFlags.sony_360 else False
 
 
 class Artist(BrowsableMedia):
@@ -344,17 +391,13 @@ class Artist(BrowsableMedia):
     popularity = 0
     imFollowing = False
     mix_ids = {}
-    trn = None
+    _trn_type = 'artist'
 
     def __init__(self, **kwargs):
         self.__dict__.update(kwargs)
         super(Artist, self).__init__()
-        try:
+        if 'mixes' in kwargs:
             self.mix_ids = kwargs['mixes']
-        except:
-            self.mix_ids = {}
-        if not self.trn:
-            self.trn = 'trn:artist:%s' % self.id
 
     @property
     def image(self):
@@ -375,7 +418,7 @@ class Mix(BrowsableMedia):
     mixType = ''
     dateAdded = None
     updated = None
-    trn = None
+    _trn_type = 'mix'
     _image = None
     _fanart = None
 
@@ -396,8 +439,6 @@ class Mix(BrowsableMedia):
                 self._fanart = kwargs['images']['LARGE']['url']
         except:
             self._image = IMG_URL.format(picture=DEFAULT_PLAYLIST_IMG.replace('-', '/'), size='1080x720')
-        if not self.trn:
-            self.trn = 'trn:mix:%s' % self.id
 
     @property
     def image(self):
@@ -602,24 +643,28 @@ class Track(PlayableMedia):
     editable = False
     audioModes = [AudioMode.stereo]
     mix_ids = {}
-    trn = None
+    _trn_type = 'track'
 
     # Internal Properties
     _ftArtists = []  # All artists except main (Filled by parser)
     _lyrics = None
+    _mediaFlags = 0  # Set from mediaMetadata, audioModes and audioQuality
 
     def __init__(self, **kwargs):
         self.__dict__.update(kwargs)
         super(Track, self).__init__()
-        self.track_num = self.trackNumber # For Backward Compatibility
-        self.disc_num =self.volumeNumber  # For Backward Compatibility
         self.popularity = int("0%s" % self.popularity)
-        try:
+        self._mediaFlags = MediaFlags.parse(self.mediaMetadata, self.audioModes, self.audioQuality)
+        if 'mixes' in kwargs:
             self.mix_ids = kwargs['mixes']
-        except:
-            self.mix_ids = {}
-        if not self.trn:
-            self.trn = 'trn:track:%s' % self.id
+
+    @property
+    def track_num(self):
+        return self.trackNumber  # For Backward Compatibility
+
+    @property
+    def disc_num(self):
+        return self.volumeNumber  # For Backward Compatibility
 
     @property
     def year(self):
@@ -641,36 +686,19 @@ class Track(PlayableMedia):
 
     @property
     def isMqa(self):
-        try:
-            if self.mediaMetadata['tags']:
-                return True if MediaMetadataTags.mqa in self.mediaMetadata['tags'] and not self.isDolbyAtmos and not self.isSony360RA else False
-        except:
-            pass
-        # Fallback to old method
-        return True if self.audioQuality == Quality.hi_res else False
+        return True if self._mediaFlags & MediaFlags.mqa else False
 
     @property
     def isHiRes(self):
-        try:
-            if self.mediaMetadata['tags'] and MediaMetadataTags.hires_lossless in self.mediaMetadata['tags']:
-                return True
-        except:
-            pass
-        return False
+        return True if self._mediaFlags & MediaFlags.hires_lossless else False
 
     @property
     def isDolbyAtmos(self):
-        try:
-            return True if AudioMode.dolby_atmos in self.audioModes else False
-        except:
-            return False
+        return True if self._mediaFlags & MediaFlags.dolby_atmos else False
 
     @property
     def isSony360RA(self):
-        try:
-            return True if AudioMode.sony_360 in self.audioModes else False
-        except:
-            return False
+        return True if self._mediaFlags & MediaFlags.sony_360 else False
 
 
 class Broadcast(PlayableMedia):
@@ -693,7 +721,7 @@ class Video(PlayableMedia):
     popularity = 0
     quality = 'MP4_1080P'
     audioModes = [AudioMode.stereo] # For videos in albums
-    trn = None
+    _trn_type = 'video'
 
     # Internal Properties
     _ftArtists = []  # All artists except main (Filled by parser)
@@ -702,8 +730,6 @@ class Video(PlayableMedia):
         self.__dict__.update(kwargs)
         super(Video, self).__init__()
         self.releaseDate = self.parse_date(self.releaseDate)
-        if not self.trn:
-            self.trn = 'trn:video:%s' % self.id
 
     @property
     def year(self):
@@ -1225,12 +1251,18 @@ class Lyrics(Model):
 
 
 class DashInfo(object):
+    ''' Segment list of a DASH manifest with a SegmentTemplate and a SegmentTimeline '''
+
+    # Parsed manifests by SHA1 of the manifest data
+    _cache = OrderedDict()
+    _cache_size = 20
+    _cache_lock = threading.Lock()
 
     @staticmethod
     def fromTrackUrl(trackUrl):
         try:
             if trackUrl.isDASH and not trackUrl.isEncrypted:
-                return DashInfo(trackUrl.get_manifest_data())
+                return DashInfo.parse(trackUrl.get_manifest_data())
         except:
             pass
         return None
@@ -1238,42 +1270,92 @@ class DashInfo(object):
     @staticmethod
     def fromBase64(mpdBase64Encoded):
         try:
-            return DashInfo(base64.b64decode(mpdBase64Encoded).decode('utf-8'))
+            return DashInfo.parse(base64.b64decode(mpdBase64Encoded).decode('utf-8'))
         except:
             return None
 
+    @staticmethod
+    def parse(mpd_xml):
+        ''' Returns the cached DashInfo of a manifest or parses it '''
+        key = hashlib.sha1(mpd_xml.encode('utf-8')).hexdigest()
+        with DashInfo._cache_lock:
+            dash = DashInfo._cache.pop(key, None)
+            if dash:
+                DashInfo._cache[key] = dash
+                return dash
+        dash = DashInfo(mpd_xml)
+        with DashInfo._cache_lock:
+            DashInfo._cache[key] = dash
+            while len(DashInfo._cache) > DashInfo._cache_size:
+                DashInfo._cache.popitem(last=False)
+        return dash
+
     def __init__(self, mpd_xml):
         self.manifest = mpd_xml
-        self.duration = Iso8601.parse_duration(re.match(r'.* mediaPresentationDuration=\"(?P<m>[PTMS0-9\.]+?)\".*', mpd_xml ).groupdict()['m'])
-        self.contentType = re.match(r'.* contentType=\"(?P<m>.+?)\".*', mpd_xml ).groupdict()['m']
-        self.mimeType = re.match(r'.* mimeType=\"(?P<m>.+?)\".*', mpd_xml ).groupdict()['m']
-        self.codecs = re.match(r'.* codecs=\"(?P<m>.+?)\".*', mpd_xml ).groupdict()['m']
-        self.firstUrl = re.match(r'.* initialization=\"(?P<m>http.+?)\".*', mpd_xml ).groupdict()['m']
-        self.mediaUrl = re.match(r'.* media=\"(?P<m>http.+?)\".*', mpd_xml ).groupdict()['m'].replace('$Number$', '{number}')
-        self.startNumber = int(re.match(r'.* startNumber=\"(?P<m>\d+?)\".*', mpd_xml ).groupdict()['m'])
-        self.timescale = int(re.match(r'.* timescale=\"(?P<m>\d+?)\".*', mpd_xml ).groupdict()['m'])
-        self.audioSamplingRate = int(re.match(r'.* audioSamplingRate=\"(?P<m>\d+?)\".*', mpd_xml ).groupdict()['m'])
-        sizes = re.match(r'.* d=\"(?P<d1>\d+?)\".* r=\"(?P<r>\d+?)\".* d=\"(?P<d2>\d+?)\".*', mpd_xml).groupdict()
-        self.chunksize = int(sizes['d1'])
-        self.chunkcount = int(sizes['r']) + 1
-        self.lastchunksize = int(sizes['d2'])
+        self.duration = datetime.timedelta(0)
+        self.contentType = None
+        self.mimeType = None
+        self.codecs = None
+        self.audioSamplingRate = 0
+        self.firstUrl = None
+        self.mediaUrl = None
+        self.startNumber = 1
+        self.timescale = 1
+        timeline = []
+        # Single pass over all tags of the manifest
+        for tag, attributes in RE_XML_TAG.findall(mpd_xml):
+            attr = dict(RE_XML_ATTRIBUTE.findall(attributes))
+            if tag == 'S':
+                timeline.append((int(attr.get('t', -1)), int(attr['d']), int(attr.get('r', 0))))
+            elif tag == 'MPD':
+                self.duration = Iso8601.parse_duration(attr.get('mediaPresentationDuration', ''))
+            elif tag in ['AdaptationSet', 'Representation']:
+                self.contentType = attr.get('contentType', self.contentType)
+                self.mimeType = attr.get('mimeType', self.mimeType)
+                self.codecs = attr.get('codecs', self.codecs)
+                self.audioSamplingRate = int(attr.get('audioSamplingRate', self.audioSamplingRate))
+            elif tag == 'SegmentTemplate':
+                self.timescale = int(attr.get('timescale', self.timescale))
+                self.startNumber = int(attr.get('startNumber', self.startNumber))
+                self.firstUrl = xml_unescape(attr.get('initialization', ''))
+                self.mediaUrl = xml_unescape(attr.get('media', '')).replace('$Number$', '{number}')
+        if not self.firstUrl or not self.mediaUrl or not timeline:
+            raise ValueError('Manifest has no SegmentTemplate with a SegmentTimeline')
+        # Durations of all segments in timescale units
+        self.segmentDurations = []
+        end_time = self.duration.total_seconds() * self.timescale
+        start = 0
+        for t, d, r in timeline:
+            start = t if t >= 0 else start
+            if r < 0:
+                # Repeat until the end of the presentation
+                r = max(0, int(math.ceil((end_time - start) / d)) - 1)
+            self.segmentDurations.extend([d] * (r + 1))
+            start += d * (r + 1)
+        self.chunksize = self.segmentDurations[0]
+        self.chunkcount = len(self.segmentDurations) - 1
+        self.lastchunksize = self.segmentDurations[-1]
+        self._urls = None
+        self._m3u8 = None
 
     def urls(self):
-        items = [self.firstUrl]
-        idx = self.startNumber - 1
-        while idx <= self.chunkcount:
-            idx += 1 # Last chunk has number chunkcount+1
-            items.append(self.mediaUrl.format(number=idx))
-        return items
-
-    def m3u8(self):
-        hls = '#EXTM3U\n'
-        hls += '#EXT-X-TARGETDURATION:%s\n' % int(self.duration.seconds)
-        hls += '#EXT-X-VERSION:3\n'
-        chunk_duration = '#EXTINF:%0.3f,\n' % (float(self.chunksize) / float(self.timescale))
-        items = self.urls()
-        hls += '\n'.join(chunk_duration + item for item in items[0:-1])
-        chunk_duration = '#EXTINF:%0.3f,\n' % (float(self.lastchunksize) / float(self.timescale))
-        hls += '\n' + chunk_duration + items[-1] + '\n'
-        hls += '#EXT-X-ENDLIST\n'
-        return hls
+        if not self._urls:
+            prefix, suffix = self.mediaUrl.split('{number}', 1) if '{number}' in self.mediaUrl else (self.mediaUrl, '')
+            self._urls = [self.firstUrl] + ['%s%d%s' % (prefix, self.startNumber + i, suffix) for i in range(len(self.segmentDurations))]
+        return self._urls
+
+    def m3u8(self, urls=None):
+        ''' HLS playlist of the segments. Other URLs can be given for the segments, e.g. of a local proxy '''
+        if self._m3u8 and not urls:
+            return self._m3u8
+        hls = ['#EXTM3U', '#EXT-X-TARGETDURATION:%s' % int(self.duration.seconds), '#EXT-X-VERSION:3']
+        extinf = dict([(d, '#EXTINF:%0.3f,' % (float(d) / float(self.timescale))) for d in set(self.segmentDurations)])
+        # The initialization segment gets the duration of the first segment
+        for url, d in zip(urls if urls else self.urls(), [self.segmentDurations[0]] + self.segmentDurations):
+            hls.append(extinf[d])
+            hls.append(url)
+        hls.append('#EXT-X-ENDLIST\n')
+        if urls:
+            return '\n'.join(hls)
+        self._m3u8 = '\n'.join(hls)
+        return self._m3u8
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+''' Benchmark of the DASH manifest parser.
+    Parses a manifest of a normal track and of a very long track, builds the HLS playlist
+    and reads the manifest again from the parser cache like the service does for every segment.
+
+    Usage: python tests/bench_dashinfo.py
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import base64
+import timeit
+
+import kodi_stubs
+kodi_stubs.install()
+
+from tidal2.tidalapi.models import DashInfo
+from test_dashinfo import manifest
+
+MANIFESTS = [
+    ('55 segments', manifest('<S d="176128" r="53"/><S d="52427"/>')),
+    ('1502 segments', manifest('<S d="176128" r="1500"/><S d="52427"/>', duration='PT1H40M')),
+]
+
+
+def usec(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    for name, mpd in MANIFESTS:
+        mpd_base64 = base64.b64encode(mpd.encode('utf-8'))
+        parse = usec(lambda: DashInfo(mpd), 200)
+        playlist = usec(lambda: DashInfo(mpd).m3u8(), 200)
+        cached = usec(lambda: DashInfo.fromBase64(mpd_base64).m3u8(), 2000)
+        print('%-13s: parse %6.0f us, parse with m3u8 %6.0f us, cached with m3u8 %4.0f us' % (name, parse, playlist, cached))
+
+
+if __name__ == '__main__':
+    main()
+
+# End of File
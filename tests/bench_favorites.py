@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+''' Benchmark of the favorite checks for a large library.
+    Checks the tracks of a playlist against the favorite tracks with the sets of Favorites.ids
+    and with a list scan like the former implementation.
+
+    Usage: python tests/bench_favorites.py [favorite_count] [playlist_count]
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import sys
+import timeit
+
+import kodi_stubs
+kodi_stubs.install()
+
+from tidal2.tidalapi import Favorites
+
+
+class Config(object):
+    user_id = 1
+
+
+class Session(object):
+    _config = Config()
+
+
+def main(favorite_count=20000, playlist_count=3000):
+    favorites = Favorites(Session())
+    favorites.set_ids('tracks', range(favorite_count))
+    favorites.ids_loaded = True
+    id_list = sorted(favorites.ids['tracks'])
+    # Every second track of the playlist is a favorite
+    track_ids = [i * 2 if i % 2 else favorite_count + i for i in range(playlist_count)]
+    def check_set():
+        return [favorites.isFavoriteTrack(_id) for _id in track_ids]
+    def check_list():
+        return ['%s' % _id in id_list for _id in track_ids]
+    assert check_set() == check_list()
+    for name, func, number in [('set', check_set, 20), ('list', check_list, 1)]:
+        best = min(timeit.repeat(func, number=number, repeat=3)) / number
+        print('%-4s: %8.1f ms per listing, %8.3f us per item' % (name, best * 1000, best * 1e6 / playlist_count))
+    print('%d playlist tracks checked against %d favorite tracks' % (playlist_count, favorite_count))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
+
+# End of File
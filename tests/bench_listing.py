@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+''' Benchmark of TidalSession.add_list_items with 2000 tracks of a user playlist and 2000 albums.
+    Prints the time to build the labels, context menus and list items of a listing.
+    Run it on two revisions to compare them.
+
+    Usage: python tests/bench_listing.py [item_count] [runs]
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import sys
+import time
+
+import kodi_stubs
+import benchdata
+
+
+def add_list_items(session, items, runs):
+    best = None
+    for i in range(runs):
+        del kodi_stubs.DIRECTORY_ITEMS[:]
+        start = time.time()
+        session.add_list_items(items, content='songs', end=True, withNextPage=True, withSortModes=True)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    assert len(kodi_stubs.DIRECTORY_ITEMS) >= len(items)
+    return best
+
+
+def main(item_count=2000, runs=7):
+    session = benchdata.offline_session()
+    tracks = benchdata.parse_playlist(session, benchdata.playlist_response(item_count))
+    for track in tracks:
+        # Tracks of a user playlist get more context menu entries
+        track._playlist_type = 'USER'
+        track._playlist_id = 'a1b2c3d4-0000-0000-0000-000000000001'
+        track._playlist_pos = track._itemPosition
+    albums = session.get_item_albums(benchdata.parse_playlist(session, benchdata.playlist_response(item_count * 12)))[:item_count]
+    for name, items in [('tracks', tracks), ('albums', albums)]:
+        best = add_list_items(session, items, runs)
+        print('%d %s: best of %d runs %.1f ms, %.1f us per item' % (len(items), name, runs, best * 1000, best * 1e6 / len(items)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
+
+# End of File
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+''' Memory benchmark of a listing with 10000 tracks.
+    Prints the memory which the parsed items keep, the traced peak while parsing
+    and the growth of the peak RSS of the process while parsing. Run it on two revisions to compare them.
+
+    Usage: python tests/bench_memory.py [track_count]
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import gc
+import sys
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+import benchdata
+
+
+def peak_rss():
+    ''' Peak RSS of the process in MB '''
+    if not resource:
+        return 0.0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024.0 / 1024.0 if sys.platform == 'darwin' else rss / 1024.0
+
+
+def parse_pages(session, pages):
+    items = []
+    for response in pages:
+        items.extend(benchdata.parse_playlist(session, response))
+    return items
+
+
+def main(track_count=10000):
+    session = benchdata.offline_session()
+    # The response is paged by 5000 items like the playlist requests of the add-on
+    pages = [benchdata.playlist_response(min(5000, track_count - offset)) for offset in range(0, track_count, 5000)]
+    # Without tracemalloc, which needs memory of its own
+    gc.collect()
+    rss = peak_rss()
+    items = parse_pages(session, pages)
+    rss = peak_rss() - rss
+    del items
+    gc.collect()
+    tracemalloc.start()
+    items = parse_pages(session, pages)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('%d %s items: retained %.1f MB (%.0f bytes per track), traced peak %.1f MB, peak RSS growth %.1f MB' % (
+        len(items), type(items[0]).__name__, retained / 1e6, retained / len(items), peak / 1e6, rss))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
+
+# End of File
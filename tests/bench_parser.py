@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+''' Benchmark of the item parser with a playlist response of 5000 tracks.
+    Prints the parsed items per second of the Kodi track items.
+    Run it on two revisions to compare them.
+
+    Usage: python tests/bench_parser.py [track_count] [runs]
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import sys
+import json
+import time
+
+import benchdata
+
+
+def main(track_count=5000, runs=7):
+    session = benchdata.offline_session()
+    response = benchdata.playlist_response(track_count)
+    items = benchdata.parse_playlist(session, response)
+    assert len(items) == track_count
+    best = None
+    for i in range(runs):
+        json_obj = json.loads(response)
+        start = time.time()
+        session._map_items(json_obj, params={'offset': 0, 'limit': track_count}, ret='playlistitems')
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print('%d %s items: best of %d runs %.1f ms, %.0f items/s' % (track_count, type(items[0]).__name__, runs, best * 1000, track_count / best))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
+
+# End of File
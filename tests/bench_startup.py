@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+''' Startup time of the plugin for a play_track URL.
+    Every sample runs in a new interpreter and imports the modules like addon.py does:
+    the resolver alone for play_* paths, and the resolver with main.py for all other paths,
+    which is what every play_track call loaded before the resolver existed.
+    The Kodi modules are replaced by the stubs, so the times don't include the Kodi modules.
+
+    Usage: python tests/bench_startup.py [samples]
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import json
+import time
+import subprocess
+
+import kodi_stubs
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SAMPLE = '''
+import sys, time, json
+sys.path.insert(0, %(tests_dir)r)
+import kodi_stubs
+kodi_stubs.install()
+sys.path.insert(0, %(root_dir)r)
+sys.argv = ['plugin://plugin.audio.tidal2/play_track/12345/678', '1', '']
+imported = time.time()
+from resources.lib.tidal2 import resolver
+if %(with_main)r:
+    from resources.lib.tidal2 import main
+end = time.time()
+print(json.dumps({'imports': end - imported, 'modules': len([m for m in sys.modules if m.startswith('resources.lib.tidal2')])}))
+'''
+
+
+def sample(with_main):
+    code = SAMPLE % {'tests_dir': TESTS_DIR, 'root_dir': kodi_stubs.ROOT_DIR, 'with_main': with_main}
+    start = time.time()
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=kodi_stubs.ROOT_DIR)
+    result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+    result['total'] = time.time() - start
+    return result
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def main(samples=9):
+    for name, with_main in [('resolver only', False), ('resolver and main.py', True)]:
+        results = [sample(with_main) for i in range(samples)]
+        print('%-21s: imports %6.1f ms, whole process %6.1f ms, %2d add-on modules' % (
+            name, median([r['imports'] for r in results]) * 1000, median([r['total'] for r in results]) * 1000, results[0]['modules']))
+    print('Median of %d samples' % samples)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
+
+# End of File
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+''' Recorded-like API responses and a logged-in session without network access for the benchmarks '''
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+
+import kodi_stubs
+
+kodi_stubs.SETTINGS.update({'country_code': 'DE', 'user_country_code': 'DE', 'user_id': '1',
+                            'access_token': 'token', 'expire_time': '2099-01-01 00:00:00'})
+kodi_stubs.install()
+
+
+def artist_json(i, artist_type='MAIN'):
+    return {'id': 1000 + i, 'name': 'Artist %s' % i, 'type': artist_type, 'picture': 'a1b2c3d4-e5f6-7890-abcd-ef%010d' % i}
+
+
+def track_json(i):
+    ''' Track like the ones in the items of a playlist response '''
+    artists = [artist_json(i % 700)] + ([artist_json(i % 97 + 800, 'FEATURED')] if i % 3 == 0 else [])
+    return {'id': 200000 + i, 'title': 'Track %s' % i, 'duration': 180 + i % 200, 'replayGain': -8.5, 'peak': 0.98,
+            'allowStreaming': True, 'streamReady': True, 'adSupportedStreamReady': True,
+            'streamStartDate': '2019-05-17T00:00:00.000+0000', 'premiumStreamingOnly': False,
+            'trackNumber': i % 12 + 1, 'volumeNumber': 1, 'version': 'Remastered' if i % 10 == 0 else None,
+            'popularity': i % 100, 'copyright': '(C) 2019 Label', 'url': 'http://www.tidal.com/track/%s' % (200000 + i),
+            'isrc': 'USRC1%07d' % i, 'editable': False, 'explicit': i % 7 == 0,
+            'audioQuality': 'HI_RES_LOSSLESS' if i % 4 == 0 else 'LOSSLESS', 'audioModes': ['STEREO'],
+            'mediaMetadata': {'tags': ['LOSSLESS', 'HIRES_LOSSLESS'] if i % 4 == 0 else ['LOSSLESS']},
+            'artist': artists[0], 'artists': artists,
+            'album': {'id': 300000 + i // 12, 'title': 'Album %s' % (i // 12), 'cover': 'c0ffee00-1234-5678-9abc-%012d' % (i // 12),
+                      'vibrantColor': '#ffffff', 'videoCover': None},
+            'mixes': {'TRACK_MIX': '0012345%s' % i}, 'dateAdded': '2021-01-02T03:04:05.000+0000'}
+
+
+def playlist_response(count):
+    ''' JSON text of a playlists/<id>/items response with count tracks '''
+    items = [{'item': track_json(i), 'type': 'track', 'cut': None} for i in range(count)]
+    return json.dumps({'limit': count, 'offset': 0, 'totalNumberOfItems': count, 'items': items})
+
+
+def offline_session():
+    ''' Logged-in TidalSession with loaded favorites, so that it never uses the network '''
+    from tidal2.config import settings
+    from tidal2.koditidal import TidalSession
+    session = TidalSession(config=settings)
+    favorites = session.user.favorites
+    favorites.ids_loaded = True
+    favorites.set_ids('tracks', [200000 + i for i in range(0, 20000, 3)])
+    favorites.set_ids('albums', [300000 + i for i in range(0, 2000, 5)])
+    favorites.set_ids('artists', [1000 + i for i in range(0, 900, 7)])
+    return session
+
+
+def parse_playlist(session, response):
+    ''' Parses a playlist response like TidalSession.get_playlist_items '''
+    json_obj = json.loads(response)
+    return session._map_items(json_obj, params={'offset': 0, 'limit': json_obj['limit']}, ret='playlistitems')
+
+# End of File
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+''' Minimal replacements of the Kodi modules to run the add-on modules in tests and benchmarks.
+    The add-on dependencies requests, pyaes and m3u8 must be installed with pip.
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import types
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIB_DIR = os.path.join(ROOT_DIR, 'resources', 'lib')
+PROFILE_DIR = tempfile.mkdtemp(prefix='tidal2-test-')
+
+# Add-on settings which are returned by Addon.getSetting()
+SETTINGS = {}
+
+# Window properties of all windows
+PROPERTIES = {}
+
+# Directory items of xbmcplugin.addDirectoryItems() and addDirectoryItem()
+DIRECTORY_ITEMS = []
+
+
+class Stub(object):
+    ''' Accepts all calls and returns None '''
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class Addon(Stub):
+
+    def getAddonInfo(self, key):
+        return {'id': 'plugin.audio.tidal2', 'name': 'TIDAL2', 'version': '0.0.0',
+                'path': ROOT_DIR, 'profile': PROFILE_DIR}.get(key, '')
+
+    def getSetting(self, key):
+        return SETTINGS.get(key, '')
+
+    def setSetting(self, key, value):
+        SETTINGS[key] = value
+
+    def getLocalizedString(self, text_id):
+        return 'T%s' % text_id
+
+
+class Window(Stub):
+
+    def getProperty(self, key):
+        return PROPERTIES.get(key, '')
+
+    def setProperty(self, key, value):
+        PROPERTIES[key] = value
+
+    def clearProperty(self, key):
+        PROPERTIES.pop(key, None)
+
+
+class ListItem(Stub):
+
+    def __init__(self, label='', label2='', path='', offscreen=False):
+        self.label = label
+        self.path = path
+        self.properties = {}
+        self.context_menu = []
+
+    def setProperty(self, key, value):
+        self.properties[key] = value
+
+    def getProperty(self, key):
+        return self.properties.get(key, '')
+
+    def addContextMenuItems(self, items, replaceItems=False):
+        self.context_menu.extend(items)
+
+    def getMusicInfoTag(self):
+        return Stub()
+
+    def getVideoInfoTag(self):
+        return Stub()
+
+
+class Plugin(object):
+    ''' Replacement of routing.Plugin '''
+
+    def __init__(self, base_url=None):
+        self.base_url = base_url
+        self.handle = 1
+        self.path = '/'
+        self.args = {}
+
+    def route(self, pattern):
+        return lambda func: func
+
+    def url_for_path(self, path):
+        return self.base_url + (path if path.startswith('/') else '/' + path)
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(str(name))
+    module.__dict__.update(attributes)
+    # Unknown functions, classes and constants (Python 3.7 and later)
+    module.__getattr__ = lambda attr: Stub
+    return module
+
+
+def install():
+    ''' Installs the stubs for all Kodi modules which are not available '''
+    try:
+        import kodi_six
+    except ImportError:
+        xbmc = _module('xbmc', LOGDEBUG=0, LOGINFO=1, LOGNOTICE=2, LOGWARNING=3, LOGERROR=4, LOGFATAL=5,
+                       log=lambda msg, level=0: None,
+                       translatePath=lambda path: path,
+                       executeJSONRPC=lambda query: '{}',
+                       executebuiltin=lambda *args: None,
+                       getInfoLabel=lambda label: '',
+                       getCondVisibility=lambda condition: False,
+                       getLocalizedString=lambda text_id: 'K%s' % text_id,
+                       getSkinDir=lambda: 'skin.estuary',
+                       sleep=lambda msec: None,
+                       Monitor=Stub, Player=Stub)
+        xbmcaddon = _module('xbmcaddon', Addon=Addon)
+        xbmcgui = _module('xbmcgui', Window=Window, ListItem=ListItem, Dialog=Stub, WindowXMLDialog=Stub)
+        xbmcplugin = _module('xbmcplugin',
+                             addDirectoryItems=lambda handle, items, totalItems=0: DIRECTORY_ITEMS.extend(items) or True,
+                             addDirectoryItem=lambda handle, url, listitem, isFolder=False, totalItems=0: DIRECTORY_ITEMS.append((url, listitem, isFolder)) or True)
+        xbmcvfs = _module('xbmcvfs', translatePath=lambda path: path, exists=os.path.exists,
+                          mkdirs=lambda path: os.makedirs(path) or True, delete=lambda path: os.remove(path) or True)
+        kodi_six = _module('kodi_six', xbmc=xbmc, xbmcaddon=xbmcaddon, xbmcgui=xbmcgui, xbmcplugin=xbmcplugin, xbmcvfs=xbmcvfs)
+        sys.modules.update({'kodi_six': kodi_six, 'xbmc': xbmc, 'xbmcaddon': xbmcaddon, 'xbmcgui': xbmcgui,
+                            'xbmcplugin': xbmcplugin, 'xbmcvfs': xbmcvfs})
+    try:
+        import routing
+    except ImportError:
+        sys.modules['routing'] = _module('routing', Plugin=Plugin)
+    if LIB_DIR not in sys.path:
+        sys.path.insert(0, LIB_DIR)
+
+# End of File
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+''' Load test of the LocalHTTPServer of the service.
+    Measures the latency of manifest requests on a keep-alive connection while other clients
+    request fanart images which take one second each, like a TIDAL lookup with a JPG download.
+
+    Usage: python tests/load_test_server.py [workers] [background_workers] [fanart_clients]
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import sys
+import time
+import threading
+
+try:
+    from http.client import HTTPConnection
+except ImportError:
+    from httplib import HTTPConnection
+
+import kodi_stubs
+kodi_stubs.install()
+
+from tidal2.monitor import LocalHTTPServer, LocalHttpRequestHandler
+
+FANART_TIME = 1.0
+REQUEST_COUNT = 20
+
+
+class RequestHandler(LocalHttpRequestHandler):
+
+    def send_fanart(self, artist_ids):
+        time.sleep(FANART_TIME)
+        data = b'x' * 50000
+        self.send_response(200)
+        self._send_headers(content_type='image/jpeg', content_length=len(data), cacheable=True)
+        self.wfile.write(data)
+
+    def send_mpd_manifest(self, track_id, quality):
+        data = b'<MPD/>' * 100
+        self.send_response(200)
+        self._send_headers(content_type='application/dash+xml', content_length=len(data))
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def get(port, path, conn=None):
+    conn = conn or HTTPConnection('127.0.0.1', port, timeout=30)
+    start = time.time()
+    conn.request('GET', path)
+    conn.getresponse().read()
+    return time.time() - start
+
+
+def fanart_client(port, stop):
+    while not stop.is_set():
+        try:
+            get(port, '/artist_fanart?id=1')
+        except:
+            pass
+
+
+def summary(times):
+    times = sorted(times)
+    return 'median %5.1f ms, max %5.1f ms' % (times[len(times) // 2] * 1000, times[-1] * 1000)
+
+
+def main(workers=4, background_workers=2, fanart_clients=6):
+    server = LocalHTTPServer(('127.0.0.1', 0), RequestHandler, workers=workers, background_workers=background_workers)
+    server.enable_messages = False
+    port = server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    manifest = '/manifest.mpd?track_id=1&quality=LOSSLESS'
+    idle = [get(port, manifest) for i in range(REQUEST_COUNT)]
+    stop = threading.Event()
+    clients = [threading.Thread(target=fanart_client, args=(port, stop)) for i in range(fanart_clients)]
+    for client in clients:
+        client.daemon = True
+        client.start()
+    time.sleep(0.2)
+    conn = HTTPConnection('127.0.0.1', port, timeout=30)
+    loaded = []
+    for i in range(REQUEST_COUNT):
+        loaded.append(get(port, manifest, conn))
+        time.sleep(0.05)
+    stop.set()
+    print('Manifest requests idle:                 %s' % summary(idle))
+    print('Manifest requests with %d fanart clients: %s' % (fanart_clients, summary(loaded)))
+    print('%d workers, %d background workers' % (workers, background_workers))
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:4]])
+
+# End of File
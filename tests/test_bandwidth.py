@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+import time
+
+import pytest
+
+from tidal2.stream import select_quality, BandwidthEstimator
+from tidal2.tidalapi.models import Quality
+
+
+@pytest.mark.parametrize('kbps, max_quality, expected', [
+    # No estimate: the configured quality
+    (0, Quality.hi_res_lossless, Quality.hi_res_lossless),
+    (None, Quality.lossless, Quality.lossless),
+    # Enough bandwidth with 50% headroom
+    (7200, Quality.hi_res_lossless, Quality.hi_res_lossless),
+    (7199, Quality.hi_res_lossless, Quality.hi_res),
+    (2250, Quality.hi_res_lossless, Quality.hi_res),
+    (1650, Quality.hi_res_lossless, Quality.lossless),
+    (1649, Quality.hi_res_lossless, Quality.high),
+    (480, Quality.lossless, Quality.high),
+    (479, Quality.lossless, Quality.low),
+    (10, Quality.high, Quality.low),
+    # Never better than the configured quality
+    (100000, Quality.lossless, Quality.lossless),
+    (100000, Quality.high, Quality.high),
+    # Unknown qualities are not changed
+    (10, Quality.trial, Quality.trial),
+])
+def test_select_quality(kbps, max_quality, expected):
+    assert select_quality(kbps, max_quality) == expected
+
+
+def test_select_quality_headroom():
+    assert select_quality(4800, Quality.hi_res_lossless, headroom=1.0) == Quality.hi_res_lossless
+    assert select_quality(4800, Quality.hi_res_lossless, headroom=2.0) == Quality.hi_res
+
+
+def test_estimate():
+    estimator = BandwidthEstimator(window=30)
+    now = time.time()
+    assert estimator.kbps() == 0
+    # 1 MB in one second
+    estimator.add(now - 10, now - 9, 1000000)
+    assert estimator.kbps() == 8000
+    # Parallel downloads are measured together: 2 MB within the same second
+    estimator.add(now - 10, now - 9, 1000000)
+    assert estimator.kbps() == 16000
+
+
+def test_estimate_ignores_small_and_old_downloads():
+    estimator = BandwidthEstimator(window=30, min_bytes=64 * 1024)
+    now = time.time()
+    estimator.add(now - 2, now - 1, 1000)
+    estimator.add(now - 100, now - 99, 1000000)
+    assert estimator.kbps() == 0
+    estimator.add(now - 3, now - 1, 500000)
+    assert estimator.kbps() == 2000
+
+
+def test_estimate_json():
+    estimator = BandwidthEstimator()
+    now = time.time()
+    estimator.add(now - 2, now - 1, 1000000)
+    assert BandwidthEstimator.from_json(estimator.to_json()) == 8000
+    assert BandwidthEstimator.from_json(json.dumps({'kbps': 8000, 'time': now - 1000}), max_age=600) == 0
+    assert BandwidthEstimator.from_json('') == 0
+
+# End of File
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import time
+import base64
+
+from tidal2.tidalapi.cache import TrackUrlCache, track_url_expiry
+
+EXPIRES = int(time.time()) + 3600
+
+
+def playback_info(manifest):
+    return {'trackId': 1, 'audioQuality': 'LOSSLESS', 'manifestMimeType': 'application/dash+xml',
+            'manifest': base64.b64encode(manifest.encode('utf-8')).decode('utf-8')}
+
+
+def test_expiry_of_bts_url():
+    manifest = '{"mimeType":"audio/flac","urls":["https://lgf.audio.tidal.com/1.flac?Expires=%s&Signature=abc"]}' % EXPIRES
+    assert track_url_expiry(playback_info(manifest)) == EXPIRES
+
+
+def test_expiry_of_escaped_dash_url():
+    manifest = '<SegmentTemplate initialization="https://sp-ad-fa.audio.tidal.com/0.mp4?a=1&amp;exp=%s&amp;b=2"/>' % EXPIRES
+    assert track_url_expiry(playback_info(manifest)) == EXPIRES
+
+
+def test_expiry_of_token():
+    manifest = '<SegmentTemplate media="https://sp-ad-fa.audio.tidal.com/$Number$.mp4?token=%s~YWJjZGVm"/>' % EXPIRES
+    assert track_url_expiry(playback_info(manifest)) == EXPIRES
+
+
+def test_earliest_expiry():
+    manifest = '{"urls":["https://a/1.flac?Expires=%s","https://b/1.flac?expires=%s"]}' % (EXPIRES, EXPIRES - 100)
+    assert track_url_expiry(playback_info(manifest)) == EXPIRES - 100
+
+
+def test_expiry_in_json():
+    json_obj = {'url': 'https://a/1.mp4?exp=%s' % EXPIRES}
+    assert track_url_expiry(json_obj) == EXPIRES
+
+
+def test_default_expiry():
+    now = time.time()
+    assert now + 60 <= track_url_expiry(playback_info('{"urls":["https://a/1.flac"]}'), default_ttl=60) <= time.time() + 60
+    # Numbers which are not part of an expiry parameter are ignored
+    manifest = '{"urls":["https://a/1.flac?id=%s&xexp=%s"]}' % (EXPIRES, EXPIRES)
+    assert track_url_expiry(playback_info(manifest), default_ttl=60) <= time.time() + 60
+
+
+def test_track_url_cache(tmpdir):
+    cache = TrackUrlCache(str(tmpdir), min_validity=300)
+    key = cache.key(1, 'LOSSLESS', 'client', 'user')
+    assert key != cache.key(1, 'HI_RES_LOSSLESS', 'client', 'user')
+    assert key != cache.key(1, 'LOSSLESS', 'other', 'user')
+    assert cache.get(key) is None
+    json_obj = playback_info('{"urls":["https://a/1.flac?Expires=%s"]}' % EXPIRES)
+    cache.put(key, json_obj)
+    assert cache.get(key) == json_obj
+    # The plugin and the service share the folder
+    assert TrackUrlCache(str(tmpdir)).get(key) == json_obj
+    assert (cache.hits, cache.misses, cache.expired) == (1, 1, 0)
+
+
+def test_track_url_cache_expiry(tmpdir):
+    cache = TrackUrlCache(str(tmpdir), min_validity=300)
+    key = cache.key(2, 'LOSSLESS')
+    # URLs which expire within min_validity are resolved again
+    cache.put(key, playback_info('{"urls":["https://a/2.flac?Expires=%s"]}' % (int(time.time()) + 200)))
+    assert cache.get(key) is None
+    assert cache.expired == 1
+
+
+def test_track_url_cache_eviction(tmpdir):
+    cache = TrackUrlCache(str(tmpdir), max_entries=3)
+    for track_id in range(5):
+        cache.put(cache.key(track_id, 'LOSSLESS'), playback_info('{"urls":["https://a/%s.flac?Expires=%s"]}' % (track_id, EXPIRES)))
+    assert len(tmpdir.listdir()) == 3
+
+# End of File
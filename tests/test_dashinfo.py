@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import base64
+
+import pytest
+
+from tidal2.tidalapi.models import DashInfo
+
+SEGMENT_URL = 'https://sp-ad-fa.audio.tidal.com/mediatracks/GisIAxInYWM0YzZm/%s.mp4?token=1621234567~YWJjZGVm&amp;acl=x'
+
+
+def manifest(timeline, duration='PT3M35.155S'):
+    ''' DASH manifest like the ones of the TIDAL playbackinfo for FLAC streams '''
+    return ('<?xml version=\'1.0\' encoding=\'UTF-8\'?>'
+            '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" profiles="urn:mpeg:dash:profile:isoff-main:2011" type="static" '
+            'minBufferTime="PT3.993S" mediaPresentationDuration="%s">'
+            '<Period id="0"><AdaptationSet id="0" contentType="audio" mimeType="audio/mp4" segmentAlignment="true">'
+            '<Representation id="FLAC,44100,16" codecs="flac" bandwidth="1002426" audioSamplingRate="44100">'
+            '<SegmentTemplate timescale="44100" initialization="%s" media="%s" startNumber="1">'
+            '<SegmentTimeline>%s</SegmentTimeline></SegmentTemplate></Representation></AdaptationSet></Period></MPD>'
+            % (duration, SEGMENT_URL % '0', SEGMENT_URL % '$Number$', timeline))
+
+
+def test_attributes():
+    dash = DashInfo(manifest('<S d="176128" r="53"/><S d="52427"/>'))
+    assert dash.contentType == 'audio'
+    assert dash.mimeType == 'audio/mp4'
+    assert dash.codecs == 'flac'
+    assert dash.audioSamplingRate == 44100
+    assert dash.timescale == 44100
+    assert dash.startNumber == 1
+    assert dash.duration.total_seconds() == 215.155
+
+
+def test_segments():
+    dash = DashInfo(manifest('<S d="176128" r="53"/><S d="52427"/>'))
+    assert dash.segmentDurations == [176128] * 54 + [52427]
+    assert dash.chunksize == 176128
+    assert dash.chunkcount == 54
+    assert dash.lastchunksize == 52427
+    urls = dash.urls()
+    assert len(urls) == 56
+    # The XML entities of the URLs are unescaped
+    assert urls[0] == (SEGMENT_URL % '0').replace('&amp;', '&')
+    assert urls[1] == (SEGMENT_URL % '1').replace('&amp;', '&')
+    assert urls[-1] == (SEGMENT_URL % '55').replace('&amp;', '&')
+
+
+def test_multiple_timeline_entries():
+    dash = DashInfo(manifest('<S d="176128" r="20"/><S d="176000"/><S d="176128" r="31"/><S d="52427"/>'))
+    assert dash.segmentDurations == [176128] * 21 + [176000] + [176128] * 32 + [52427]
+    assert len(dash.urls()) == 56
+
+
+def test_repeat_until_end():
+    dash = DashInfo(manifest('<S t="0" d="176128" r="-1"/>', duration='PT40S'))
+    # 40 seconds are 1764000 units, which are covered by 11 segments
+    assert dash.segmentDurations == [176128] * 11
+
+
+def test_m3u8():
+    dash = DashInfo(manifest('<S d="176128" r="1"/><S d="52427"/>'))
+    lines = dash.m3u8().splitlines()
+    assert lines[0] == '#EXTM3U'
+    assert lines[-1] == '#EXT-X-ENDLIST'
+    # The initialization segment gets the duration of the first segment
+    assert lines[3:11] == ['#EXTINF:3.994,', dash.urls()[0], '#EXTINF:3.994,', dash.urls()[1],
+                           '#EXTINF:3.994,', dash.urls()[2], '#EXTINF:1.189,', dash.urls()[3]]
+    local = dash.m3u8(urls=['http://localhost/%s' % i for i in range(4)]).splitlines()
+    assert local[4] == 'http://localhost/0'
+    assert dash.m3u8() == '\n'.join(lines) + '\n'
+
+
+def test_invalid_manifest():
+    with pytest.raises(ValueError):
+        DashInfo('<MPD mediaPresentationDuration="PT4S"><Period/></MPD>')
+    assert DashInfo.fromBase64(base64.b64encode(b'<MPD/>')) is None
+    assert DashInfo.fromBase64('not base64') is None
+
+
+def test_parse_cache():
+    mpd = manifest('<S d="176128" r="9"/><S d="52427"/>')
+    dash = DashInfo.fromBase64(base64.b64encode(mpd.encode('utf-8')))
+    assert dash is DashInfo.parse(mpd)
+    assert dash is not DashInfo.parse(manifest('<S d="176128" r="8"/><S d="52427"/>'))
+
+# End of File
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import datetime
+
+from tidal2.storage import CacheStore, STORAGE_VERSION
+
+LEGACY_DATA = {
+    'favorites': {'artists': ['10', '11'], 'albums': [], 'playlists': ['a-b-c'], 'tracks': ['1', '2', '3'], 'videos': [], 'mixes': []},
+    'locked_artists': [2935],
+    'playlists': {'a-b-c': {'title': 'Playlist', 'description': '', 'lastUpdated': datetime.datetime(2021, 5, 17, 10, 20, 30, 123000),
+                            'ids': ['1', '2'], 'album_ids': []}},
+    'folders': {'a-b-c': {'parentFolderId': 'root', 'parentFolderName': ''}},
+}
+
+
+def legacy_store(tmpdir):
+    legacy_files = {}
+    for table, data in LEGACY_DATA.items():
+        filename = str(tmpdir.join('%s.cfg' % table))
+        with open(filename, 'w') as fd:
+            fd.write(repr(data))
+        legacy_files[table] = filename
+    legacy_files['userprofiles'] = str(tmpdir.join('userprofiles.cfg'))
+    return CacheStore(str(tmpdir.join('cache.db')), legacy_files=legacy_files), legacy_files
+
+
+def test_migrate_legacy_files(tmpdir):
+    store, legacy_files = legacy_store(tmpdir)
+    favorites = store.load_favorites()
+    assert favorites['tracks'] == set(['1', '2', '3'])
+    assert favorites['artists'] == set(['10', '11'])
+    assert favorites['playlists'] == set(['a-b-c'])
+    assert store.load_locked_artists() == ['2935']
+    assert store.load_dict('playlists') == LEGACY_DATA['playlists']
+    assert store.load_dict('folders') == LEGACY_DATA['folders']
+    # Missing legacy files are not imported
+    assert store.load_dict('userprofiles') is None
+    assert store.get_meta('version') == '%s' % STORAGE_VERSION
+    for table, filename in legacy_files.items():
+        if table in LEGACY_DATA:
+            assert not os.path.exists(filename)
+            assert os.path.exists(filename + '.bak')
+    store.close()
+
+
+def test_migrate_only_once(tmpdir):
+    store, legacy_files = legacy_store(tmpdir)
+    store.connect()
+    store.save_favorites({'tracks': set(['1'])}, store.load_favorites())
+    store.close()
+    # A legacy file which appears again is not imported into an existing database
+    with open(legacy_files['favorites'], 'w') as fd:
+        fd.write(repr(LEGACY_DATA['favorites']))
+    store = CacheStore(store.filename, legacy_files=legacy_files)
+    assert store.load_favorites()['tracks'] == set(['1'])
+    assert os.path.exists(legacy_files['favorites'])
+    store.close()
+
+
+def test_broken_legacy_file(tmpdir):
+    store, legacy_files = legacy_store(tmpdir)
+    with open(legacy_files['folders'], 'w') as fd:
+        fd.write('{broken')
+    assert store.load_dict('folders') is None
+    assert store.load_dict('playlists') == LEGACY_DATA['playlists']
+    assert os.path.exists(legacy_files['folders'])
+    store.close()
+
+
+def test_save_dict_writes_changes_only(tmpdir):
+    store = CacheStore(str(tmpdir.join('cache.db')))
+    items = {'1': {'title': 'One'}, '2': {'title': 'Two'}}
+    assert store.save_dict('playlists', items, {}) == 2
+    on_disk = store.load_dict('playlists')
+    assert store.save_dict('playlists', on_disk, on_disk) == 0
+    items = {'1': {'title': 'One'}, '3': {'title': 'Three'}}
+    assert store.save_dict('playlists', items, on_disk) == 2
+    assert store.load_dict('playlists') == items
+    store.close()
+
+# End of File
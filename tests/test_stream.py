@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2021 arneson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import pytest
+
+from tidal2.stream import parse_range, RANGE_NOT_SATISFIABLE, SegmentStream
+
+# Test stream of four segments with 10, 20, 30 and 5 bytes
+SEGMENTS = [b'i' * 10, b'a' * 20, b'b' * 30, b'c' * 5]
+STREAM = b''.join(SEGMENTS)
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None),
+    ('', None),
+    ('bytes=-', None),
+    ('items=0-10', None),
+    ('bytes=0-', (0, 64)),
+    ('bytes=0-0', (0, 0)),
+    ('bytes=10-19', (10, 19)),
+    ('bytes=60-', (60, 64)),
+    ('bytes=60-1000', (60, 64)),
+    ('bytes=64-64', (64, 64)),
+    ('bytes=-5', (60, 64)),
+    ('bytes=-1000', (0, 64)),
+    ('bytes=65-', RANGE_NOT_SATISFIABLE),
+    ('bytes=70-80', RANGE_NOT_SATISFIABLE),
+    ('bytes=20-10', RANGE_NOT_SATISFIABLE),
+    ('bytes=-0', RANGE_NOT_SATISFIABLE),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, len(STREAM)) == expected
+
+
+class DashInfo(object):
+    mimeType = 'audio/mp4'
+
+    def urls(self):
+        return ['http://cdn/%s.mp4' % i for i in range(len(SEGMENTS))]
+
+
+class Response(object):
+
+    def __init__(self, size):
+        self.ok = True
+        self.headers = {'Content-Length': '%s' % size}
+
+
+class Http(object):
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.head_requests = []
+
+    def request(self, method, url, **kwargs):
+        index = int(url.split('/')[-1].split('.')[0])
+        self.head_requests.append(index)
+        return Response(self.sizes[index])
+
+
+class SegmentProxy(object):
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.tracks = {}
+
+    def register(self, key, urls):
+        self.tracks[key] = urls
+
+    def has_track(self, key):
+        return key in self.tracks
+
+    def get(self, key, index):
+        return self.segments[index]
+
+
+def segment_stream(segments=SEGMENTS, sizes=None):
+    http = Http(sizes or [len(s) for s in SEGMENTS])
+    return SegmentStream(DashInfo(), http, SegmentProxy(segments), 'stream_1_LOSSLESS'), http
+
+
+def test_iter_all():
+    stream, http = segment_stream()
+    assert b''.join(stream.iter_all()) == STREAM
+    # Loaded segments don't need a HEAD request for the layout
+    assert stream.layout() == len(STREAM)
+    assert http.head_requests == []
+
+
+def test_layout():
+    stream, http = segment_stream()
+    assert stream.layout() == len(STREAM)
+    assert stream.offsets == [0, 10, 30, 60, 65]
+    assert sorted(http.head_requests) == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize('start, end', [(0, 64), (0, 0), (5, 14), (10, 29), (29, 30), (12, 62), (64, 64)])
+def test_iter_range(start, end):
+    stream, http = segment_stream()
+    stream.layout()
+    assert b''.join(stream.iter_range(start, end)) == STREAM[start:end + 1]
+
+
+def test_iter_range_size_mismatch():
+    # The CDN announced more bytes than the segment has
+    stream, http = segment_stream(sizes=[10, 25, 30, 5])
+    stream.layout()
+    chunks = stream.iter_range(0, 69)
+    assert next(chunks) == SEGMENTS[0]
+    with pytest.raises(IOError):
+        next(chunks)
+
+
+def test_iter_range_short_stream():
+    stream, http = segment_stream()
+    stream.layout()
+    with pytest.raises(IOError):
+        b''.join(stream.iter_range(60, 70))
+
+# End of File